@@ -3,6 +3,12 @@ import sys
 import json
 import time
 import math
+import queue
+import sqlite3
+import threading
+import xml.etree.ElementTree as ElementTree
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 
 import xbmc
 import xbmcaddon
@@ -15,7 +21,10 @@ except ImportError:
     # Fallback for older Kodi versions
     translatePath = xbmc.translatePath
 
-from imdb import getOriginalAspectRatio
+from imdb import getOriginalAspectRatio, IMDbUnavailableError, IMDbDeadlineError, close_session, load_strategy_stats, probe_imdb, \
+    configure_page_store, reparse_page_store, resolve_stored_title
+from ratio_index import RatioIndex, convert_json_cache, write_ratio_index
+from media_probe import MediaProbeError, is_supported, probe_file
 
 # Note: IMDb number is obtained via JSON-RPC Player.GetItem with uniqueid property.
 # This is the standard method as there's no direct InfoLabel equivalent to VideoPlayer.VideoAspect.
@@ -26,6 +35,68 @@ ZOOM_RATE_LIMIT_MS = 500
 MIN_VALID_RATIO = 100  # 1.00:1 (square)
 MAX_VALID_RATIO = 500  # 5.00:1 (very wide)
 
+# Cache journal: compact into the snapshot once this many records have been appended
+CACHE_JOURNAL_MAX_RECORDS = 200
+
+# Negative cache: how long an IMDb miss (title not found, no techspec) is remembered
+NEGATIVE_CACHE_TTL_HOURS = 24
+
+# Maximum number of cache entries kept in memory (least recently used are evicted)
+CACHE_MEMORY_ENTRIES = 1000
+
+# Time-to-zoom budget: detection stops waiting for IMDb and streamdetails after this many
+# seconds from playback start, and zooms with the best answer it has
+DETECTION_BUDGET_S = 10
+
+# IMDb circuit breaker: consecutive "IMDb unreachable" lookups before IMDb is skipped,
+# and how long it is skipped before a background probe (doubled after each failed probe)
+CIRCUIT_FAILURE_THRESHOLD = 2
+CIRCUIT_OPEN_SECONDS = 60
+CIRCUIT_MAX_OPEN_SECONDS = 900
+
+# IMDb extraction strategy stats (success rate and cost), in the addon profile
+STRATEGY_STATS_FILENAME = "strategy_stats.json"
+
+# Raw IMDb pages (gzipped, re-parsed by the "reparse_pages" action), in the addon profile
+PAGE_STORE_DIRNAME = "pages"
+PAGE_STORE_MB = 20
+
+# Ratio source cost classes, cheapest first. Sources below RACE_MIN_COST are asked one after
+# the other; the others are started together and raced under the time-to-zoom budget
+COST_MEMORY = 0
+COST_LOCAL_DISK = 1
+COST_LOCAL_IPC = 2
+COST_NETWORK = 3
+RACE_MIN_COST = COST_LOCAL_IPC
+
+# Ratio source confidence: the first high-confidence answer (the content ratio, e.g. from
+# IMDb) wins; low-confidence answers (the file ratio) are only used as fallback
+CONFIDENCE_LOW = 1
+CONFIDENCE_HIGH = 2
+
+# Sidecar files next to the video: Kodi .nfo (XML) and JSON written by other tools.
+# Original (content) ratio fields, checked in order; the .nfo streamdetails <aspect> is the file ratio
+NFO_ORIGINAL_RATIO_TAGS = ("originalaspectratio", "original_aspect_ratio", "aspectratio")
+NFO_STREAM_ASPECT_PATH = ("fileinfo", "streamdetails", "video", "aspect")
+SIDECAR_JSON_ORIGINAL_KEYS = ("original_aspect_ratio", "originalaspectratio", "aspect_ratio")
+SIDECAR_JSON_ASPECT_KEYS = ("aspect",)
+SIDECAR_MEMORY_ENTRIES = 500  # Parsed sidecar files kept in memory, keyed by path
+
+# Sources of the file ratio (needed whatever content ratio wins), in order of preference
+FILE_RATIO_SOURCES = ("probe", "kodi", "nfo_aspect")
+
+# Marker for keys absent from the in-memory cache tier
+_NOT_IN_MEMORY = object()
+
+# Read-only seed database shipped with the addon (imdb id -> original ratio, see tools/build_seed.py)
+SEED_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "resources", "data", "seed.bin")
+_seed_index = None
+_seed_lock = threading.Lock()
+
+# Window(10000) property bumped whenever the cache is cleared or rewritten by another process
+# (e.g. the clear_cache action), so the service notices and reloads instead of serving stale entries
+CACHE_GENERATION_PROPERTY = "removeblackbars_cache_generation"
+
 
 def notify(msg, duration_ms=None):
     """
@@ -60,6 +131,14 @@ def translate_profile_path(*paths):
     return os.path.join(profile, *paths)
 
 
+def get_page_store_mb(addon):
+    """Get the size cap of the IMDb page store in MB (0 disables it)."""
+    try:
+        return max(0, int(addon.getSetting("page_store_mb") or PAGE_STORE_MB))
+    except Exception:
+        return PAGE_STORE_MB
+
+
 def get_writable_cache_path(filename="cache.json"):
     """
     Get a writable cache path using the addon profile directory.
@@ -94,8 +173,141 @@ def get_writable_cache_path(filename="cache.json"):
     return None
 
 
+class DetectionCancelled(Exception):
+    """Raised when a detection job belongs to a playback session that is no longer current."""
+
+
+class DetectionBudgetExceeded(Exception):
+    """Raised when the time-to-zoom budget of a playback session runs out while waiting for a stage."""
+
+
+def _sleep_unless_cancelled(delay_ms, cancelled=None, step_ms=100):
+    """
+    Sleep for delay_ms, in small steps so that cancellation is noticed quickly.
+    Returns False if cancelled before the delay elapsed, True otherwise.
+    """
+    remaining = delay_ms
+    while remaining > 0:
+        if cancelled and cancelled():
+            return False
+        chunk = min(step_ms, remaining)
+        xbmc.sleep(chunk)
+        remaining -= chunk
+    return not (cancelled and cancelled())
+
+
+class DetectionToken:
+    """
+    Generation token of a playback session, handed to every detection stage.
+    Carries the session's deadline (time.monotonic() value, None without budget).
+    """
+
+    def __init__(self, worker, generation, budget_s=None):
+        self._worker = worker
+        self.generation = generation
+        self.started = time.monotonic()
+        self.deadline = self.started + budget_s if budget_s else None
+
+    def remaining(self):
+        """Seconds left in the time-to-zoom budget, or None without budget."""
+        return None if self.deadline is None else self.deadline - time.monotonic()
+
+    def elapsed_ms(self):
+        return int((time.monotonic() - self.started) * 1000)
+
+    def is_cancelled(self):
+        return not self._worker.is_current(self.generation)
+
+    def raise_if_cancelled(self):
+        if self.is_cancelled():
+            raise DetectionCancelled(f"generation {self.generation} superseded")
+
+    def wait(self, future, poll_s=0.1):
+        """
+        Wait for a future, giving up as soon as this token is cancelled (DetectionCancelled)
+        or its budget runs out (DetectionBudgetExceeded).
+        """
+        return self.wait_any([future], poll_s).pop().result()
+
+    def wait_any(self, futures, poll_s=0.1):
+        """Like wait(), for the first of several futures: returns the set of those done."""
+        while True:
+            remaining = self.remaining()
+            timeout = poll_s if remaining is None else max(0, min(poll_s, remaining))
+            done, _ = wait(futures, timeout=timeout, return_when=FIRST_COMPLETED)
+            if done:
+                return done
+            self.raise_if_cancelled()
+            remaining = self.remaining()
+            if remaining is not None and remaining <= 0:
+                raise DetectionBudgetExceeded(f"generation {self.generation}: budget spent after {self.elapsed_ms()}ms")
+
+
+class DetectionWorker:
+    """
+    Runs detection jobs on a single background thread, off Kodi's player callback thread.
+    Each playback session gets a new generation; starting another session or stopping
+    playback bumps the generation, which cancels in-flight and queued jobs.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._jobs = queue.Queue()
+        self._thread = None
+
+    def is_current(self, generation):
+        with self._lock:
+            return generation == self._generation
+
+    def new_session(self, budget_s=None):
+        """
+        Start a new playback session (cancels the previous one) and return its token,
+        with a time-to-zoom budget of budget_s seconds (None: unbounded).
+        """
+        with self._lock:
+            self._generation += 1
+            return DetectionToken(self, self._generation, budget_s)
+
+    def cancel(self):
+        """Cancel the current playback session without starting a new one."""
+        with self._lock:
+            self._generation += 1
+
+    def submit(self, job, token):
+        """Queue job(token) for the background thread."""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="removeblackbars-detection", daemon=True)
+                self._thread.start()
+        self._jobs.put((job, token))
+
+    def stop(self, timeout_s=2.0):
+        """Cancel pending work and stop the background thread."""
+        self.cancel()
+        with self._lock:
+            thread = self._thread
+        if thread is not None and thread.is_alive():
+            self._jobs.put(None)
+            thread.join(timeout_s)
+
+    def _run(self):
+        while True:
+            item = self._jobs.get()
+            if item is None:
+                return
+            job, token = item
+            if token.is_cancelled():
+                xbmc.log(f"service.remove.black.bars.gbm: Detection job skipped: generation {token.generation} is stale", level=xbmc.LOGDEBUG)
+                continue
+            try:
+                job(token)
+            except Exception as e:
+                xbmc.log(f"service.remove.black.bars.gbm: Detection job error: {e}", level=xbmc.LOGERROR)
+
+
 class KodiMetadataProvider:
-    def get_aspect_ratio(self, video_info_tag, reason=None, player=None):
+    def get_aspect_ratio(self, video_info_tag, reason=None, player=None, cancelled=None, deadline=None):
         """
         Get aspect ratio from Kodi metadata using JSON-RPC Player.GetItem with streamdetails.
         Calculates ratio from actual video resolution (width/height).
@@ -108,6 +320,8 @@ class KodiMetadataProvider:
             video_info_tag: Video info tag (unused but kept for compatibility)
             reason: Optional reason string to include in log message
             player: xbmc.Player instance (unused, kept for compatibility)
+            cancelled: Optional callable returning True when the playback session is over
+            deadline: Optional time.monotonic() value; no retry is started that would end after it
         """
         try:
             reason_text = f" ({reason})" if reason else ""
@@ -117,14 +331,21 @@ class KodiMetadataProvider:
             base_delay_ms = 300  # Start with 300ms, increase with each retry
             
             # Add initial delay before first attempt (streamdetails may not be ready immediately)
-            xbmc.sleep(100)
+            if not _sleep_unless_cancelled(100, cancelled):
+                xbmc.log(f"service.remove.black.bars.gbm: file_ratio polling cancelled{reason_text}", level=xbmc.LOGDEBUG)
+                return None
             
             for attempt in range(max_retries):
                 if attempt > 0:
                     # Wait progressively longer before retrying
                     delay = base_delay_ms * attempt
+                    if deadline is not None and time.monotonic() + delay / 1000.0 >= deadline:
+                        xbmc.log(f"service.remove.black.bars.gbm: file_ratio polling stopped: time-to-zoom budget spent{reason_text}", level=xbmc.LOGDEBUG)
+                        return None
                     xbmc.log(f"service.remove.black.bars.gbm: Retry {attempt + 1}/{max_retries} to get file_ratio{reason_text} (waiting {delay}ms)", level=xbmc.LOGDEBUG)
-                    xbmc.sleep(delay)
+                    if not _sleep_unless_cancelled(delay, cancelled):
+                        xbmc.log(f"service.remove.black.bars.gbm: file_ratio polling cancelled{reason_text}", level=xbmc.LOGDEBUG)
+                        return None
                 else:
                     xbmc.log(f"service.remove.black.bars.gbm: Attempt {attempt + 1}/{max_retries} to get file_ratio{reason_text}", level=xbmc.LOGDEBUG)
                 
@@ -200,18 +421,276 @@ class KodiMetadataProvider:
         return None
 
 
+def get_cache_generation():
+    """Current cache generation shared by every process of the addon ("" if never bumped)."""
+    try:
+        return xbmcgui.Window(10000).getProperty(CACHE_GENERATION_PROPERTY)
+    except Exception:
+        return ""
+
+
+def bump_cache_generation():
+    """Signal to other processes that the cache changed behind their back. Returns the new generation."""
+    try:
+        window = xbmcgui.Window(10000)
+        current = window.getProperty(CACHE_GENERATION_PROPERTY)
+        generation = str(int(current) + 1 if current.isdigit() else 1)
+        window.setProperty(CACHE_GENERATION_PROPERTY, generation)
+        return generation
+    except Exception as e:
+        xbmc.log(f"service.remove.black.bars.gbm: Failed to bump cache generation: {e}", level=xbmc.LOGDEBUG)
+        return get_cache_generation()
+
+
+def file_signature(path):
+    """(inode, size, mtime) of path, or None if it does not exist. Cheap change detection."""
+    try:
+        st = os.stat(path)
+        return st.st_ino, st.st_size, st.st_mtime_ns
+    except (OSError, TypeError):
+        return None
+
+
+def get_seed_ratio(imdb_id):
+    """
+    Return the original aspect ratio of imdb_id from the seed database shipped with the
+    addon, or None. The seed is memory-mapped on first use and never written.
+    """
+    global _seed_index
+    if not imdb_id:
+        return None
+    with _seed_lock:
+        if _seed_index is None:
+            try:
+                _seed_index = RatioIndex(SEED_PATH)
+                xbmc.log(f"service.remove.black.bars.gbm: Seed database opened: {len(_seed_index)} entries", level=xbmc.LOGDEBUG)
+            except Exception as e:
+                xbmc.log(f"service.remove.black.bars.gbm: Seed database unavailable ({SEED_PATH}): {e}", level=xbmc.LOGDEBUG)
+                _seed_index = False
+        index = _seed_index
+    if not index:
+        return None
+    try:
+        ratio = index.get("imdb:" + str(imdb_id))
+    except Exception:
+        return None
+    if not isinstance(ratio, int) or ratio < MIN_VALID_RATIO or ratio > MAX_VALID_RATIO:
+        return None
+    xbmc.log(f"service.remove.black.bars.gbm: Seed database hit for {imdb_id}: {ratio}", level=xbmc.LOGDEBUG)
+    return ratio
+
+
+class LruDict(OrderedDict):
+    """Dict keeping at most max_entries items, evicting the least recently used one."""
+
+    def __init__(self, max_entries=None, *args, **kwargs):
+        self.max_entries = max_entries
+        super().__init__(*args, **kwargs)
+
+    def get(self, key, default=None):
+        try:
+            value = self[key]
+            self.move_to_end(key)
+            return value
+        except KeyError:
+            return default
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.move_to_end(key)
+        while self.max_entries and len(self) > self.max_entries:
+            self.popitem(last=False)
+
+
+def ratio_threshold(ratio):
+    """Smallest difference from ratio that is a different picture shape (5%, at least 5), not encoding noise."""
+    return max(5, int(ratio * 0.05))
+
+
+def split_title_key(key):
+    """Split a cache title key, "title (year)" or "title", into (title, year or None)."""
+    title, _, year = key.rpartition(" (")
+    if title and len(year) == 5 and year.endswith(")") and year[:4].isdigit():
+        return title, int(year[:4])
+    return key, None
+
+
+def parse_ratio_text(text, truncate=False):
+    """
+    Parse a ratio written by hand or by another tool: "2.39:1", "16:9", "2.400000" or
+    "239" (already x100). Returns an int ratio within the valid range, or None.
+    Rounded to the nearest hundredth, or truncated (truncate=True) for a file ratio so it
+    matches the one Kodi computes from the resolution (1.777778 is 177, not 178).
+    """
+    if text is None:
+        return None
+    try:
+        text = str(text).strip()
+        if ":" in text:
+            num, _, den = text.partition(":")
+            value = float(num) / float(den)
+        else:
+            value = float(text)
+    except (ValueError, ZeroDivisionError):
+        return None
+    if value < 10:
+        value = value * 100
+    if math.isnan(value) or not MIN_VALID_RATIO <= value <= MAX_VALID_RATIO:
+        return None
+    if truncate:
+        # Rounded to 6 decimals first so "2.01" (200.99999999999997) stays 201
+        return int(round(value, 6))
+    return int(value + 0.5)
+
+
+class SidecarReader:
+    """
+    Reads ratios from the files next to a video: <name>.nfo, then movie.nfo in the same
+    folder (Kodi .nfo, parsed as a stream so big NFOs stop early), then <name>.json.
+    Each file's result is memoized by path and mtime.
+    """
+
+    def __init__(self, max_entries=SIDECAR_MEMORY_ENTRIES):
+        self._memo = LruDict(max_entries)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def candidates(video_path):
+        base = os.path.splitext(video_path)[0]
+        return [base + ".nfo", os.path.join(os.path.dirname(video_path), "movie.nfo"), base + ".json"]
+
+    def read(self, video_path):
+        """Return {"original": ratio or None, "aspect": ratio or None} for a local video path."""
+        result = {"original": None, "aspect": None}
+        if not video_path or "://" in video_path:
+            # Network shares and stacks (smb://, nfs://, stack://) are not read through the OS
+            return result
+        for path in self.candidates(video_path):
+            for field, ratio in self._read_file(path).items():
+                if result[field] is None:
+                    result[field] = ratio
+            if result["original"] is not None and result["aspect"] is not None:
+                break
+        return result
+
+    def _read_file(self, path):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return {}
+        signature = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            memo = self._memo.get(path)
+        if memo is not None and memo[0] == signature:
+            return memo[1]
+        if path.endswith(".json"):
+            ratios = self._parse_json(path)
+        else:
+            ratios = self._parse_nfo(path)
+        xbmc.log(f"service.remove.black.bars.gbm: Sidecar {path}: {ratios}", level=xbmc.LOGDEBUG)
+        with self._lock:
+            self._memo[path] = (signature, ratios)
+        return ratios
+
+    @staticmethod
+    def _parse_nfo(path):
+        """Original ratio (top-level tag) and first video stream aspect of a Kodi .nfo."""
+        ratios = {}
+        stack = []
+        try:
+            for event, element in ElementTree.iterparse(path, events=("start", "end")):
+                if event == "start":
+                    stack.append(element.tag.lower())
+                    continue
+                tag = stack.pop()
+                if len(stack) == 1 and tag in NFO_ORIGINAL_RATIO_TAGS and "original" not in ratios:
+                    ratio = parse_ratio_text(element.text)
+                    if ratio:
+                        ratios["original"] = ratio
+                elif tuple(stack[1:]) + (tag,) == NFO_STREAM_ASPECT_PATH and "aspect" not in ratios:
+                    ratio = parse_ratio_text(element.text, truncate=True)
+                    if ratio:
+                        ratios["aspect"] = ratio
+                if len(ratios) == 2:
+                    break
+                if stack:
+                    element.clear()
+        except (ElementTree.ParseError, OSError) as e:
+            # NFOs may end with a scraper URL after the XML, or be a bare URL
+            xbmc.log(f"service.remove.black.bars.gbm: Sidecar {path}: stopped parsing: {e}", level=xbmc.LOGDEBUG)
+        return ratios
+
+    @staticmethod
+    def _parse_json(path):
+        ratios = {}
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            xbmc.log(f"service.remove.black.bars.gbm: Sidecar {path}: unreadable: {e}", level=xbmc.LOGDEBUG)
+            return ratios
+        if not isinstance(data, dict):
+            return ratios
+        for field, keys in (("original", SIDECAR_JSON_ORIGINAL_KEYS), ("aspect", SIDECAR_JSON_ASPECT_KEYS)):
+            for key in keys:
+                ratio = parse_ratio_text(data.get(key), truncate=field == "aspect")
+                if ratio:
+                    ratios[field] = ratio
+                    break
+        return ratios
+
+
+def _is_cached_ratio(value):
+    """True for a cached ratio, False for a negative entry ({"miss": timestamp}) or None."""
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
 class JsonCacheProvider:
-    def __init__(self, enabled=True):
+    """
+    IMDb ratio cache stored as a compact binary snapshot (cache.bin, see ratio_index.py)
+    plus an append-only journal (cache.journal, one JSON record per line).
+    The snapshot is memory-mapped and searched in place, so startup parses nothing and
+    lookups are a binary search. New entries are appended to the journal; the journal is
+    folded into the snapshot (atomic temp file + rename) when it gets too long and on
+    service shutdown. Only the most recently used entries are kept in memory (bounded LRU
+    tier). A cache.json snapshot left by older versions is converted on first load.
+    """
+
+    def __init__(self, enabled=True, negative_ttl_hours=NEGATIVE_CACHE_TTL_HOURS, memory_entries=CACHE_MEMORY_ENTRIES,
+                 use_seed=False):
         self.enabled = enabled
+        self.use_seed = use_seed
+        self.negative_ttl_s = negative_ttl_hours * 3600
+        self.memory_entries = memory_entries
         self.path = get_writable_cache_path("cache.json")
-        self._cache = {}
+        self._cache = LruDict(self.memory_entries)
+        self._lock = threading.Lock()
+        self._journal_records = 0
+        self._journal = None  # Parsed journal {key: value}, valid while the file matches _journal_signature
+        self._journal_signature = None
+        self._index = None
+        self._generation = None
+        self._signature = None
         if self.enabled and self.path:
             self._ensure_dir()
             self._cache = self._load()
+            self._mark_in_sync()
         elif self.enabled and not self.path:
             xbmc.log("service.remove.black.bars.gbm: No writable cache path available, cache disabled", level=xbmc.LOGWARNING)
             self.enabled = False
 
+    @property
+    def journal_path(self):
+        if not self.path:
+            return None
+        return os.path.splitext(self.path)[0] + ".journal"
+
+    @property
+    def index_path(self):
+        if not self.path:
+            return None
+        return os.path.splitext(self.path)[0] + ".bin"
+
     def _ensure_dir(self):
         if not self.path:
             return
@@ -223,37 +702,250 @@ class JsonCacheProvider:
             xbmc.log(f"service.remove.black.bars.gbm: Failed to ensure cache dir: {e}", level=xbmc.LOGWARNING)
 
     def _load(self):
+        """Open the snapshot (converting a legacy cache.json), then replay the journal into the LRU tier."""
+        cache = LruDict(self.memory_entries)
         if not self.enabled or not self.path:
-            return {}
+            return cache
+        self._migrate_json_snapshot()
+        index = self._get_index()
+        if index is not None and len(index):
+            xbmc.log(f"service.remove.black.bars.gbm: Cache opened: {len(index)} entries in {self.index_path}", level=xbmc.LOGDEBUG)
+            xbmc.log(f"service.remove.black.bars.gbm: Cache location: {self.index_path}", level=xbmc.LOGINFO)
+        self._journal_records = self._replay_journal(cache)
+        return cache
+
+    def _migrate_json_snapshot(self):
+        """Convert a cache.json snapshot written by older versions to the binary format (once)."""
+        if not os.path.exists(self.path) or os.path.exists(self.index_path):
+            return
+        tmp_path = self.index_path + ".tmp"
         try:
-            if os.path.exists(self.path):
-                with open(self.path, "r", encoding="utf-8") as f:
-                    cache = json.load(f)
-                    xbmc.log(f"service.remove.black.bars.gbm: Cache loaded: {len(cache)} entries from {self.path}", level=xbmc.LOGDEBUG)
-                    xbmc.log(f"service.remove.black.bars.gbm: Cache location: {self.path}", level=xbmc.LOGINFO)
-                    return cache
+            written = convert_json_cache(self.path, tmp_path)
+            os.replace(tmp_path, self.index_path)
+            os.remove(self.path)
+            xbmc.log(f"service.remove.black.bars.gbm: Converted {written} cache entries from {self.path} to {self.index_path}", level=xbmc.LOGINFO)
         except Exception as e:
-            xbmc.log(f"service.remove.black.bars.gbm: Failed to load cache: {e}", level=xbmc.LOGWARNING)
-        return {}
+            xbmc.log(f"service.remove.black.bars.gbm: Failed to convert cache {self.path}: {e}", level=xbmc.LOGWARNING)
+            try:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+            except OSError:
+                pass
+
+    def _get_index(self):
+        """Return the memory-mapped snapshot, opening it on first use. None if there is none."""
+        index_path = self.index_path
+        if self._index is not None and self._index.path == index_path:
+            return self._index
+        self._close_index()
+        if not index_path or not os.path.exists(index_path):
+            return None
+        try:
+            self._index = RatioIndex(index_path)
+        except Exception as e:
+            xbmc.log(f"service.remove.black.bars.gbm: Failed to open cache {index_path}: {e}", level=xbmc.LOGWARNING)
+        return self._index
+
+    def _close_index(self):
+        if self._index is not None:
+            self._index.close()
+            self._index = None
+
+    def _disk_signature(self):
+        return file_signature(self.index_path), file_signature(self.journal_path)
+
+    def _mark_in_sync(self):
+        """Record the cache generation and file signatures after loading or writing them ourselves."""
+        self._generation = get_cache_generation()
+        self._signature = self._disk_signature()
+
+    def _sync_with_disk(self):
+        """
+        Reload if another process changed the cache (generation bumped, or snapshot/journal
+        rewritten): the memory tier is dropped and the snapshot reopened, nothing is parsed
+        up front. Our own writes are always on disk, so nothing is lost by dropping memory.
+        """
+        if not self.enabled or not self.path:
+            return
+        generation = get_cache_generation()
+        signature = self._disk_signature()
+        if generation == self._generation and signature == self._signature:
+            return
+        xbmc.log("service.remove.black.bars.gbm: Cache changed by another process, reloading", level=xbmc.LOGINFO)
+        self._cache.clear()
+        self._close_index()
+        self._journal_records = self._replay_journal(self._cache)
+        self._generation = generation
+        self._signature = signature
+
+    def _iter_snapshot(self):
+        """Yield (key, value) pairs of the snapshot."""
+        index = self._get_index()
+        if index is None:
+            return
+        try:
+            yield from index.items()
+        except Exception as e:
+            xbmc.log(f"service.remove.black.bars.gbm: Failed to read cache {index.path}: {e}", level=xbmc.LOGWARNING)
+
+    def _replay_journal(self, cache):
+        """Apply journal records to cache. Returns the number of records replayed."""
+        journal_path = self.journal_path
+        if not journal_path or not os.path.exists(journal_path):
+            return 0
+        replayed = 0
+        try:
+            with open(journal_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                        cache[record["k"]] = record["v"]
+                        replayed += 1
+                    except (ValueError, KeyError, TypeError):
+                        # Torn write (power loss mid-append): skip the partial record
+                        xbmc.log("service.remove.black.bars.gbm: Skipping malformed cache journal record", level=xbmc.LOGDEBUG)
+            xbmc.log(f"service.remove.black.bars.gbm: Cache journal replayed: {replayed} records from {journal_path}", level=xbmc.LOGDEBUG)
+        except Exception as e:
+            xbmc.log(f"service.remove.black.bars.gbm: Failed to replay cache journal: {e}", level=xbmc.LOGWARNING)
+        return replayed
+
+    def _get_journal(self):
+        """
+        Return the journal records as a {key: value} dict. It is parsed again only when the
+        journal file signature changed (another process appended to it, or it was folded).
+        """
+        signature = file_signature(self.journal_path)
+        if self._journal is None or signature != self._journal_signature:
+            journal = {}
+            if signature is not None:
+                self._replay_journal(journal)
+            self._journal = journal
+            self._journal_signature = signature
+        return self._journal
+
+    def _iter_entries(self):
+        """Yield every (key, value) on disk: snapshot entries overridden by the journal."""
+        journal = dict(self._get_journal())
+        for key, value in self._iter_snapshot():
+            yield key, journal.pop(key, value)
+        yield from journal.items()
+
+    def _read_disk_entry(self, key):
+        """Read one entry from disk (journal first, then a binary search of the snapshot). Returns None if absent."""
+        if not self.enabled or not self.path:
+            return None
+        journal = self._get_journal()
+        if key in journal:
+            return journal[key]
+        index = self._get_index()
+        if index is None:
+            return None
+        try:
+            return index.get(key)
+        except Exception as e:
+            xbmc.log(f"service.remove.black.bars.gbm: Failed to read cache entry from {index.path}: {e}", level=xbmc.LOGWARNING)
+        return None
+
+    def _lookup(self, key):
+        """Get an entry from the memory tier, falling back to disk (result is kept in memory)."""
+        value = self._cache.get(key, _NOT_IN_MEMORY)
+        if value is _NOT_IN_MEMORY:
+            value = self._read_disk_entry(key)
+            # None is kept too: it records that the key is not on disk
+            self._cache[key] = value
+        return value
+
+    def _append_journal(self, key, value):
+        """Append one record to the journal, compacting it once it gets too long."""
+        if not self.enabled or not self.path:
+            return
+        try:
+            self._ensure_dir()
+            journal_current = self._journal is not None and file_signature(self.journal_path) == self._journal_signature
+            with open(self.journal_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"k": key, "v": value}, separators=(',', ':')) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self._journal_records += 1
+            self._signature = self._disk_signature()
+            if journal_current:
+                # Keep the parsed journal in step with our own append instead of parsing it again
+                self._journal[key] = value
+                self._journal_signature = file_signature(self.journal_path)
+        except Exception as e:
+            xbmc.log(f"service.remove.black.bars.gbm: Failed to append to cache journal {self.journal_path}: {e}", level=xbmc.LOGWARNING)
+            return
+        if self._journal_records >= CACHE_JOURNAL_MAX_RECORDS:
+            self._save()
 
     def _save(self):
+        """
+        Merge the journal into the snapshot on disk (entries evicted from memory are kept),
+        write it atomically (temp file + rename), then drop the journal.
+        """
         if not self.enabled or not self.path:
             return
+        tmp_path = self.index_path + ".tmp"
         try:
             self._ensure_dir()
-            with open(self.path, "w", encoding="utf-8") as f:
-                json.dump(self._cache, f)
-                xbmc.log(f"service.remove.black.bars.gbm: Cache saved: {len(self._cache)} entries", level=xbmc.LOGDEBUG)
+            written = write_ratio_index(tmp_path, self._iter_entries())
+            self._close_index()
+            os.replace(tmp_path, self.index_path)
+            # Journal records are all in the snapshot now (replaying them again would be harmless)
+            if os.path.exists(self.journal_path):
+                os.remove(self.journal_path)
+            self._journal_records = 0
+            self._signature = self._disk_signature()
+            xbmc.log(f"service.remove.black.bars.gbm: Cache saved: {written} entries", level=xbmc.LOGDEBUG)
         except Exception as e:
-            xbmc.log(f"service.remove.black.bars.gbm: Failed to save cache to {self.path}: {e}", level=xbmc.LOGWARNING)
+            xbmc.log(f"service.remove.black.bars.gbm: Failed to save cache to {self.index_path}: {e}", level=xbmc.LOGWARNING)
+            try:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+            except OSError:
+                pass
+
+    def compact(self):
+        """Fold the journal into the snapshot (called on service shutdown)."""
+        with self._lock:
+            self._sync_with_disk()
+            if self._journal_records > 0:
+                self._save()
+
+    def count(self):
+        """Number of cached ratios on disk (negative entries, {"miss": timestamp}, are not counted)."""
+        if not self.enabled or not self.path:
+            return sum(1 for value in self._cache.values() if _is_cached_ratio(value))
+        with self._lock:
+            # Index and journal read under the lock: a sync or compaction may swap them
+            self._sync_with_disk()
+            return sum(1 for _, value in self._iter_entries() if _is_cached_ratio(value))
+
+    def title_keys(self):
+        """Keys of the ratios cached by title ("title (year)"), not by imdb id."""
+        if not self.enabled or not self.path:
+            return []
+        with self._lock:
+            self._sync_with_disk()
+            return [key for key, value in self._iter_entries()
+                    if not key.startswith("imdb:") and _is_cached_ratio(value)]
 
     def clear(self):
         """Clear the cache"""
         try:
-            self._cache = {}
-            if self.path and os.path.exists(self.path):
-                os.remove(self.path)
-                xbmc.log(f"service.remove.black.bars.gbm: Cache cleared from {self.path}", level=xbmc.LOGINFO)
+            with self._lock:
+                self._cache = LruDict(self.memory_entries)
+                self._journal_records = 0
+                self._close_index()
+                removed = False
+                for path in (self.index_path, self.path, self.journal_path):
+                    if path and os.path.exists(path):
+                        os.remove(path)
+                        removed = True
+                bump_cache_generation()
+                self._mark_in_sync()
+            if removed:
+                xbmc.log(f"service.remove.black.bars.gbm: Cache cleared from {self.index_path}", level=xbmc.LOGINFO)
                 return True
         except Exception as e:
             xbmc.log(f"service.remove.black.bars.gbm: Failed to clear cache: {e}", level=xbmc.LOGWARNING)
@@ -270,15 +962,19 @@ class JsonCacheProvider:
     def get(self, title, year=None, imdb_id=None):
         try:
             key = self._make_key(title, year, imdb_id)
-            value = self._cache.get(key)
-            if value is not None:
-                ratio = int(value)
-                # Validate cached ratio
-                if ratio < MIN_VALID_RATIO or ratio > MAX_VALID_RATIO:
-                    xbmc.log(f"service.remove.black.bars.gbm: Invalid cached ratio: {ratio} for key '{key}' (valid range: {MIN_VALID_RATIO}-{MAX_VALID_RATIO})", level=xbmc.LOGWARNING)
-                    return None
-                return ratio
-            return None
+            with self._lock:
+                self._sync_with_disk()
+                value = self._lookup(key)
+            if value is None or isinstance(value, dict):
+                # Not in the user cache, or negative entry (IMDb miss, see has_fresh_miss()):
+                # fall back to the seed shipped with the addon
+                return get_seed_ratio(imdb_id) if self.enabled and self.use_seed else None
+            ratio = int(value)
+            # Validate cached ratio
+            if ratio < MIN_VALID_RATIO or ratio > MAX_VALID_RATIO:
+                xbmc.log(f"service.remove.black.bars.gbm: Invalid cached ratio: {ratio} for key '{key}' (valid range: {MIN_VALID_RATIO}-{MAX_VALID_RATIO})", level=xbmc.LOGWARNING)
+                return None
+            return ratio
         except Exception:
             return None
 
@@ -292,16 +988,411 @@ class JsonCacheProvider:
                 xbmc.log(f"service.remove.black.bars.gbm: Invalid ratio to store: {ratio_int} (valid range: {MIN_VALID_RATIO}-{MAX_VALID_RATIO})", level=xbmc.LOGWARNING)
                 return
             key = self._make_key(title, year, imdb_id)
-            self._cache[key] = ratio_int
-            self._save()
+            with self._lock:
+                self._sync_with_disk()
+                self._cache[key] = ratio_int
+                self._append_journal(key, ratio_int)
         except Exception as e:
             xbmc.log("service.remove.black.bars.gbm: Failed to store cache: " + str(e), level=xbmc.LOGWARNING)
 
+    def store_miss(self, title, year, imdb_id=None):
+        """Remember that IMDb has no ratio for this title (negative entry, expires after the TTL)."""
+        if self.negative_ttl_s <= 0:
+            return
+        try:
+            key = self._make_key(title, year, imdb_id)
+            value = {"miss": int(time.time())}
+            with self._lock:
+                self._sync_with_disk()
+                if isinstance(self._lookup(key), int):
+                    return  # Never replace a known ratio with a miss
+                self._cache[key] = value
+                self._append_journal(key, value)
+        except Exception as e:
+            xbmc.log("service.remove.black.bars.gbm: Failed to store cache miss: " + str(e), level=xbmc.LOGWARNING)
+
+    def has_fresh_miss(self, title, year=None, imdb_id=None):
+        """Return True if IMDb had no ratio for this title less than the TTL ago."""
+        try:
+            with self._lock:
+                self._sync_with_disk()
+                value = self._lookup(self._make_key(title, year, imdb_id))
+            if isinstance(value, dict) and "miss" in value:
+                return time.time() - value["miss"] < self.negative_ttl_s
+        except Exception:
+            pass
+        return False
+
+
+class SqliteCacheProvider:
+    """
+    IMDb ratio cache stored in a single SQLite file (cache.db), with point lookups from
+    disk instead of a dict of every entry in RAM. Same get/store API as JsonCacheProvider.
+    Rows are indexed by imdb id and by normalized title+year, and record source,
+    fetch timestamp and hit count. Rows of kind "miss" are negative entries (IMDb misses).
+    """
+
+    def __init__(self, enabled=True, negative_ttl_hours=NEGATIVE_CACHE_TTL_HOURS, use_seed=False):
+        self.enabled = enabled
+        self.use_seed = use_seed
+        self.negative_ttl_s = negative_ttl_hours * 3600
+        self.path = get_writable_cache_path("cache.db")
+        self._lock = threading.Lock()
+        self._conn = None
+        self._generation = None
+        self._db_inode = None
+        if self.enabled and not self.path:
+            xbmc.log("service.remove.black.bars.gbm: No writable cache path available, cache disabled", level=xbmc.LOGWARNING)
+            self.enabled = False
+
+    def _connect(self):
+        """Open the database on first use (creating the schema, and importing cache.json if new)."""
+        if self._conn is not None:
+            signature = file_signature(self.path)
+            if get_cache_generation() == self._generation and signature is not None and signature[0] == self._db_inode:
+                return self._conn
+            # Cleared or replaced by another process: reopen instead of writing to a deleted file
+            xbmc.log("service.remove.black.bars.gbm: Cache database changed by another process, reopening", level=xbmc.LOGINFO)
+            self._conn.close()
+            self._conn = None
+        is_new = not os.path.exists(self.path)
+        conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS ratios ("
+                "key TEXT PRIMARY KEY, "
+                "imdb_id TEXT, "
+                "title_key TEXT, "
+                "ratio INTEGER NOT NULL, "
+                "source TEXT, "
+                "fetched_at INTEGER, "
+                "hits INTEGER NOT NULL DEFAULT 0, "
+                "kind TEXT NOT NULL DEFAULT 'ratio')"
+            )
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(ratios)")}
+            if "kind" not in columns:
+                conn.execute("ALTER TABLE ratios ADD COLUMN kind TEXT NOT NULL DEFAULT 'ratio'")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_ratios_imdb_id ON ratios(imdb_id)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_ratios_title_key ON ratios(title_key)")
+            conn.commit()
+        except Exception:
+            conn.close()
+            raise
+        self._conn = conn
+        self._generation = get_cache_generation()
+        self._db_inode = file_signature(self.path)[0]
+        xbmc.log(f"service.remove.black.bars.gbm: Cache location: {self.path}", level=xbmc.LOGINFO)
+        if is_new:
+            self._import_json_cache()
+        return conn
+
+    def _import_json_cache(self):
+        """One-time import of an existing JSON cache (snapshot + journal) into a new database."""
+        json_cache = JsonCacheProvider(enabled=True)
+        if not json_cache.enabled:
+            return
+        now = int(time.time())
+        rows = []
+        for key, value in json_cache._iter_entries():
+            try:
+                ratio = int(value)
+            except (TypeError, ValueError):
+                continue
+            imdb_id = key[len("imdb:"):] if key.startswith("imdb:") else None
+            title_key = None if imdb_id else key
+            rows.append((key, imdb_id, title_key, ratio, "json", now))
+        if not rows:
+            return
+        self._conn.executemany(
+            "INSERT OR IGNORE INTO ratios (key, imdb_id, title_key, ratio, source, fetched_at) VALUES (?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+        self._conn.commit()
+        xbmc.log(f"service.remove.black.bars.gbm: Imported {len(rows)} entries from {json_cache.path} into {self.path}", level=xbmc.LOGINFO)
+
+    def _title_key(self, title, year=None):
+        key = (title or "").strip().lower()
+        if year:
+            key += f" ({year})"
+        return key
+
+    def _make_key(self, title, year=None, imdb_id=None):
+        if imdb_id:
+            return "imdb:" + str(imdb_id)
+        return self._title_key(title, year)
+
+    def get(self, title, year=None, imdb_id=None):
+        if not self.enabled:
+            return None
+        try:
+            with self._lock:
+                conn = self._connect()
+                row = self._find(conn, title, year, imdb_id, "ratio")
+                if row is None:
+                    return get_seed_ratio(imdb_id) if self.use_seed else None
+                key, ratio, _ = row
+                conn.execute("UPDATE ratios SET hits = hits + 1 WHERE key = ?", (key,))
+                conn.commit()
+            # Validate cached ratio
+            if ratio < MIN_VALID_RATIO or ratio > MAX_VALID_RATIO:
+                xbmc.log(f"service.remove.black.bars.gbm: Invalid cached ratio: {ratio} for key '{key}' (valid range: {MIN_VALID_RATIO}-{MAX_VALID_RATIO})", level=xbmc.LOGWARNING)
+                return None
+            return ratio
+        except Exception as e:
+            xbmc.log(f"service.remove.black.bars.gbm: Failed to read cache database: {e}", level=xbmc.LOGWARNING)
+            return None
+
+    def _find(self, conn, title, year, imdb_id, kind):
+        """Return (key, ratio, fetched_at) of the row of the given kind, or None."""
+        if imdb_id:
+            return conn.execute("SELECT key, ratio, fetched_at FROM ratios WHERE imdb_id = ? AND kind = ? LIMIT 1", (str(imdb_id), kind)).fetchone()
+        return conn.execute("SELECT key, ratio, fetched_at FROM ratios WHERE title_key = ? AND kind = ? LIMIT 1", (self._title_key(title, year), kind)).fetchone()
+
+    def store(self, title, year, ratio, imdb_id=None, source="imdb"):
+        if not self.enabled:
+            return
+        try:
+            # Validate ratio before storing
+            if ratio is None:
+                return
+            ratio_int = int(ratio)
+            if ratio_int < MIN_VALID_RATIO or ratio_int > MAX_VALID_RATIO:
+                xbmc.log(f"service.remove.black.bars.gbm: Invalid ratio to store: {ratio_int} (valid range: {MIN_VALID_RATIO}-{MAX_VALID_RATIO})", level=xbmc.LOGWARNING)
+                return
+            key = self._make_key(title, year, imdb_id)
+            with self._lock:
+                conn = self._connect()
+                conn.execute(
+                    "INSERT INTO ratios (key, imdb_id, title_key, ratio, source, fetched_at, kind) VALUES (?, ?, ?, ?, ?, ?, 'ratio') "
+                    "ON CONFLICT(key) DO UPDATE SET title_key = COALESCE(excluded.title_key, ratios.title_key), ratio = excluded.ratio, "
+                    "source = excluded.source, fetched_at = excluded.fetched_at, kind = 'ratio'",
+                    (key, str(imdb_id) if imdb_id else None, self._title_key(title, year) if (title or not imdb_id) else None,
+                     ratio_int, source, int(time.time())),
+                )
+                conn.commit()
+        except Exception as e:
+            xbmc.log("service.remove.black.bars.gbm: Failed to store cache: " + str(e), level=xbmc.LOGWARNING)
+
+    def store_miss(self, title, year, imdb_id=None):
+        """Remember that IMDb has no ratio for this title (negative entry, expires after the TTL)."""
+        if not self.enabled or self.negative_ttl_s <= 0:
+            return
+        try:
+            key = self._make_key(title, year, imdb_id)
+            with self._lock:
+                conn = self._connect()
+                # Never replace a known ratio with a miss
+                conn.execute(
+                    "INSERT INTO ratios (key, imdb_id, title_key, ratio, source, fetched_at, kind) VALUES (?, ?, ?, 0, 'imdb', ?, 'miss') "
+                    "ON CONFLICT(key) DO UPDATE SET fetched_at = excluded.fetched_at WHERE kind = 'miss'",
+                    (key, str(imdb_id) if imdb_id else None, self._title_key(title, year) if (title or not imdb_id) else None,
+                     int(time.time())),
+                )
+                conn.commit()
+        except Exception as e:
+            xbmc.log("service.remove.black.bars.gbm: Failed to store cache miss: " + str(e), level=xbmc.LOGWARNING)
+
+    def has_fresh_miss(self, title, year=None, imdb_id=None):
+        """Return True if IMDb had no ratio for this title less than the TTL ago."""
+        if not self.enabled:
+            return False
+        try:
+            with self._lock:
+                row = self._find(self._connect(), title, year, imdb_id, "miss")
+            return row is not None and time.time() - row[2] < self.negative_ttl_s
+        except Exception as e:
+            xbmc.log(f"service.remove.black.bars.gbm: Failed to read cache database: {e}", level=xbmc.LOGWARNING)
+            return False
+
+    def count(self):
+        """Number of cached ratios (rows of kind "miss" are not counted)."""
+        if not self.enabled:
+            return 0
+        try:
+            with self._lock:
+                return self._connect().execute("SELECT COUNT(*) FROM ratios WHERE kind = 'ratio'").fetchone()[0]
+        except Exception as e:
+            xbmc.log(f"service.remove.black.bars.gbm: Failed to count cache entries: {e}", level=xbmc.LOGWARNING)
+            return 0
+
+    def title_keys(self):
+        """Keys of the ratios cached by title ("title (year)"), not by imdb id."""
+        if not self.enabled:
+            return []
+        try:
+            with self._lock:
+                rows = self._connect().execute("SELECT key FROM ratios WHERE kind = 'ratio' AND key NOT LIKE 'imdb:%'").fetchall()
+            return [row[0] for row in rows]
+        except Exception as e:
+            xbmc.log(f"service.remove.black.bars.gbm: Failed to list cache entries: {e}", level=xbmc.LOGWARNING)
+            return []
+
+    def compact(self):
+        """Checkpoint the WAL and close the database (called on service shutdown)."""
+        with self._lock:
+            if self._conn is None:
+                return
+            try:
+                self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+                self._conn.close()
+            except Exception as e:
+                xbmc.log(f"service.remove.black.bars.gbm: Failed to close cache database: {e}", level=xbmc.LOGWARNING)
+            self._conn = None
+
+    def clear(self):
+        """Clear the cache"""
+        try:
+            with self._lock:
+                if self._conn is not None:
+                    self._conn.close()
+                    self._conn = None
+                removed = False
+                for suffix in ("", "-wal", "-shm"):
+                    path = self.path + suffix if self.path else None
+                    if path and os.path.exists(path):
+                        os.remove(path)
+                        removed = True
+                bump_cache_generation()
+            if removed:
+                xbmc.log(f"service.remove.black.bars.gbm: Cache cleared from {self.path}", level=xbmc.LOGINFO)
+                return True
+        except Exception as e:
+            xbmc.log(f"service.remove.black.bars.gbm: Failed to clear cache: {e}", level=xbmc.LOGWARNING)
+        return False
+
+
+def create_cache_provider(enabled=True, backend="JSON", negative_ttl_hours=NEGATIVE_CACHE_TTL_HOURS,
+                          memory_entries=CACHE_MEMORY_ENTRIES, use_seed=False):
+    """
+    Create the ratio cache for the configured storage backend.
+    
+    Args:
+        enabled: Whether the cache is enabled
+        backend: "JSON" (default) or "SQLite"
+        negative_ttl_hours: How long IMDb misses are remembered (0 disables negative caching)
+        memory_entries: Maximum number of entries kept in memory (JSON backend; SQLite reads from disk)
+        use_seed: Whether the seed database shipped with the addon is consulted after the user cache
+    """
+    if (backend or "").lower() == "sqlite":
+        return SqliteCacheProvider(enabled=enabled, negative_ttl_hours=negative_ttl_hours, use_seed=use_seed)
+    return JsonCacheProvider(enabled=enabled, negative_ttl_hours=negative_ttl_hours, memory_entries=memory_entries,
+                             use_seed=use_seed)
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker around IMDb lookups.
+
+    Closed: lookups go to the network. After failure_threshold consecutive lookups that
+    could not reach IMDb, the circuit opens: lookups are skipped without any request, so
+    detection falls back to Kodi metadata at once. After open_seconds a probe runs on a
+    background timer (half-open): if IMDb answers the circuit closes, otherwise it opens
+    again for twice as long, up to max_open_seconds.
+    """
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(self, probe, failure_threshold=CIRCUIT_FAILURE_THRESHOLD, open_seconds=CIRCUIT_OPEN_SECONDS,
+                 max_open_seconds=CIRCUIT_MAX_OPEN_SECONDS):
+        self._probe_func = probe
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.max_open_seconds = max_open_seconds
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._current_open_seconds = open_seconds
+        self._timer = None
+        self._closed = False
+
+    @property
+    def state(self):
+        return self._state
+
+    def allow(self):
+        """True if lookups may go to the network."""
+        return self._state == self.CLOSED
+
+    def record_success(self):
+        """IMDb answered (with or without a ratio)."""
+        with self._lock:
+            self._failures = 0
+
+    def record_failure(self):
+        """IMDb could not be reached."""
+        with self._lock:
+            self._failures += 1
+            if self._state == self.CLOSED and self._failures >= self.failure_threshold:
+                self._open()
+
+    def _open(self):
+        """Open the circuit and schedule the half-open probe (lock held)."""
+        self._state = self.OPEN
+        xbmc.log(f"service.remove.black.bars.gbm: IMDb circuit open after {self._failures} failed lookup(s): "
+                 f"skipping IMDb, probing again in {self._current_open_seconds}s", level=xbmc.LOGINFO)
+        if self._closed:
+            return
+        self._timer = threading.Timer(self._current_open_seconds, self._probe)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _probe(self):
+        """Half-open: check whether IMDb is reachable again."""
+        with self._lock:
+            if self._state != self.OPEN or self._closed:
+                return
+            self._state = self.HALF_OPEN
+        xbmc.log("service.remove.black.bars.gbm: IMDb circuit half-open: probing IMDb", level=xbmc.LOGDEBUG)
+        try:
+            reachable = self._probe_func()
+        except Exception as e:
+            xbmc.log(f"service.remove.black.bars.gbm: IMDb probe error: {e}", level=xbmc.LOGDEBUG)
+            reachable = False
+        with self._lock:
+            if reachable:
+                self._state = self.CLOSED
+                self._failures = 0
+                self._current_open_seconds = self.open_seconds
+                xbmc.log("service.remove.black.bars.gbm: IMDb circuit closed: IMDb reachable again", level=xbmc.LOGINFO)
+            else:
+                self._current_open_seconds = min(self._current_open_seconds * 2, self.max_open_seconds)
+                self._open()
+
+    def close(self):
+        """Cancel the pending probe (service stopping)."""
+        with self._lock:
+            self._closed = True
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
 
 class IMDbProvider:
-    def get_aspect_ratio(self, title, imdb_number=None):
+    def __init__(self, speculative=True):
+        self._state = threading.local()
+        self.speculative = speculative  # Fetch the title and technical pages at the same time
+        self.breaker = CircuitBreaker(probe_imdb)
+
+    def close(self):
+        self.breaker.close()
+
+    def was_unavailable(self):
+        """True if the last get_aspect_ratio() call on this thread failed because IMDb was unreachable."""
+        return getattr(self._state, "unavailable", False)
+
+    def get_aspect_ratio(self, title, imdb_number=None, year=None, media_type=None, original_title=None, deadline=None):
+        self._state.unavailable = False
+        if not self.breaker.allow():
+            self._state.unavailable = True
+            xbmc.log(f"service.remove.black.bars.gbm: IMDbProvider: circuit {self.breaker.state}, IMDb skipped", level=xbmc.LOGDEBUG)
+            return None
         try:
-            value = getOriginalAspectRatio(title, imdb_number=imdb_number)
+            value = getOriginalAspectRatio(title, imdb_number=imdb_number, year=year,
+                                           media_type=media_type, original_title=original_title,
+                                           speculative=self.speculative, deadline=deadline)
+            self.breaker.record_success()
             if isinstance(value, list):
                 value = value[0] if value else None
             if value:
@@ -311,11 +1402,308 @@ class IMDbProvider:
                     xbmc.log(f"service.remove.black.bars.gbm: Invalid IMDb ratio: {ratio} for '{title}' (valid range: {MIN_VALID_RATIO}-{MAX_VALID_RATIO})", level=xbmc.LOGWARNING)
                     return None
                 return ratio
+        except IMDbDeadlineError as e:
+            # Out of time-to-zoom budget: not a miss, and not held against IMDb by the breaker
+            self._state.unavailable = True
+            xbmc.log("service.remove.black.bars.gbm: IMDbProvider: time-to-zoom budget spent: " + str(e), level=xbmc.LOGDEBUG)
+        except IMDbUnavailableError as e:
+            self._state.unavailable = True
+            self.breaker.record_failure()
+            xbmc.log("service.remove.black.bars.gbm: IMDbProvider: IMDb unavailable: " + str(e), level=xbmc.LOGWARNING)
         except Exception as e:
             xbmc.log("service.remove.black.bars.gbm: IMDbProvider error: " + str(e), level=xbmc.LOGWARNING)
         return None
 
 
+class RatioQuery:
+    """What the ratio sources know about the playing item."""
+
+    def __init__(self, title=None, year=None, imdb_number=None, media_type=None, original_title=None,
+                 video_info_tag=None, imdb_enabled=True, cancelled=None):
+        self.title = title
+        self.year = year
+        self.imdb_number = imdb_number
+        self.media_type = media_type
+        self.original_title = original_title
+        self.video_info_tag = video_info_tag
+        self.imdb_enabled = imdb_enabled
+        self.cancelled = cancelled
+
+
+class RatioSource:
+    """
+    A source of aspect ratios registered with the RatioResolver: its cost class (COST_*)
+    decides whether it is asked in turn or raced, its confidence (CONFIDENCE_*) whether
+    its answer ends the resolution or is only kept as fallback.
+    """
+    name = None
+    cost = COST_NETWORK
+    confidence = CONFIDENCE_LOW
+
+    def enabled(self, query):
+        return True
+
+    def lookup(self, query, deadline=None):
+        """
+        Return a ratio (int) for query, or None. deadline: time.monotonic() value, or None.
+        Overridden by every source; the base class never answers.
+        """
+        return None
+
+
+class CacheRatioSource(RatioSource):
+    """Ratios cached from earlier IMDb lookups, then the seed database."""
+    name = "cache"
+    cost = COST_LOCAL_DISK
+    confidence = CONFIDENCE_HIGH
+
+    def __init__(self, service):
+        self.service = service
+
+    def enabled(self, query):
+        return query.imdb_enabled
+
+    def lookup(self, query, deadline=None):
+        ratio = self.service.cache.get(query.title, query.year, imdb_id=query.imdb_number)
+        if ratio:
+            xbmc.log(f"service.remove.black.bars.gbm: IMDb cache hit: imdb_ratio={ratio}", level=xbmc.LOGDEBUG)
+        return ratio
+
+
+class SidecarRatioSource(RatioSource):
+    """
+    Ratio read from the .nfo / JSON files next to the video (see SidecarReader): "original"
+    is the content ratio (high confidence), "aspect" the file ratio (low confidence).
+    """
+    cost = COST_LOCAL_DISK
+
+    def __init__(self, service, reader, field, name, confidence):
+        self.service = service
+        self.reader = reader
+        self.field = field
+        self.name = name
+        self.confidence = confidence
+
+    def enabled(self, query):
+        return query.video_info_tag is not None and self.service._get_sidecar_enabled()
+
+    def lookup(self, query, deadline=None):
+        ratio = self.reader.read(query.video_info_tag.getFilenameAndPath())[self.field]
+        if ratio:
+            xbmc.log(f"service.remove.black.bars.gbm: Sidecar {self.field} ratio: {ratio}", level=xbmc.LOGDEBUG)
+        return ratio
+
+
+class MediaProbeRatioSource(RatioSource):
+    """
+    Ratio read from the header of the video file itself (see media_probe), without waiting
+    for the player: "frame" is the file ratio (low confidence), "cropped" the ratio of the
+    picture inside the container's crop, i.e. without the encoded bars (high confidence).
+    A crop that changes the ratio by less than ratio_threshold() only trims overscan and
+    is not an answer.
+    """
+    cost = COST_LOCAL_DISK
+
+    def __init__(self, service, field, name, confidence):
+        self.service = service
+        self.field = field
+        self.name = name
+        self.confidence = confidence
+
+    def enabled(self, query):
+        return query.video_info_tag is not None and self.service._get_probe_enabled()
+
+    def lookup(self, query, deadline=None):
+        path = query.video_info_tag.getFilenameAndPath()
+        if not is_supported(path):
+            return None
+        try:
+            geometry = probe_file(path)
+        except (MediaProbeError, OSError) as e:
+            xbmc.log(f"service.remove.black.bars.gbm: Media probe {path}: {e}", level=xbmc.LOGDEBUG)
+            return None
+        ratio = geometry.frame_ratio() if self.field == "frame" else geometry.cropped_ratio()
+        if ratio is None or not MIN_VALID_RATIO <= ratio <= MAX_VALID_RATIO:
+            return None
+        if self.field == "cropped" and abs(ratio - geometry.frame_ratio()) < ratio_threshold(ratio):
+            xbmc.log(f"service.remove.black.bars.gbm: Media probe crop ignored: {geometry.frame_ratio()} -> {ratio} "
+                     f"is overscan, not encoded bars ({geometry})", level=xbmc.LOGDEBUG)
+            return None
+        xbmc.log(f"service.remove.black.bars.gbm: Media probe {self.field} ratio: {ratio} ({geometry})", level=xbmc.LOGDEBUG)
+        return ratio
+
+
+class IMDbRatioSource(RatioSource):
+    """IMDb lookups; results and misses go to the cache, network failures do not."""
+    name = "imdb"
+    cost = COST_NETWORK
+    confidence = CONFIDENCE_HIGH
+
+    def __init__(self, service):
+        self.service = service
+
+    def enabled(self, query):
+        if not query.imdb_enabled:
+            return False
+        if self.service.cache.has_fresh_miss(query.title, query.year, imdb_id=query.imdb_number):
+            xbmc.log("service.remove.black.bars.gbm: IMDb negative cache hit: skipping API, using Kodi metadata", level=xbmc.LOGDEBUG)
+            return False
+        return True
+
+    def lookup(self, query, deadline=None):
+        if deadline is not None and time.monotonic() >= deadline:
+            xbmc.log("service.remove.black.bars.gbm: IMDb cache miss, time-to-zoom budget spent: skipping API", level=xbmc.LOGDEBUG)
+            return None
+        xbmc.log("service.remove.black.bars.gbm: IMDb cache miss, querying API", level=xbmc.LOGDEBUG)
+        cache = self.service.cache
+        imdb = self.service.imdb
+        ratio = imdb.get_aspect_ratio(query.title, imdb_number=query.imdb_number, year=query.year,
+                                      media_type=query.media_type, original_title=query.original_title, deadline=deadline)
+        if ratio:
+            xbmc.log(f"service.remove.black.bars.gbm: IMDb API result: imdb_ratio={ratio}", level=xbmc.LOGDEBUG)
+            cache.store(query.title, query.year, ratio, imdb_id=query.imdb_number)
+        elif imdb.was_unavailable():
+            # Network failure is not a miss: try again on next play
+            xbmc.log("service.remove.black.bars.gbm: IMDb API unavailable: no ratio found", level=xbmc.LOGDEBUG)
+        else:
+            xbmc.log("service.remove.black.bars.gbm: IMDb API: no ratio found", level=xbmc.LOGDEBUG)
+            cache.store_miss(query.title, query.year, imdb_id=query.imdb_number)
+        return ratio
+
+
+class KodiRatioSource(RatioSource):
+    """File ratio from Kodi's streamdetails / VideoAspect (the frame, encoded black bars included)."""
+    name = "kodi"
+    cost = COST_LOCAL_IPC
+    confidence = CONFIDENCE_LOW
+
+    def __init__(self, service):
+        self.service = service
+
+    def lookup(self, query, deadline=None):
+        return self.service.kodi.get_aspect_ratio(query.video_info_tag, reason="for ratio detection", player=self.service,
+                                                  cancelled=query.cancelled, deadline=deadline)
+
+
+class RatioAnswers:
+    """Answers collected by RatioResolver.resolve(), in arrival order."""
+
+    def __init__(self):
+        self._answers = []  # (source, ratio)
+
+    def add(self, source, ratio):
+        if ratio:
+            self._answers.append((source, ratio))
+
+    def get(self, name):
+        """Ratio answered by the source called name, or None."""
+        for source, ratio in self._answers:
+            if source.name == name:
+                return ratio
+        return None
+
+    def first(self, names):
+        """(source, ratio) of the first source of names, in that order, that answered, or (None, None)."""
+        for name in names:
+            for source, ratio in self._answers:
+                if source.name == name:
+                    return source, ratio
+        return None, None
+
+    def winner(self):
+        """(source, ratio) of the first high-confidence answer, or (None, None)."""
+        for source, ratio in self._answers:
+            if source.confidence >= CONFIDENCE_HIGH:
+                return source, ratio
+        return None, None
+
+    def best(self):
+        """(source, ratio) of the most confident answer (first one on ties), or (None, None)."""
+        if not self._answers:
+            return None, None
+        return max(self._answers, key=lambda answer: answer[0].confidence)
+
+
+class RatioResolver:
+    """
+    Registry of ratio sources. resolve() asks the cheap sources in cost order, then races
+    the expensive ones concurrently; the first high-confidence answer ends it.
+    """
+
+    def __init__(self):
+        self._sources = []
+
+    def register(self, source):
+        """Add a source; sources of the same cost class keep their registration order."""
+        self._sources.append(source)
+        self._sources.sort(key=lambda registered: registered.cost)
+        return source
+
+    def sources(self):
+        return list(self._sources)
+
+    def _lookup(self, source, query, deadline):
+        try:
+            return source.lookup(query, deadline)
+        except (DetectionCancelled, DetectionBudgetExceeded):
+            raise
+        except Exception as e:
+            xbmc.log(f"service.remove.black.bars.gbm: Ratio source {source.name} error: {e}", level=xbmc.LOGWARNING)
+            return None
+
+    @staticmethod
+    def _needed(source, answers, wait_for):
+        """True while the answer of source could still change the outcome."""
+        if source.confidence >= CONFIDENCE_HIGH and answers.winner()[0] is None:
+            return True
+        if source.name in wait_for and not any(answers.get(name) for name in wait_for):
+            return True
+        return answers.best()[0] is None
+
+    def resolve(self, query, token=None, wait_for=()):
+        """
+        Ask the enabled sources for query. One answer from the sources named in wait_for
+        is needed whatever wins (the first of them to answer is enough); other sources are
+        skipped or abandoned once a high-confidence answer is in. With a token, waiting
+        stops when it is cancelled (DetectionCancelled) or its budget is spent (answers so
+        far are kept). Returns RatioAnswers.
+        """
+        deadline = token.deadline if token else None
+        answers = RatioAnswers()
+        racers = []
+        for source in self._sources:
+            if not source.enabled(query):
+                continue
+            if source.cost >= RACE_MIN_COST:
+                racers.append(source)
+            elif self._needed(source, answers, wait_for):
+                answers.add(source, self._lookup(source, query, deadline))
+        racers = [source for source in racers if self._needed(source, answers, wait_for)]
+        if not racers:
+            return answers
+
+        executor = ThreadPoolExecutor(max_workers=len(racers))
+        try:
+            pending = {executor.submit(self._lookup, source, query, deadline): source for source in racers}
+            while pending:
+                if not any(self._needed(source, answers, wait_for) for source in pending.values()):
+                    xbmc.log(f"service.remove.black.bars.gbm: Ratio sources dropped: {', '.join(s.name for s in pending.values())}"
+                             f" (answer from {answers.best()[0].name})", level=xbmc.LOGDEBUG)
+                    break
+                try:
+                    done = token.wait_any(list(pending)) if token else wait(list(pending), return_when=FIRST_COMPLETED)[0]
+                except DetectionBudgetExceeded as e:
+                    # An abandoned IMDb request finishes in the background (its result is still cached)
+                    xbmc.log(f"service.remove.black.bars.gbm: Ratio sources abandoned: {', '.join(s.name for s in pending.values())}: {e}",
+                             level=xbmc.LOGINFO)
+                    break
+                for future in done:
+                    answers.add(pending.pop(future), future.result())
+        finally:
+            executor.shutdown(wait=False)
+        return answers
+
+
 class ZoomApplier:
     def __init__(self):
         self.last_zoom_time_ms = 0
@@ -576,10 +1964,26 @@ class Service(xbmc.Player):
         self.monitor = xbmc.Monitor()
         self.zoom = ZoomApplier()
         self.kodi = KodiMetadataProvider()
+        self.detection = DetectionWorker()
         self._addon = xbmcaddon.Addon()
         cache_enabled = self._get_cache_enabled()
-        self.cache = JsonCacheProvider(enabled=cache_enabled)
-        self.imdb = IMDbProvider()
+        self.cache = create_cache_provider(enabled=cache_enabled, backend=self._get_cache_backend(),
+                                           negative_ttl_hours=self._get_negative_cache_ttl_hours(),
+                                           memory_entries=self._get_cache_memory_entries(),
+                                           use_seed=self._get_seed_enabled())
+        self.imdb = IMDbProvider(speculative=self._get_speculative_fetch())
+        self.ratios = RatioResolver()
+        self.ratios.register(CacheRatioSource(self))
+        self.ratios.register(MediaProbeRatioSource(self, "cropped", "probe_crop", CONFIDENCE_HIGH))
+        self.ratios.register(MediaProbeRatioSource(self, "frame", "probe", CONFIDENCE_LOW))
+        sidecar = SidecarReader()
+        self.ratios.register(SidecarRatioSource(self, sidecar, "original", "nfo", CONFIDENCE_HIGH))
+        self.ratios.register(SidecarRatioSource(self, sidecar, "aspect", "nfo_aspect", CONFIDENCE_LOW))
+        self.ratios.register(IMDbRatioSource(self))
+        self.ratios.register(KodiRatioSource(self))
+        # Success rate and cost of the IMDb extraction strategies, kept across restarts
+        load_strategy_stats(get_writable_cache_path(STRATEGY_STATS_FILENAME))
+        configure_page_store(translate_profile_path(PAGE_STORE_DIRNAME), get_page_store_mb(self._addon) * 1024 * 1024)
 
         if "toggle" in sys.argv:
             if xbmcgui.Window(10000).getProperty("removeblackbars_status") == "on":
@@ -641,6 +2045,62 @@ class Service(xbmc.Player):
         except Exception:
             return True
 
+    def _get_seed_enabled(self):
+        """Check if the seed database shipped with the addon is consulted (off by default)."""
+        try:
+            return self._addon.getSetting("use_seed_database") == "true"
+        except Exception:
+            return False
+
+    def _get_cache_backend(self):
+        """Get the cache storage backend from settings ("JSON" or "SQLite")."""
+        try:
+            return self._addon.getSetting("cache_backend") or "JSON"
+        except Exception:
+            return "JSON"
+
+    def _get_negative_cache_ttl_hours(self):
+        """Get how long IMDb misses are cached, in hours (0 disables negative caching)."""
+        try:
+            return max(0, int(self._addon.getSetting("negative_cache_ttl_hours") or NEGATIVE_CACHE_TTL_HOURS))
+        except Exception:
+            return NEGATIVE_CACHE_TTL_HOURS
+
+    def _get_cache_memory_entries(self):
+        """Get the maximum number of cache entries kept in memory."""
+        try:
+            return max(1, int(self._addon.getSetting("cache_memory_entries") or CACHE_MEMORY_ENTRIES))
+        except Exception:
+            return CACHE_MEMORY_ENTRIES
+
+    def _get_sidecar_enabled(self):
+        """Check if .nfo / JSON files next to the video are read."""
+        try:
+            return self._addon.getSetting("read_sidecar_files") != "false"
+        except Exception:
+            return True
+
+    def _get_probe_enabled(self):
+        """Check if the header of local video files is read for their geometry."""
+        try:
+            return self._addon.getSetting("read_file_headers") != "false"
+        except Exception:
+            return True
+
+    def _get_detection_budget_s(self):
+        """Get the time-to-zoom budget in seconds (0 disables it)."""
+        try:
+            return max(0, int(self._addon.getSetting("detection_budget_s") or DETECTION_BUDGET_S))
+        except Exception:
+            return DETECTION_BUDGET_S
+
+    def _get_speculative_fetch(self):
+        """Check if the IMDb title and technical pages are fetched at the same time."""
+        try:
+            return self._addon.getSetting("speculative_fetch") != "false"
+        except Exception:
+            return True
+
     def _extract_title_year(self, video_info_tag):
         """Extract title and year from video info tag."""
         title = None
@@ -661,7 +2121,31 @@ class Service(xbmc.Player):
             pass
         return title, year
 
-    def _detect_aspect_ratio(self):
+    def _extract_search_hints(self, video_info_tag):
+        """Extract media type and original title (when it differs from the title) for the IMDb title search."""
+        media_type = None
+        original_title = None
+        try:
+            media_type = video_info_tag.getMediaType() or None
+            if media_type != "episode":
+                original_title = video_info_tag.getOriginalTitle() or None
+                if original_title and original_title == video_info_tag.getTitle():
+                    original_title = None
+        except Exception:
+            pass
+        return media_type, original_title
+
+    def _detect_aspect_ratio(self, token=None):
+        """
+        Detect the aspect ratio of the playing video.
+        
+        Args:
+            token: Optional DetectionToken; detection stops early once it is cancelled
+        
+        Returns:
+            Tuple (detected_ratio, file_ratio, title_display), or None
+        """
+        cancelled = token.is_cancelled if token else None
         try:
             if not self.isPlayingVideo():
                 xbmc.log("service.remove.black.bars.gbm: Detection skipped: not playing video", level=xbmc.LOGDEBUG)
@@ -672,6 +2156,7 @@ class Service(xbmc.Player):
                 return None
 
             title, year = self._extract_title_year(video_info_tag)
+            media_type, original_title = self._extract_search_hints(video_info_tag)
 
             # Get IMDb number from JSON-RPC (more reliable than title search)
             imdb_number = None
@@ -704,81 +2189,71 @@ class Service(xbmc.Player):
             xbmc.log(f"service.remove.black.bars.gbm: Detecting black bars for {title_display}", level=xbmc.LOGINFO)
             xbmc.log(f"service.remove.black.bars.gbm: Detection: title='{title}', year={year}, imdb_id={imdb_number}", level=xbmc.LOGDEBUG)
 
-            # 1) IMDb (first priority, cache only IMDb results)
+            # Content ratio from the high-confidence sources (cache, IMDb), raced with the
+            # streamdetails polling: file_ratio is needed either way (encoded black bars
+            # detection or fallback), so time-to-zoom is the longer of the lookups, not their sum.
             imdb_enabled, _ = self._read_settings()
-            imdb_ratio = None
+            query = RatioQuery(title, year, imdb_number, media_type, original_title, video_info_tag,
+                               imdb_enabled=imdb_enabled, cancelled=cancelled)
+            answers = self.ratios.resolve(query, token, wait_for=FILE_RATIO_SOURCES)
+            content_source, imdb_ratio = answers.winner()
+            file_source, file_ratio_temp = answers.first(FILE_RATIO_SOURCES)
             file_ratio = None
             file_ratio_detected = None  # Always store detected file_ratio for logging, even if not used
-            encoded_black_bars_detected = False
-            
-            if imdb_enabled:
-                # Try cache first (use IMDb number if available for more precise cache key)
-                imdb_ratio = self.cache.get(title, year, imdb_id=imdb_number)
-                if imdb_ratio:
-                    xbmc.log(f"service.remove.black.bars.gbm: IMDb cache hit: imdb_ratio={imdb_ratio}", level=xbmc.LOGDEBUG)
+
+            # If we have IMDb ratio, use file ratio for encoded black bars detection
+            # NOTE: We only use file_ratio if it's very close to 16:9 (likely encoded bars)
+            # Otherwise, differences can be due to encoding/container issues, not actual encoded bars
+            if imdb_ratio:
+                if file_ratio_temp:
+                    file_ratio_detected = file_ratio_temp  # Always store for logging
+                    xbmc.log(f"service.remove.black.bars.gbm: file_ratio retrieved: {file_ratio_temp} from {file_source.name} (imdb_ratio={imdb_ratio})", level=xbmc.LOGDEBUG)
                 else:
-                    xbmc.log("service.remove.black.bars.gbm: IMDb cache miss, querying API", level=xbmc.LOGDEBUG)
-                    imdb_ratio = self.imdb.get_aspect_ratio(title, imdb_number=imdb_number)
-                    if imdb_ratio:
-                        xbmc.log(f"service.remove.black.bars.gbm: IMDb API result: imdb_ratio={imdb_ratio}", level=xbmc.LOGDEBUG)
-                        self.cache.store(title, year, imdb_ratio, imdb_id=imdb_number)
-                    else:
-                        xbmc.log("service.remove.black.bars.gbm: IMDb API: no ratio found", level=xbmc.LOGDEBUG)
-                
-                # If we have IMDb ratio, get file ratio for encoded black bars detection
-                # NOTE: We only use file_ratio if it's very close to 16:9 (likely encoded bars)
-                # Otherwise, differences can be due to encoding/container issues, not actual encoded bars
-                if imdb_ratio:
-                    file_ratio_temp = self.kodi.get_aspect_ratio(video_info_tag, reason="for encoded black bars detection", player=self)
-                    if file_ratio_temp:
-                        file_ratio_detected = file_ratio_temp  # Always store for logging
-                        xbmc.log(f"service.remove.black.bars.gbm: file_ratio retrieved: {file_ratio_temp} (imdb_ratio={imdb_ratio})", level=xbmc.LOGDEBUG)
+                    xbmc.log(f"service.remove.black.bars.gbm: file_ratio is None (imdb_ratio={imdb_ratio}). Zoom calculation will use detected_ratio only, may be incorrect!", level=xbmc.LOGDEBUG)
+                if file_ratio_temp:
+                    difference = abs(file_ratio_temp - imdb_ratio)
+                    threshold = ratio_threshold(imdb_ratio)  # 5% of IMDb ratio, minimum 5
+                    
+                    # Use file_ratio if:
+                    # 1. Difference is significant (> threshold) AND (file_ratio is close to 16:9 OR content is close to 16:9)
+                    #    → Encoded black bars or cases like Invasion
+                    # 2. Difference exists (> 0) AND neither file nor content is close to 16:9
+                    #    → Cases like Basil/Le Baron Rouge/The Artist where file_ratio should be used directly
+                    tolerance_min, tolerance_max = self.zoom._get_16_9_tolerance(self)
+                    file_is_16_9 = tolerance_min <= file_ratio_temp <= tolerance_max
+                    content_is_16_9 = tolerance_min <= imdb_ratio <= tolerance_max
+                    
+                    if difference >= threshold and (file_is_16_9 or content_is_16_9):
+                        # Case 1: Encoded black bars or content/file close to 16:9
+                        file_ratio = file_ratio_temp
+                        if file_is_16_9 and not content_is_16_9:
+                            xbmc.log(f"service.remove.black.bars.gbm: Encoded black bars detected: imdb_ratio={imdb_ratio}, file_ratio={file_ratio}, diff={difference}, threshold={threshold}", level=xbmc.LOGDEBUG)
+                        else:
+                            xbmc.log(f"service.remove.black.bars.gbm: File ratio differs: imdb_ratio={imdb_ratio}, file_ratio={file_ratio}, diff={difference}, threshold={threshold}", level=xbmc.LOGDEBUG)
+                    elif difference > 0 and not file_is_16_9 and not content_is_16_9:
+                        # Case 2: Neither close to 16:9, use file_ratio directly for zoom calculation
+                        file_ratio = file_ratio_temp
+                        xbmc.log(f"service.remove.black.bars.gbm: Using file_ratio directly: imdb_ratio={imdb_ratio}, file_ratio={file_ratio}, diff={difference}", level=xbmc.LOGDEBUG)
+                    elif file_is_16_9 and imdb_ratio > tolerance_max and difference > 0:
+                        # Case 3: file_ratio is exactly 16:9 (or very close) and content is wide
+                        # Use file_ratio even if diff < threshold for better zoom calculation
+                        file_ratio = file_ratio_temp
+                        xbmc.log(f"service.remove.black.bars.gbm: Using file_ratio (16:9) for wide content: imdb_ratio={imdb_ratio}, file_ratio={file_ratio}, diff={difference}, threshold={threshold}", level=xbmc.LOGDEBUG)
                     else:
-                        xbmc.log(f"service.remove.black.bars.gbm: file_ratio is None (imdb_ratio={imdb_ratio}). Zoom calculation will use detected_ratio only, may be incorrect!", level=xbmc.LOGDEBUG)
-                    if file_ratio_temp:
-                        difference = abs(file_ratio_temp - imdb_ratio)
-                        threshold = max(5, int(imdb_ratio * 0.05))  # 5% of IMDb ratio, minimum 5
-                        
-                        # Use file_ratio if:
-                        # 1. Difference is significant (> threshold) AND (file_ratio is close to 16:9 OR content is close to 16:9)
-                        #    → Encoded black bars or cases like Invasion
-                        # 2. Difference exists (> 0) AND neither file nor content is close to 16:9
-                        #    → Cases like Basil/Le Baron Rouge/The Artist where file_ratio should be used directly
-                        tolerance_min, tolerance_max = self.zoom._get_16_9_tolerance(self)
-                        file_is_16_9 = tolerance_min <= file_ratio_temp <= tolerance_max
-                        content_is_16_9 = tolerance_min <= imdb_ratio <= tolerance_max
-                        
-                        if difference >= threshold and (file_is_16_9 or content_is_16_9):
-                            # Case 1: Encoded black bars or content/file close to 16:9
-                            file_ratio = file_ratio_temp
-                            if file_is_16_9 and not content_is_16_9:
-                                xbmc.log(f"service.remove.black.bars.gbm: Encoded black bars detected: imdb_ratio={imdb_ratio}, file_ratio={file_ratio}, diff={difference}, threshold={threshold}", level=xbmc.LOGDEBUG)
-                            else:
-                                xbmc.log(f"service.remove.black.bars.gbm: File ratio differs: imdb_ratio={imdb_ratio}, file_ratio={file_ratio}, diff={difference}, threshold={threshold}", level=xbmc.LOGDEBUG)
-                        elif difference > 0 and not file_is_16_9 and not content_is_16_9:
-                            # Case 2: Neither close to 16:9, use file_ratio directly for zoom calculation
-                            file_ratio = file_ratio_temp
-                            xbmc.log(f"service.remove.black.bars.gbm: Using file_ratio directly: imdb_ratio={imdb_ratio}, file_ratio={file_ratio}, diff={difference}", level=xbmc.LOGDEBUG)
-                        elif file_is_16_9 and imdb_ratio > tolerance_max and difference > 0:
-                            # Case 3: file_ratio is exactly 16:9 (or very close) and content is wide
-                            # Use file_ratio even if diff < threshold for better zoom calculation
-                            file_ratio = file_ratio_temp
-                            xbmc.log(f"service.remove.black.bars.gbm: Using file_ratio (16:9) for wide content: imdb_ratio={imdb_ratio}, file_ratio={file_ratio}, diff={difference}, threshold={threshold}", level=xbmc.LOGDEBUG)
+                        # Don't use file_ratio if conditions not met
+                        file_ratio = None
+                        if difference >= threshold:
+                            xbmc.log(f"service.remove.black.bars.gbm: Difference detected but conditions not met: imdb_ratio={imdb_ratio}, file_ratio={file_ratio_temp}, diff={difference}, threshold={threshold}", level=xbmc.LOGDEBUG)
                         else:
-                            # Don't use file_ratio if conditions not met
-                            file_ratio = None
-                            if difference >= threshold:
-                                xbmc.log(f"service.remove.black.bars.gbm: Difference detected but conditions not met: imdb_ratio={imdb_ratio}, file_ratio={file_ratio_temp}, diff={difference}, threshold={threshold}", level=xbmc.LOGDEBUG)
-                            else:
-                                xbmc.log(f"service.remove.black.bars.gbm: No significant difference: imdb_ratio={imdb_ratio}, file_ratio={file_ratio_temp}, diff={difference}, threshold={threshold}", level=xbmc.LOGDEBUG)
+                            xbmc.log(f"service.remove.black.bars.gbm: No significant difference: imdb_ratio={imdb_ratio}, file_ratio={file_ratio_temp}, diff={difference}, threshold={threshold}", level=xbmc.LOGDEBUG)
 
-            # 2) Kodi metadata (fallback if IMDb unavailable or not found)
+            # File ratio (fallback if no high-confidence source answered)
             if not imdb_ratio:
-                xbmc.log("service.remove.black.bars.gbm: IMDb unavailable, using Kodi metadata fallback", level=xbmc.LOGDEBUG)
-                file_ratio = self.kodi.get_aspect_ratio(video_info_tag, reason="for ratio detection", player=self)
+                xbmc.log("service.remove.black.bars.gbm: No content ratio, using the file ratio as fallback", level=xbmc.LOGDEBUG)
+                file_ratio = file_ratio_temp
                 if file_ratio:
                     file_ratio_detected = file_ratio
-                    xbmc.log(f"service.remove.black.bars.gbm: Kodi metadata: file_ratio={file_ratio}", level=xbmc.LOGDEBUG)
+                    xbmc.log(f"service.remove.black.bars.gbm: File ratio from {file_source.name}: file_ratio={file_ratio}", level=xbmc.LOGDEBUG)
 
             # Return tuple (detected_ratio, file_ratio, title_display)
             # detected_ratio is IMDb ratio if available, otherwise file_ratio
@@ -786,9 +2261,11 @@ class Service(xbmc.Player):
             # Note: Even if file_ratio is close to 16:9 and is the real content ratio (no encoded bars),
             # we still use imdb_ratio as detected_ratio and pass file_ratio to zoom calculation
             # This allows the zoom calculation to handle the case properly
+            if token:
+                token.raise_if_cancelled()
             detected_ratio = imdb_ratio if imdb_ratio else file_ratio
             if detected_ratio:
-                source = "IMDb" if imdb_ratio else "Kodi metadata"
+                source = content_source.name if imdb_ratio else file_source.name
                 xbmc.log(f"service.remove.black.bars.gbm: Detection complete: detected_ratio={detected_ratio} from {source}", level=xbmc.LOGDEBUG)
                 
                 # Log JSONL line for CASES.jsonl (INFO level so it's always visible)
@@ -824,26 +2301,44 @@ class Service(xbmc.Player):
 
             xbmc.log("service.remove.black.bars.gbm: Detection failed: no aspect ratio found", level=xbmc.LOGDEBUG)
             return None
+        except DetectionCancelled as e:
+            xbmc.log(f"service.remove.black.bars.gbm: Detection cancelled: {e}", level=xbmc.LOGDEBUG)
+            return None
         except Exception as e:
             xbmc.log("service.remove.black.bars.gbm: detect ratio error: " + str(e), level=xbmc.LOGERROR)
             return None
 
     def onAVStarted(self):
-        self.on_av_started()
+        # Run detection on the background worker so the player callback thread is not
+        # blocked; a new session cancels any detection still running for the previous item.
+        token = self.detection.new_session(self._get_detection_budget_s())
+        self.detection.submit(self.on_av_started, token)
 
     def onAVChange(self):
         """Disabled to avoid loop: changing zoom triggers onAVChange which re-applies zoom."""
         pass
 
-    def on_av_started(self):
+    def on_av_started(self, token=None):
+        """
+        Detect the aspect ratio and apply zoom.
+        
+        Args:
+            token: DetectionToken of the playback session (a new session is started if None)
+        """
         try:
+            if token is None:
+                token = self.detection.new_session(self._get_detection_budget_s())
             self.zoom.last_applied_ratio = None
             xbmcgui.Window(10000).setProperty("removeblackbars_status", "on")
-            result = self._detect_aspect_ratio()
-            if result:
+            result = self._detect_aspect_ratio(token)
+            if result and token.is_cancelled():
+                xbmc.log(f"service.remove.black.bars.gbm: Zoom skipped: result of stale generation {token.generation} dropped", level=xbmc.LOGDEBUG)
+            elif result:
                 detected_ratio, file_ratio, title_display = result
                 _, zoom_narrow_ratios = self._read_settings()
                 self.zoom.apply_zoom(detected_ratio, self, zoom_narrow_ratios, file_ratio, title_display)
+                budget = f" (budget {int((token.deadline - token.started) * 1000)}ms)" if token.deadline else ""
+                xbmc.log(f"service.remove.black.bars.gbm: Time to zoom: {token.elapsed_ms()}ms{budget}", level=xbmc.LOGDEBUG)
             else:
                 xbmc.log("service.remove.black.bars.gbm: Zoom skipped: no aspect ratio detected", level=xbmc.LOGDEBUG)
         except Exception as e:
@@ -851,6 +2346,7 @@ class Service(xbmc.Player):
 
     def onPlayBackStopped(self):
         try:
+            self.detection.cancel()
             xbmcgui.Window(10000).setProperty("removeblackbars_status", "off")
             self.zoom.last_applied_ratio = None
         except Exception:
@@ -858,6 +2354,7 @@ class Service(xbmc.Player):
 
     def onPlayBackEnded(self):
         try:
+            self.detection.cancel()
             xbmcgui.Window(10000).setProperty("removeblackbars_status", "off")
             self.zoom.last_applied_ratio = None
         except Exception:
@@ -882,8 +2379,8 @@ def clear_cache():
             xbmcgui.Dialog().ok("IMDb Cache", "IMDb cache is disabled. Enable it first in settings.")
             return
         
-        cache = JsonCacheProvider(enabled=True)
-        cache_entries = len(cache._cache) if cache._cache else 0
+        cache = create_cache_provider(enabled=True, backend=addon.getSetting("cache_backend"))
+        cache_entries = cache.count()
         xbmc.log(f"service.remove.black.bars.gbm: Cache has {cache_entries} entries before clearing", level=xbmc.LOGINFO)
         
         if cache.clear():
@@ -904,10 +2401,61 @@ def clear_cache():
         xbmcgui.Dialog().ok("Error", f"Failed to clear IMDb cache: {e}")
 
 
+def reparse_pages():
+    """Re-derive cached ratios from the stored IMDb pages - called from settings action"""
+    try:
+        xbmc.log("service.remove.black.bars.gbm: reparse_pages() called", level=xbmc.LOGINFO)
+        addon = xbmcaddon.Addon()
+        if addon.getSetting("enable_cache") != "true":
+            xbmcgui.Dialog().ok("IMDb Cache", "IMDb cache is disabled. Enable it first in settings.")
+            return
+        store = configure_page_store(translate_profile_path(PAGE_STORE_DIRNAME), get_page_store_mb(addon) * 1024 * 1024)
+        if store is None:
+            xbmcgui.Dialog().ok("IMDb Cache", "IMDb page store is disabled. Set its size first in settings.")
+            return
+
+        cache = create_cache_provider(enabled=True, backend=addon.getSetting("cache_backend"))
+        ratios = {}
+        for imdb_id, value in reparse_page_store(store).items():
+            if isinstance(value, list):
+                value = value[0] if value else None
+            try:
+                ratio = int(value)
+            except (TypeError, ValueError):
+                continue
+            if MIN_VALID_RATIO <= ratio <= MAX_VALID_RATIO:
+                ratios[imdb_id] = ratio
+        stored = 0
+        for imdb_id, ratio in ratios.items():
+            cache.store(None, None, ratio, imdb_id=imdb_id)
+            stored += 1
+        # Entries cached by title (no imdb id from the player): the title is resolved again
+        # from the stored suggestion pages, and refreshed if it maps to a re-parsed id
+        for key in cache.title_keys():
+            title, year = split_title_key(key)
+            ratio = ratios.get(resolve_stored_title(title, year, store))
+            if ratio:
+                cache.store(title, year, ratio)
+                stored += 1
+        cache.compact()
+
+        xbmc.log(f"service.remove.black.bars.gbm: {stored} ratios re-derived from stored IMDb pages", level=xbmc.LOGINFO)
+        notify("IMDb pages re-parsed")
+        xbmcgui.Dialog().ok("IMDb Cache", f"IMDb pages re-parsed.\n{stored} ratios stored in the cache.")
+    except Exception as e:
+        xbmc.log("service.remove.black.bars.gbm: Error re-parsing IMDb pages: " + str(e), level=xbmc.LOGERROR)
+        import traceback
+        xbmc.log("service.remove.black.bars.gbm: Traceback: " + traceback.format_exc(), level=xbmc.LOGERROR)
+        xbmcgui.Dialog().ok("Error", f"Failed to re-parse IMDb pages: {e}")
+
+
 def main():
     if len(sys.argv) > 1 and sys.argv[1] == "clear_cache":
         clear_cache()
         return
+    if len(sys.argv) > 1 and sys.argv[1] == "reparse_pages":
+        reparse_pages()
+        return
     
     xbmc.log("service.remove.black.bars.gbm: Service starting", level=xbmc.LOGINFO)
     service = Service()
@@ -916,6 +2464,10 @@ def main():
     while not monitor.abortRequested():
         if monitor.waitForAbort(1):
             break
+    service.detection.stop()
+    service.imdb.close()
+    service.cache.compact()
+    close_session()
     xbmc.log("service.remove.black.bars.gbm: Service stopping", level=xbmc.LOGINFO)
 
 
@@ -1,11 +1,77 @@
+import gzip
+import hashlib
+import json
+import os
+import re
 import requests
+import threading
 import time
-from bs4 import BeautifulSoup
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from html.parser import HTMLParser
+from urllib.parse import quote, urlsplit
+from requests.adapters import HTTPAdapter
 
 import xbmc
 import xbmcaddon
 import xbmcgui
 
+
+# Pooled HTTP session reused across lookups for the service's lifetime (keep-alive:
+# one TLS handshake to www.imdb.com instead of one per page)
+POOL_CONNECTIONS = 2  # Number of hosts kept in the pool
+POOL_MAXSIZE = 4  # Connections kept alive per host
+
+try:
+    import brotli  # noqa: F401 (urllib3 decodes "br" only when brotli is installed)
+    ACCEPT_ENCODING = "gzip, deflate, br"
+except ImportError:
+    ACCEPT_ENCODING = "gzip, deflate"
+
+_session = None
+_session_lock = threading.Lock()
+
+# Extraction strategies of each lookup step, in their default order
+STRATEGY_ORDER = {
+    "search": ("suggestion", "find"),  # JSON suggestion endpoint, HTML /find/ page
+    "ratio": ("title", "technical"),  # Title page, technical specs page
+}
+STRATEGY_MIN_SAMPLES = 5  # Attempts of every strategy of a step before it can be reordered
+STRATEGY_PROBE_INTERVAL = 20  # Every Nth lookup uses the default order, so a demoted strategy can recover
+STRATEGY_EMA_ALPHA = 0.2  # Weight of the latest attempt in the moving averages
+
+_strategy_stats = None
+_strategy_stats_lock = threading.Lock()
+
+# Raw page store: fetched search, title and technical pages kept gzipped in the profile,
+# read before the network and re-parsed without it (see reparse_page_store)
+PAGE_STORE_MAX_BYTES = 20 * 1024 * 1024
+PAGE_STORE_TTL_S = 7 * 24 * 3600
+
+_page_store = None
+_page_store_lock = threading.Lock()
+
+
+class IMDbUnavailableError(Exception):
+    """
+    Raised when IMDb could not be reached (network error, timeout, server error, rate limiting).
+    Distinguishes "IMDb is unavailable" from "IMDb has no aspect ratio for this title" (None).
+    """
+
+
+class IMDbDeadlineError(IMDbUnavailableError):
+    """Raised when the lookup ran out of its time budget before IMDb answered."""
+
+
+class DeadlineExceeded(requests.Timeout):
+    """Fetch error: the deadline (time.monotonic() value) passed before the page was read."""
+
+
+def _remaining(deadline):
+    """Seconds left before deadline (time.monotonic() value), or None without deadline."""
+    return None if deadline is None else deadline - time.monotonic()
+
+
 def notify(msg):
     """
     Show notification with configurable duration from settings.
@@ -65,37 +131,1231 @@ def _parse_aspect_ratio(aspect_ratio_text):
     return None
 
 
-def _fetch_with_retry(url, headers, max_retries=2, timeout=10):
+def get_session():
+    """Return the shared pooled session, creating it on first use."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers["Accept-Encoding"] = ACCEPT_ENCODING
+            _session = session
+        return _session
+
+
+def close_session():
+    """Close the pooled connections (called when Kodi asks the service to stop)."""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+
+
+class StrategyStats:
+    """
+    Success rate and cost (seconds) of each extraction strategy, as moving averages,
+    optionally persisted to a JSON file in the addon profile. order() puts the strategy
+    with the lowest expected cost of a success (cost / success rate) first, once every
+    strategy of the step has been tried STRATEGY_MIN_SAMPLES times.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self._lock = threading.Lock()
+        self._stats = {}
+        self._orders = {}  # Last order used per step, to log changes
+        self._lookups = {}
+        self._dirty = False
+        if path:
+            self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            xbmc.log(f"service.remove.black.bars.gbm: [IMDb] Ignoring unreadable strategy stats {self.path}: {e}", level=xbmc.LOGWARNING)
+            return
+        for group, names in STRATEGY_ORDER.items():
+            for name in names:
+                entry = data.get(group, {}).get(name) if isinstance(data.get(group), dict) else None
+                try:
+                    self._stats[(group, name)] = {"attempts": int(entry["attempts"]),
+                                                  "success_rate": float(entry["success_rate"]),
+                                                  "avg_cost": float(entry["avg_cost"])}
+                except (KeyError, TypeError, ValueError):
+                    continue
+        for group in STRATEGY_ORDER:
+            self._orders[group] = self._ranked(group)
+
+    def record(self, group, name, success, cost):
+        """Record one attempt of a strategy: whether it gave a result, and how long it took."""
+        with self._lock:
+            entry = self._stats.get((group, name))
+            if entry is None:
+                entry = self._stats[(group, name)] = {"attempts": 0, "success_rate": 1.0 if success else 0.0, "avg_cost": cost}
+            else:
+                entry["success_rate"] += STRATEGY_EMA_ALPHA * ((1.0 if success else 0.0) - entry["success_rate"])
+                entry["avg_cost"] += STRATEGY_EMA_ALPHA * (cost - entry["avg_cost"])
+            entry["attempts"] += 1
+            self._dirty = True
+
+    def _expected_cost(self, group, name):
+        entry = self._stats[(group, name)]
+        return entry["avg_cost"] / max(entry["success_rate"], 0.05)
+
+    def _ranked(self, group):
+        default = list(STRATEGY_ORDER[group])
+        if any(self._stats.get((group, name), {}).get("attempts", 0) < STRATEGY_MIN_SAMPLES for name in default):
+            return default
+        return sorted(default, key=lambda name: (self._expected_cost(group, name), default.index(name)))
+
+    def order(self, group):
+        """Return the strategies of a step, cheapest reliable first. Logs when the order changes."""
+        with self._lock:
+            self._lookups[group] = self._lookups.get(group, 0) + 1
+            if self._lookups[group] % STRATEGY_PROBE_INTERVAL == 0:
+                return list(STRATEGY_ORDER[group])
+            ranked = self._ranked(group)
+            previous = self._orders.get(group, list(STRATEGY_ORDER[group]))
+            if ranked != previous:
+                details = ", ".join(
+                    f"{name} {self._stats[(group, name)]['success_rate']:.0%} in {self._stats[(group, name)]['avg_cost']:.2f}s"
+                    for name in ranked if (group, name) in self._stats)
+                xbmc.log(f"service.remove.black.bars.gbm: [IMDb] {group} strategy order changed: "
+                         f"{' > '.join(previous)} -> {' > '.join(ranked)} ({details})", level=xbmc.LOGINFO)
+            self._orders[group] = ranked
+            return list(ranked)
+
+    def save(self):
+        """Write the stats to path (atomic replace) if they changed."""
+        with self._lock:
+            if not self.path or not self._dirty:
+                return
+            data = {}
+            for (group, name), entry in self._stats.items():
+                data.setdefault(group, {})[name] = dict(entry)
+            self._dirty = False
+        tmp_path = self.path + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            xbmc.log(f"service.remove.black.bars.gbm: [IMDb] Could not save strategy stats: {e}", level=xbmc.LOGWARNING)
+
+
+def load_strategy_stats(path):
+    """Use (and persist to) the strategy stats file at path; None keeps them in memory only."""
+    global _strategy_stats
+    with _strategy_stats_lock:
+        _strategy_stats = StrategyStats(path)
+        return _strategy_stats
+
+
+def get_strategy_stats():
+    """Return the strategy stats in use, created in memory on first use."""
+    global _strategy_stats
+    with _strategy_stats_lock:
+        if _strategy_stats is None:
+            _strategy_stats = StrategyStats()
+        return _strategy_stats
+
+
+class PageStore:
+    """
+    Fetched IMDb pages, one gzip file per URL (named after its SHA-1) in a directory.
+    Each file holds a JSON header line (url, encoding, fetch time, stop reason) then the
+    body as received, so `zcat` shows what the parser saw. Entries older than ttl_s are
+    ignored and removed; past max_bytes (compressed) the oldest files are removed first.
+    """
+
+    def __init__(self, directory, max_bytes=PAGE_STORE_MAX_BYTES, ttl_s=PAGE_STORE_TTL_S):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl_s = ttl_s
+        self._lock = threading.Lock()
+        self._size = None  # Total size on disk, computed on first write
+
+    def _path(self, url):
+        return os.path.join(self.directory, hashlib.sha1(url.encode("utf-8")).hexdigest() + ".html.gz")
+
+    def _files(self):
+        """(mtime, size, path) of every stored page, oldest first."""
+        files = []
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return files
+        for name in names:
+            if not name.endswith(".html.gz"):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+        files.sort()
+        return files
+
+    def put(self, page):
+        """Store a fetched page (FetchedPage), replacing any previous copy of its URL."""
+        header = json.dumps({"url": page.url, "encoding": page.encoding, "fetched": int(time.time()),
+                             "stopped": page.stopped}, separators=(",", ":")).encode("utf-8")
+        data = gzip.compress(header + b"\n" + page.content, compresslevel=6)
+        if len(data) > self.max_bytes:
+            return
+        path = self._path(page.url)
+        with self._lock:
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                if self._size is None:
+                    self._size = sum(size for _, size, _ in self._files())
+                try:
+                    self._size -= os.path.getsize(path)
+                except OSError:
+                    pass
+                tmp_path = path + ".tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+                self._size += len(data)
+                if self._size > self.max_bytes:
+                    self._evict()
+            except OSError as e:
+                xbmc.log(f"service.remove.black.bars.gbm: [IMDb] Could not store page {page.url}: {e}", level=xbmc.LOGDEBUG)
+
+    def _evict(self):
+        """Remove expired pages, then the oldest ones until the store fits in max_bytes (lock held)."""
+        files = self._files()
+        total = sum(size for _, size, _ in files)
+        expiry = time.time() - self.ttl_s
+        for mtime, size, path in files:
+            if total <= self.max_bytes and mtime >= expiry:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        self._size = total
+
+    def _remove_expired(self, path):
+        """Remove an expired page file and take its size off the store total."""
+        with self._lock:
+            try:
+                stat = os.stat(path)
+                if stat.st_mtime >= time.time() - self.ttl_s:
+                    return  # Replaced by a fresh copy in the meantime
+                os.remove(path)
+            except OSError:
+                return
+            if self._size is not None:
+                self._size -= stat.st_size
+
+    def _read(self, path):
+        """Read a stored page file. Returns FetchedPage, or None if unreadable or expired."""
+        try:
+            if os.path.getmtime(path) < time.time() - self.ttl_s:
+                self._remove_expired(path)
+                return None
+            with gzip.open(path, "rb") as f:
+                data = f.read()
+            header, _, content = data.partition(b"\n")
+            meta = json.loads(header)
+            return FetchedPage(meta["url"], content, meta.get("encoding"), meta.get("stopped"))
+        except (OSError, EOFError, ValueError, KeyError) as e:
+            xbmc.log(f"service.remove.black.bars.gbm: [IMDb] Ignoring unreadable stored page {path}: {e}", level=xbmc.LOGDEBUG)
+            return None
+
+    def get(self, url):
+        """Return the stored copy of url (FetchedPage), or None."""
+        return self._read(self._path(url))
+
+    def pages(self):
+        """Yield every stored page that has not expired (FetchedPage), oldest first."""
+        for _, _, path in self._files():
+            page = self._read(path)
+            if page is not None:
+                yield page
+
+    def clear(self):
+        with self._lock:
+            for _, _, path in self._files():
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            self._size = 0
+
+
+def configure_page_store(directory, max_bytes=PAGE_STORE_MAX_BYTES):
+    """Keep fetched pages in directory, up to max_bytes; None or 0 turns the store off."""
+    global _page_store
+    with _page_store_lock:
+        _page_store = PageStore(directory, max_bytes) if directory and max_bytes else None
+        return _page_store
+
+
+def get_page_store():
+    """Return the page store in use, or None."""
+    return _page_store
+
+
+def _connection_count(session, url):
+    """Number of connections (TLS handshakes) the pool has opened for url's host so far."""
+    try:
+        host = urlsplit(url).hostname
+        pools = session.get_adapter(url).poolmanager.pools
+        return sum(pool.num_connections for pool in (pools.get(key) for key in pools.keys())
+                   if pool is not None and pool.host == host)
+    except Exception:
+        return 0
+
+
+# Streaming fetch: hard cap on the (decoded) bytes read from one page, and the blocks
+# after which the rest of a page is not needed: (start marker, end marker, bytes the
+# block must contain to count, or None). Reading stops at the end of the first such block.
+MAX_PAGE_BYTES = 3 * 1024 * 1024
+STREAM_CHUNK_BYTES = 16 * 1024
+CONNECT_TIMEOUT = 3  # Seconds to open the connection: a blackholed IMDb fails here, well before the deadline
+NEXT_DATA_MARKER = 'id="__NEXT_DATA__"'
+_NEXT_DATA_BLOCK = (NEXT_DATA_MARKER.encode(), b"</script>", b'"aspectRatios"')
+TITLE_PAGE_STOP_MARKERS = (_NEXT_DATA_BLOCK, (b'data-testid="title-techspec_aspectratio"', b"</ul>", None))
+TECHNICAL_PAGE_STOP_MARKERS = (_NEXT_DATA_BLOCK, (b'id="aspectratio"', b"</ul>", None))
+
+
+class FetchedPage:
+    """Body of a fetched page (possibly cut short after the stop marker or at the byte cap)."""
+
+    def __init__(self, url, content, encoding, stopped=None):
+        self.url = url
+        self.content = content
+        self.encoding = encoding or "utf-8"
+        self.stopped = stopped  # None (complete), "marker", "cap" or "cancelled"
+        self._text = None
+
+    @property
+    def text(self):
+        if self._text is None:
+            self._text = self.content.decode(self.encoding, errors="replace")
+        return self._text
+
+
+def _read_body(response, stop_markers=(), max_bytes=MAX_PAGE_BYTES, cancel=None, deadline=None):
+    """
+    Read a streamed response chunk by chunk. Stops at the end of the first complete block
+    of stop_markers, at max_bytes, or once cancel (threading.Event) is set. Returns
+    (content, stopped) where stopped is None if the whole body was read, else "marker",
+    "cap" or "cancelled". Raises DeadlineExceeded once deadline has passed.
+    """
+    buffer = bytearray()
+    starts = [-1] * len(stop_markers)
+    overlap = max([len(marker) for block in stop_markers for marker in block[:2]] or [0])
+    for chunk in response.iter_content(chunk_size=STREAM_CHUNK_BYTES):
+        if cancel is not None and cancel.is_set():
+            return bytes(buffer), "cancelled"
+        if deadline is not None and time.monotonic() >= deadline:
+            raise DeadlineExceeded(f"deadline reached after {len(buffer)} bytes")
+        if not chunk:
+            continue
+        # Only scan the new chunk (plus an overlap for markers split across chunks)
+        scan_from = max(0, len(buffer) - overlap)
+        buffer += chunk
+        for index, (start_marker, end_marker, required) in enumerate(stop_markers):
+            if starts[index] is None:
+                continue  # Block seen without the required content
+            if starts[index] < 0:
+                starts[index] = buffer.find(start_marker, scan_from)
+                if starts[index] < 0:
+                    continue
+            end = buffer.find(end_marker, max(scan_from, starts[index]))
+            if end < 0:
+                continue
+            if required is None or buffer.find(required, starts[index], end) >= 0:
+                return bytes(buffer[:end + len(end_marker)]), "marker"
+            starts[index] = None
+        if len(buffer) >= max_bytes:
+            return bytes(buffer[:max_bytes]), "cap"
+    return bytes(buffer), None
+
+
+def _log_transfer(session, url, response, connections_before, page):
+    """Debug log of bytes received (on the wire, before decompression) and new handshakes."""
+    try:
+        wire_bytes = response.raw.tell() or len(page.content)
+    except Exception:
+        wire_bytes = len(page.content)
+    handshakes = _connection_count(session, url) - connections_before
+    stopped = {"marker": ", stopped after aspect ratio", "cap": ", stopped at byte cap",
+               "cancelled": ", cancelled"}.get(page.stopped, "")
+    xbmc.log(f"service.remove.black.bars.gbm: [IMDb] {url}: {wire_bytes} bytes received "
+             f"({len(page.content)} decoded, {response.headers.get('Content-Encoding', 'identity')}{stopped}), "
+             f"{handshakes} new connection(s)", level=xbmc.LOGDEBUG)
+
+
+def _fetch_with_retry(url, headers, max_retries=2, timeout=10, stop_markers=(), max_bytes=MAX_PAGE_BYTES, cancel=None,
+                      deadline=None):
     """
-    Fait une requête HTTP avec retry et exponential backoff.
-    Retourne (response, error) où response est None en cas d'erreur.
+    Fait une requête HTTP avec retry et exponential backoff, via la session partagée.
+    La page est lue en streaming : la lecture s'arrête après le premier bloc complet de
+    stop_markers, à max_bytes ou dès que cancel (threading.Event) est levé, et la
+    connexion est alors fermée.
+    Avec deadline (valeur de time.monotonic()), le timeout est réduit au temps restant et
+    il n'y a pas de nouvel essai qui dépasserait l'échéance. Un timeout n'est une erreur
+    DeadlineExceeded que si l'échéance est passée ; sinon (connexion impossible dans les
+    CONNECT_TIMEOUT secondes, par exemple) c'est une indisponibilité d'IMDb, qui reste
+    l'erreur retournée si l'échéance coupe ensuite un nouvel essai.
+    Retourne (page, error) où page (FetchedPage) est None en cas d'erreur, et
+    (None, None) si la requête a été annulée avant d'être envoyée.
     """
+    session = get_session()
+    earlier_error = None  # Error of an attempt that failed before the deadline
     for attempt in range(max_retries + 1):
+        if cancel is not None and cancel.is_set():
+            return None, None
+        attempt_timeout = timeout
+        remaining = _remaining(deadline)
+        if remaining is not None:
+            if remaining <= 0:
+                return None, earlier_error or DeadlineExceeded(f"deadline reached before fetching {url}")
+            attempt_timeout = min(timeout, remaining)
         try:
-            response = requests.get(url, headers=headers, timeout=timeout)
-            response.raise_for_status()
-            return response, None
+            connections_before = _connection_count(session, url)
+            with session.get(url, headers=headers, timeout=(min(CONNECT_TIMEOUT, attempt_timeout), attempt_timeout),
+                             stream=True) as response:
+                response.raise_for_status()
+                content, stopped = _read_body(response, stop_markers, max_bytes, cancel, deadline)
+                page = FetchedPage(url, content, response.encoding, stopped)
+                _log_transfer(session, url, response, connections_before, page)
+            if stopped == "cap":
+                xbmc.log(f"service.remove.black.bars.gbm: [IMDb] {url} is larger than {max_bytes} bytes, parsing the first {max_bytes}", level=xbmc.LOGWARNING)
+            return page, None
         except requests.RequestException as e:
-            if attempt < max_retries:
-                # Exponential backoff: 100ms * 2^attempt
-                delay_ms = 100 * (2 ** attempt)
+            remaining = _remaining(deadline)
+            if isinstance(e, requests.Timeout) and not isinstance(e, DeadlineExceeded) and \
+                    remaining is not None and remaining <= 0:
+                e = earlier_error or DeadlineExceeded(f"timed out after {attempt_timeout:.1f}s, at the deadline: {e}")
+            elif not isinstance(e, DeadlineExceeded):
+                earlier_error = e
+            # Exponential backoff: 100ms * 2^attempt
+            delay_ms = 100 * (2 ** attempt)
+            if attempt < max_retries and not (cancel is not None and cancel.is_set()) and \
+                    not isinstance(e, DeadlineExceeded) and (remaining is None or remaining > delay_ms / 1000.0):
                 time.sleep(delay_ms / 1000.0)
                 xbmc.log(f"service.remove.black.bars.gbm: Retry {attempt + 1}/{max_retries} for {url}", level=xbmc.LOGDEBUG)
                 continue
             return None, e
     return None, None
 
-def getOriginalAspectRatio(title, imdb_number=None):
+def _fetch_page(url, headers, **kwargs):
+    """
+    _fetch_with_retry through the page store: a stored copy of url is returned without any
+    request, and a page fetched in full (or up to its stop marker) is stored.
+    """
+    store = _page_store
+    if store is not None:
+        page = store.get(url)
+        if page is not None:
+            xbmc.log(f"service.remove.black.bars.gbm: [IMDb] Using stored page for {url}", level=xbmc.LOGDEBUG)
+            return page, None
+    page, error = _fetch_with_retry(url, headers, **kwargs)
+    if store is not None and not error and page is not None and page.stopped != "cancelled":
+        store.put(page)
+    return page, error
+
+
+def _is_unavailable_error(error):
+    """
+    Return True if a fetch error means IMDb is unavailable (connection error, timeout,
+    5xx, 408/429), False if IMDb answered that the page does not exist (other 4xx).
+    """
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        status = error.response.status_code
+        return status >= 500 or status in (408, 429)
+    return True
+
+
+def _raise_if_unavailable(error, what):
+    if isinstance(error, DeadlineExceeded):
+        raise IMDbDeadlineError(f"{what}: {error}")
+    if _is_unavailable_error(error):
+        raise IMDbUnavailableError(f"{what}: {error}")
+
+
+# Small JSON document used to check that IMDb is reachable (circuit breaker probe)
+PROBE_URL = "https://v3.sg.media-imdb.com/suggestion/a/a.json"
+PROBE_TIMEOUT = 3
+
+
+def probe_imdb(url=PROBE_URL, timeout=PROBE_TIMEOUT):
+    """Return True if IMDb answers a single short request (any answer but an unavailable error)."""
+    page, error = _fetch_with_retry(url, {}, max_retries=0, timeout=timeout, max_bytes=STREAM_CHUNK_BYTES)
+    return error is None or not _is_unavailable_error(error)
+
+
+# Elements that never have content (no end tag), so they are not pushed on the element stack
+_VOID_ELEMENTS = frozenset(("area", "base", "br", "col", "embed", "hr", "img", "input", "link",
+                            "meta", "param", "source", "track", "wbr"))
+
+# Class names read by the extractors
+SEARCH_RESULT_TITLE_CLASS = "ipc-metadata-list-summary-item__t"
+SEARCH_RESULT_LINK_CLASS = "ipc-title-link-wrapper"
+SEARCH_RESULT_CONTAINER_CLASSES = ("ipc-metadata-list-summary-item", "find-result")
+LIST_CONTENT_ITEM_CLASS = "ipc-metadata-list-item__list-content-item"
+LIST_CONTENT_SUBTEXT_CLASS = "ipc-metadata-list-item__list-content-item--subText"
+
+
+def _classes(attrs):
+    return (attrs.get("class") or "").split()
+
+
+class _ElementStackParser(HTMLParser):
+    """
+    Event-driven HTML scanner that only keeps the stack of open elements, so extractors
+    can look at ancestors without building a tree. Text is kept only for the elements
+    passed to capture(); everything else is dropped as it streams by.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.stack = []  # Open elements: [tag, attrs, extractor data]
+        self._captures = []  # (depth, text parts) of the elements whose text is kept
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag in _VOID_ELEMENTS:
+            self.start_element(tag, attrs, None)
+            return
+        self.stack.append([tag, attrs, None])
+        self.start_element(tag, attrs, len(self.stack))
+
+    def handle_startendtag(self, tag, attrs):
+        self.start_element(tag, dict(attrs), None)
+
+    def handle_endtag(self, tag):
+        for index in range(len(self.stack) - 1, -1, -1):
+            if self.stack[index][0] == tag:
+                # Close the element and anything left open inside it
+                for depth in range(len(self.stack), index, -1):
+                    self._captures = [capture for capture in self._captures if capture[0] < depth]
+                    self.end_element(self.stack[depth - 1], depth)
+                del self.stack[index:]
+                return
+        # Stray end tag: ignored, like the tree builders do
+
+    def handle_data(self, data):
+        for _, parts in self._captures:
+            parts.append(data)
+
+    def capture(self, depth):
+        """Keep the text of the element at depth (until it closes). Returns the list of text parts."""
+        parts = []
+        self._captures.append((depth, parts))
+        return parts
+
+    def start_element(self, tag, attrs, depth):
+        """Called for each start tag; depth is None for elements without content."""
+
+    def end_element(self, element, depth):
+        """Called when the element at depth closes."""
+
+
+class SearchResultsParser(_ElementStackParser):
+    """
+    Find the first title link of an IMDb /find/ results page.
+    Strategy 1: the first ".ipc-metadata-list-summary-item__t" element and its result item
+    (the first <li> among itself and its 4 closest ancestors, else its 5th ancestor); in
+    that item, the first "a.ipc-title-link-wrapper" link, else the first /title/tt link.
+    Strategy 2: the first /title/tt link with a search result container among its 5 closest
+    ancestors.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._title_seen = False
+        self._result_item = None  # Links found in the result item of strategy 1
+        self.strategy_1_url = None
+        self.strategy_2_url = None
+
+    def start_element(self, tag, attrs, depth):
+        classes = _classes(attrs)
+        if depth is not None:
+            # First links seen inside each open element, in case it turns out to be the result item
+            self.stack[-1][2] = {"link": None, "title": None}
+            ancestors = self.stack[:-1]
+        else:
+            ancestors = self.stack
+        if not self._title_seen and SEARCH_RESULT_TITLE_CLASS in classes:
+            self._title_seen = True
+            own = self.stack[-1] if depth is not None else [tag, attrs, None]
+            candidates = [own] + ancestors[::-1][:5]
+            for element in candidates[:5]:
+                if element[0] == "li":
+                    self._result_item = element[2]
+                    break
+            else:
+                if len(candidates) == 6 and candidates[5][2] is not None:
+                    self._result_item = candidates[5][2]
+        if tag != "a":
+            return
+        href = attrs.get("href")
+        if href is None:
+            return
+        is_title_link = "/title/tt" in href
+        for element in ancestors:
+            links = element[2]
+            if links is None:
+                continue
+            if links["link"] is None and SEARCH_RESULT_LINK_CLASS in classes:
+                links["link"] = href
+            if links["title"] is None and is_title_link:
+                links["title"] = href
+        if is_title_link and self.strategy_2_url is None:
+            for element in ancestors[-5:]:
+                if any(name in cls for cls in _classes(element[1]) for name in SEARCH_RESULT_CONTAINER_CLASSES):
+                    self.strategy_2_url = href
+                    break
+
+    def end_element(self, element, depth):
+        if element[2] is not None and element[2] is self._result_item:
+            self._finish_result_item()
+
+    def _finish_result_item(self):
+        if self._result_item is not None and self.strategy_1_url is None:
+            self.strategy_1_url = self._result_item["link"] or self._result_item["title"]
+
+    def close(self):
+        super().close()
+        self._finish_result_item()  # Page cut short before the result item closed
+
+    @property
+    def title_url(self):
+        return self.strategy_1_url or self.strategy_2_url
+
+
+class TitleTechSpecParser(_ElementStackParser):
+    """Read the aspect ratio text of a title page (data-testid="title-techspec_aspectratio" block)."""
+
+    def __init__(self):
+        super().__init__()
+        self.found = False
+        self._container_depth = None
+        self._item = None
+
+    def start_element(self, tag, attrs, depth):
+        if not self.found:
+            if attrs.get("data-testid") == "title-techspec_aspectratio" and depth is not None:
+                self.found = True
+                self._container_depth = depth
+        elif self._container_depth is not None and self._item is None and depth is not None:
+            if LIST_CONTENT_ITEM_CLASS in _classes(attrs):
+                self._item = self.capture(depth)
+
+    def end_element(self, element, depth):
+        if depth == self._container_depth:
+            self._container_depth = None
+
+    @property
+    def aspect_ratio_text(self):
+        return "".join(self._item) if self._item is not None else None
+
+
+class TechnicalAspectRatiosParser(_ElementStackParser):
+    """
+    Read the entries of the #aspectratio list of a /technical/ page: for each <li>, the text
+    of its first list content item and of its first subText item (e.g. "(theatrical ratio)").
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.found = False
+        self._container_depth = None
+        self._entries = []
+
+    def start_element(self, tag, attrs, depth):
+        if not self.found:
+            if attrs.get("id") == "aspectratio" and depth is not None:
+                self.found = True
+                self._container_depth = depth
+            return
+        if self._container_depth is None or depth is None:
+            return
+        if tag == "li":
+            entry = {"item": None, "sub": None}
+            self.stack[-1][2] = entry
+            self._entries.append(entry)
+        classes = _classes(attrs)
+        for field, cls in (("item", LIST_CONTENT_ITEM_CLASS), ("sub", LIST_CONTENT_SUBTEXT_CLASS)):
+            if cls not in classes:
+                continue
+            for element in self.stack[self._container_depth:]:
+                entry = element[2]
+                if element[0] == "li" and entry is not None and entry[field] is None:
+                    entry[field] = self.capture(depth)
+
+    def end_element(self, element, depth):
+        if depth == self._container_depth:
+            self._container_depth = None
+
+    @property
+    def entries(self):
+        """[(aspect ratio text or None, subtext or None)] in page order."""
+        return [(None if entry["item"] is None else "".join(entry["item"]),
+                 None if entry["sub"] is None else "".join(entry["sub"])) for entry in self._entries]
+
+
+def _run_parser(parser, html):
+    parser.feed(html)
+    parser.close()
+    return parser
+
+
+def _extract_next_data(html):
+    """Locate the <script id="__NEXT_DATA__"> block with a plain string scan and decode its JSON, or None."""
+    start = html.find(NEXT_DATA_MARKER)
+    if start < 0:
+        return None
+    start = html.find(">", start)
+    end = html.find("</script>", start)
+    if start < 0 or end < 0:
+        return None
+    try:
+        return json.loads(html[start + 1:end])
+    except ValueError:
+        return None
+
+
+def _next_data_aspect_ratios(html):
+    """
+    Read the aspect ratios of the embedded __NEXT_DATA__ JSON ("aspectRatios": {"items":
+    [{"aspectRatio": "2.39 : 1", "attributes": [{"text": "theatrical ratio"}]}]}), wherever
+    the page puts them. Returns [(aspect ratio text, subtext)] like the DOM extractors
+    (subtext "(theatrical ratio)"), or None if the page has no such data.
+    """
+    data = _extract_next_data(html)
+    if data is None:
+        return None
+    nodes = [data]
+    while nodes:
+        node = nodes.pop()
+        if isinstance(node, dict):
+            ratios = node.get("aspectRatios")
+            if isinstance(ratios, dict) and isinstance(ratios.get("items"), list):
+                entries = []
+                for item in ratios["items"]:
+                    if not isinstance(item, dict):
+                        continue
+                    attributes = [attribute.get("text") for attribute in item.get("attributes") or []
+                                  if isinstance(attribute, dict) and attribute.get("text")]
+                    entries.append((item.get("aspectRatio"), "({})".format(", ".join(attributes)) if attributes else None))
+                return entries
+            nodes.extend(reversed(list(node.values())))
+        elif isinstance(node, list):
+            nodes.extend(reversed(node))
+    return None
+
+
+SUGGESTION_URL = "https://v3.sg.media-imdb.com/suggestion/{}/{}.json"
+SUGGESTION_MAX_BYTES = 256 * 1024
+
+# IMDb suggestion types ("qid") matching each Kodi media type
+_MOVIE_TYPES = ("movie", "tvMovie", "video", "short")
+_SERIES_TYPES = ("tvSeries", "tvMiniSeries")
+_KODI_MEDIA_TYPES = {"movie": _MOVIE_TYPES, "episode": _SERIES_TYPES, "tvshow": _SERIES_TYPES}
+
+
+def _normalize_title(title):
+    """Lowercase, accent-free, alphanumeric-only form of a title for comparisons."""
+    text = unicodedata.normalize("NFKD", str(title or "")).casefold()
+    return " ".join("".join(c if c.isalnum() else " " for c in text if not unicodedata.combining(c)).split())
+
+
+def _score_candidate(candidate, title, year=None, media_type=None):
+    """
+    Score a search candidate ({"id", "l" (title), "y" (year), "qid" (type)}) against what
+    Kodi knows about the video: title match, then year, then media type.
+    """
+    score = 0
+    wanted = _normalize_title(title)
+    found = _normalize_title(candidate.get("l"))
+    if wanted and found == wanted:
+        score += 3
+    elif wanted and found and (wanted in found or found in wanted):
+        score += 1
+    try:
+        year_gap = abs(int(candidate.get("y")) - int(year)) if year and candidate.get("y") else None
+    except (TypeError, ValueError):
+        year_gap = None
+    if year_gap == 0:
+        score += 3
+    elif year_gap == 1:
+        score += 1  # Festival vs release year
+    elif year_gap is not None:
+        score -= 2
+    kind = candidate.get("qid")
+    if kind == "videoGame":
+        score -= 5
+    elif media_type in _KODI_MEDIA_TYPES and kind in _KODI_MEDIA_TYPES[media_type]:
+        score += 2
+    return score
+
+
+def _scored_best(candidates, titles, year=None, media_type=None):
+    """
+    Return (best title candidate, score), each candidate being scored against the
+    closest of titles; IMDb's own order breaks ties. (None, None) if there is no title.
+    """
+    best, best_score = None, None
+    for candidate in candidates:
+        if not str(candidate.get("id", "")).startswith("tt"):
+            continue  # People, companies...
+        score = max(_score_candidate(candidate, title, year, media_type) for title in titles)
+        if best_score is None or score > best_score:
+            best, best_score = candidate, score
+    return best, best_score
+
+
+def _best_candidate(candidates, title, year=None, media_type=None):
+    """Return the best scored title candidate (IMDb's own order breaks ties), or None."""
+    return _scored_best(candidates, (title,), year, media_type)[0]
+
+
+def _suggestion_candidates(query, headers, deadline=None):
+    """
+    Search query with IMDb's JSON suggestion endpoint (a few KB instead of the /find/ page).
+    Returns (list of candidates or None on failure, fetch error or None).
+    """
+    url = _suggestion_url(query)
+    xbmc.log(f"service.remove.black.bars.gbm: [IMDb] Searching IMDb suggestions with URL: {url}", level=xbmc.LOGDEBUG)
+    page, error = _fetch_page(url, headers, max_retries=0, max_bytes=SUGGESTION_MAX_BYTES, deadline=deadline)
+    if error:
+        xbmc.log(f"service.remove.black.bars.gbm: [IMDb] Suggestion search failed for '{query}': {error}", level=xbmc.LOGDEBUG)
+        return None, error
+    return _parse_suggestions(page, query), None
+
+
+def _suggestion_url(query):
+    query = " ".join(str(query).split()).lower()
+    first = query[:1] if query[:1].isascii() and query[:1].isalnum() else "x"
+    return SUGGESTION_URL.format(first, quote(query, safe=""))
+
+
+def _parse_suggestions(page, query):
+    """Candidates of a suggestion response (FetchedPage), or None if it is not valid JSON."""
+    try:
+        return [item for item in json.loads(page.text).get("d", []) if isinstance(item, dict)]
+    except (ValueError, AttributeError) as e:
+        xbmc.log(f"service.remove.black.bars.gbm: [IMDb] Invalid suggestion response for '{query}': {e}", level=xbmc.LOGDEBUG)
+        return None
+
+
+def _search_queries(title, year=None, original_title=None):
+    """Suggestion queries for a video: title, original title, title + year (duplicates dropped)."""
+    queries = []
+    seen = set()
+    for query in (title, original_title, f"{title} {year}" if title and year else None):
+        key = _normalize_title(query)
+        if key and key not in seen:
+            seen.add(key)
+            queries.append(query)
+    return queries
+
+
+def _resolve_title(title, headers, year=None, media_type=None, original_title=None, deadline=None):
+    """
+    Resolve title to an imdb id with concurrent suggestion searches (title, original title,
+    title + year), the candidates of every query being scored against both titles, the
+    year and the media type. A candidate matching on every criterion is taken as soon as
+    its query answers: queries not started yet are cancelled and slower answers ignored.
+    Returns the imdb id, or None if no query gave a title. Raises IMDbUnavailableError
+    when no query got an answer because IMDb is unreachable.
+    """
+    queries = _search_queries(title, year, original_title)
+    titles = [t for t in (title, original_title) if t]
+    perfect = 3 + (3 if year else 0) + (2 if media_type in _KODI_MEDIA_TYPES else 0)
+    results = {}
+    errors = []
+    if not queries:
+        # Title of punctuation or symbols only: nothing to ask the suggestion endpoint
+        xbmc.log(f"service.remove.black.bars.gbm: [IMDb] No suggestion query for '{title}'", level=xbmc.LOGDEBUG)
+        return None
+    if len(queries) == 1:
+        candidates, error = _suggestion_candidates(queries[0], headers, deadline)
+        if error:
+            errors.append(error)
+        if candidates is not None:
+            results[queries[0]] = _scored_best(candidates, titles, year, media_type)
+    else:
+        executor = ThreadPoolExecutor(max_workers=len(queries))
+        futures = {executor.submit(_suggestion_candidates, query, headers, deadline): query for query in queries}
+        try:
+            for future in as_completed(futures):
+                candidates, error = future.result()
+                if error:
+                    errors.append(error)
+                if candidates is None:
+                    continue
+                best, score = _scored_best(candidates, titles, year, media_type)
+                results[futures[future]] = (best, score)
+                if best is not None and score >= perfect:
+                    pending = sum(1 for other in futures if not other.done())
+                    if pending:
+                        xbmc.log(f"service.remove.black.bars.gbm: [IMDb] Exact match from '{futures[future]}', dropping {pending} slower queries", level=xbmc.LOGDEBUG)
+                    results = {futures[future]: (best, score)}
+                    break
+        finally:
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+    # Best score over all queries, earlier queries (title first) breaking ties
+    best, best_score = None, None
+    for query in queries:
+        candidate, score = results.get(query, (None, None))
+        if candidate is not None and (best_score is None or score > best_score):
+            best, best_score = candidate, score
+    if best is None:
+        if not results and errors and len(errors) == len(queries):
+            _raise_if_unavailable(errors[0], "suggestion search")
+        xbmc.log("service.remove.black.bars.gbm: [IMDb] No title in suggestions", level=xbmc.LOGDEBUG)
+        return None
+    xbmc.log(f"service.remove.black.bars.gbm: [IMDb] Best suggestion: {best.get('id')} '{best.get('l')}' ({best.get('y')}, {best.get('qid')}), score {best_score}", level=xbmc.LOGDEBUG)
+    return best["id"]
+
+
+def resolve_stored_title(title, year=None, store=None):
+    """
+    Resolve title to an imdb id from the suggestion pages of the page store (default: the
+    configured one), without any request, scoring candidates as _resolve_title does.
+    Returns the imdb id, or None if no stored suggestion page gives a title.
+    """
+    store = store or _page_store
+    if store is None:
+        return None
+    best, best_score = None, None
+    for query in _search_queries(title, year):
+        page = store.get(_suggestion_url(query))
+        candidates = _parse_suggestions(page, query) if page is not None else None
+        if not candidates:
+            continue
+        candidate, score = _scored_best(candidates, [title], year)
+        if candidate is not None and (best_score is None or score > best_score):
+            best, best_score = candidate, score
+    return best["id"] if best is not None else None
+
+
+def _find_page_search(base_url, title, headers, deadline=None):
+    """
+    Search title on the HTML /find/ page (fallback of the suggestion search).
+    Returns (title page URL, imdb number), or (None, None) if nothing was found.
+    """
+    URL = base_url + "/find/?q={}".format(title)
+    xbmc.log(f"service.remove.black.bars.gbm: [IMDb] Searching IMDb with URL: {URL}", level=xbmc.LOGDEBUG)
+    search_page, error = _fetch_page(URL, headers, deadline=deadline)
+    if error:
+        xbmc.log(f"service.remove.black.bars.gbm: [IMDb] Error fetching IMDb search page: {error}", level=xbmc.LOGWARNING)
+        _raise_if_unavailable(error, "search page")
+        return None, None
+
+    xbmc.log(f"service.remove.black.bars.gbm: [IMDb] Search page fetched successfully, length: {len(search_page.text)}", level=xbmc.LOGDEBUG)
+    
+    # Event-driven extraction: only the stack of open elements is kept, no tree is built
+    results = _run_parser(SearchResultsParser(), search_page.text)
+    title_url = results.title_url
+    if results.strategy_1_url:
+        xbmc.log(f"service.remove.black.bars.gbm: [IMDb] Found href in search result item: {title_url}", level=xbmc.LOGDEBUG)
+    elif title_url:
+        xbmc.log(f"service.remove.black.bars.gbm: [IMDb] Found /title/ link in search results: {title_url}", level=xbmc.LOGDEBUG)
+    results = None
+    
+    if title_url:
+        # Extract IMDb number from URL (handles both /title/ and /fr/title/ formats)
+        # URL format: /fr/title/tt9737326/?ref_=fn_t_1 or /title/tt9737326/
+        imdb_number = None
+        if '/title/' in title_url:
+            imdb_number = title_url.rsplit('/title/', 1)[-1].split("/")[0].split("?")[0]
+        elif '/title/' in title_url.replace('/fr/', '/').replace('/en/', '/'):
+            # Handle language prefix
+            imdb_number = title_url.rsplit('/title/', 1)[-1].split("/")[0].split("?")[0]
+        
+        if imdb_number:
+            xbmc.log(f"service.remove.black.bars.gbm: [IMDb] Extracted IMDb number from URL: {imdb_number}", level=xbmc.LOGDEBUG)
+            # Normalize URL: remove language prefix and query params, ensure it starts with /
+            # Convert /fr/title/tt9737326/?ref_=fn_t_1 to /title/tt9737326/
+            normalized_url = title_url
+            # Remove language prefix if present
+            if '/fr/title/' in normalized_url or '/en/title/' in normalized_url:
+                normalized_url = normalized_url.replace('/fr/title/', '/title/').replace('/en/title/', '/title/')
+            # Remove query params
+            if '?' in normalized_url:
+                normalized_url = normalized_url.split('?')[0]
+            # Ensure it starts with /
+            if not normalized_url.startswith('/'):
+                normalized_url = '/' + normalized_url
+            # Ensure it ends with /
+            if not normalized_url.endswith('/'):
+                normalized_url = normalized_url + '/'
+            URL = base_url + normalized_url
+        else:
+            xbmc.log(f"service.remove.black.bars.gbm: [IMDb] Failed to extract IMDb number from URL: {title_url}", level=xbmc.LOGWARNING)
+            return None, None
+    else:
+        xbmc.log("service.remove.black.bars.gbm: [IMDb] No link found in IMDb search results", level=xbmc.LOGWARNING)
+        # Log page preview for debugging (only first 500 chars to avoid memory issues)
+        page_preview = search_page.text[:500] if len(search_page.text) > 500 else search_page.text
+        xbmc.log(f"service.remove.black.bars.gbm: [IMDb] Page preview: {page_preview}", level=xbmc.LOGDEBUG)
+        return None, None
+    return URL, imdb_number
+
+
+def _imdb_id(imdb_number):
+    """Normalize an imdb number for URLs: add the "tt" prefix if needed."""
+    imdb_str = str(imdb_number)
+    if imdb_str.isdigit():
+        return "tt" + imdb_str
+    elif not imdb_str.startswith("tt"):
+        return "tt" + imdb_str
+    return imdb_str
+
+
+def _lookup_title_page(url, headers, cancel=None, deadline=None):
+    """
+    Fetch a title page and read its aspect ratio (embedded JSON first, the techspec block
+    of the DOM as fallback). Returns (aspect ratio string or None, fetch error or None).
+    """
+    xbmc.log(f"service.remove.black.bars.gbm: [IMDb] Fetching title page: {url}", level=xbmc.LOGDEBUG)
+    title_page, error = _fetch_page(url, headers, stop_markers=TITLE_PAGE_STOP_MARKERS, cancel=cancel, deadline=deadline)
+    if error or title_page is None or title_page.stopped == "cancelled":
+        return None, error
+
+    xbmc.log(f"service.remove.black.bars.gbm: [IMDb] Title page fetched successfully, length: {len(title_page.text)}", level=xbmc.LOGDEBUG)
+    return _parse_title_page(title_page.text), None
+
+
+def _parse_title_page(html):
+    """Aspect ratio string of a title page (embedded JSON first, techspec block of the DOM as fallback), or None."""
+    aspect_ratio = None
+
+    entries = _next_data_aspect_ratios(html)
+    if entries:
+        xbmc.log(f"service.remove.black.bars.gbm: [IMDb] Found {len(entries)} aspect ratios in __NEXT_DATA__", level=xbmc.LOGDEBUG)
+        found, aspect_ratio_full = True, entries[0][0]
+    else:
+        techspec = _run_parser(TitleTechSpecParser(), html)
+        found, aspect_ratio_full = techspec.found, techspec.aspect_ratio_text
+        techspec = None
+        if found:
+            xbmc.log("service.remove.black.bars.gbm: [IMDb] Found aspect ratio tags with data-testid", level=xbmc.LOGDEBUG)
+
+    if found:
+        if aspect_ratio_full is not None:
+            xbmc.log(f"service.remove.black.bars.gbm: [IMDb] Aspect ratio full text: {aspect_ratio_full}", level=xbmc.LOGDEBUG)
+
+            if aspect_ratio_full:
+                aspect_ratio_int = _parse_aspect_ratio(aspect_ratio_full)
+                if aspect_ratio_int:
+                    aspect_ratio = str(aspect_ratio_int)
+                    xbmc.log(f"service.remove.black.bars.gbm: [IMDb] Extracted aspect ratio from '{aspect_ratio_full}': {aspect_ratio}", level=xbmc.LOGINFO)
+                else:
+                    xbmc.log(f"service.remove.black.bars.gbm: [IMDb] Failed to parse aspect ratio from '{aspect_ratio_full}'", level=xbmc.LOGWARNING)
+    else:
+        xbmc.log("service.remove.black.bars.gbm: [IMDb] No aspect ratio tags found with data-testid on the title page", level=xbmc.LOGDEBUG)
+    return aspect_ratio
+
+
+def _lookup_technical_page(url, headers, cancel=None, deadline=None):
+    """
+    Fetch a technical specs page and read its aspect ratios. Returns (result, fetch error
+    or None), result being the theatrical ratio string when one is marked, the list of
+    ratios when there are several, else None.
+    """
+    xbmc.log(f"service.remove.black.bars.gbm: [IMDb] Fetching technical specs page: {url}", level=xbmc.LOGDEBUG)
+    tech_specs_page, error = _fetch_page(url, headers, stop_markers=TECHNICAL_PAGE_STOP_MARKERS, cancel=cancel,
+                                         deadline=deadline)
+    if error or tech_specs_page is None or tech_specs_page.stopped == "cancelled":
+        return None, error
+
+    xbmc.log(f"service.remove.black.bars.gbm: [IMDb] Technical specs page fetched successfully", level=xbmc.LOGDEBUG)
+    return _parse_technical_page(tech_specs_page.text), None
+
+
+def _parse_technical_page(html):
+    """
+    Aspect ratios of a technical specs page: the theatrical ratio string when one is
+    marked, the list of ratios when there are several, else None.
+    """
+    # check if video has multiple aspect ratios
+    try:
+        entries = _next_data_aspect_ratios(html)
+        if entries:
+            xbmc.log("service.remove.black.bars.gbm: [IMDb] Found aspect ratios in __NEXT_DATA__", level=xbmc.LOGDEBUG)
+        else:
+            technical = _run_parser(TechnicalAspectRatiosParser(), html)
+            entries = technical.entries if technical.found else None
+            technical = None
+            if entries is not None:
+                xbmc.log("service.remove.black.bars.gbm: [IMDb] Found aspect ratio container", level=xbmc.LOGDEBUG)
+
+        if entries is not None:
+            xbmc.log(f"service.remove.black.bars.gbm: [IMDb] Found {len(entries)} aspect ratio entries", level=xbmc.LOGDEBUG)
+
+            if len(entries) > 1:
+                aspect_ratios = []
+
+                for aspect_ratio_full, sub_text in entries:
+                    if not aspect_ratio_full:
+                        continue
+
+                    aspect_ratio_int = _parse_aspect_ratio(aspect_ratio_full)
+                    if not aspect_ratio_int:
+                        continue
+
+                    aspect_ratio = str(aspect_ratio_int)
+
+                    if sub_text is not None:
+                        xbmc.log(f"service.remove.black.bars.gbm: [IMDb] Found aspect ratio {aspect_ratio} with subtext: {sub_text}", level=xbmc.LOGDEBUG)
+
+                        if sub_text == "(theatrical ratio)":
+                            xbmc.log(f"service.remove.black.bars.gbm: [IMDb] Using theatrical ratio: {aspect_ratio}", level=xbmc.LOGINFO)
+                            return aspect_ratio
+
+                    aspect_ratios.append(aspect_ratio)
+
+                xbmc.log(f"service.remove.black.bars.gbm: [IMDb] Multiple aspect ratios found: {aspect_ratios}", level=xbmc.LOGDEBUG)
+                return aspect_ratios
+            else:
+                xbmc.log("service.remove.black.bars.gbm: [IMDb] Only one aspect ratio entry found, skipping multiple ratio logic", level=xbmc.LOGDEBUG)
+        else:
+            xbmc.log("service.remove.black.bars.gbm: [IMDb] No aspect ratio container found in technical specs", level=xbmc.LOGDEBUG)
+    except Exception as e:
+        xbmc.log(f"service.remove.black.bars.gbm: [IMDb] Error parsing technical specs: {e}", level=xbmc.LOGWARNING)
+    return None
+
+
+def _speculative_lookup(title_url, technical_url, headers, deadline=None):
+    """
+    Fetch the title page and the technical specs page at the same time. A usable answer
+    (a ratio on the title page, a theatrical ratio on the technical page) is taken in the
+    default order of the ratio strategies, title page first, whichever page arrives first:
+    a technical page answer waits for the title page, so a title gets the same ratio on
+    every run. The other fetch is cancelled once the answer is known. Otherwise the result
+    is the one of the sequential lookup: the technical page's ratios when the title page
+    has none. Raises IMDbUnavailableError like the sequential lookup.
+    """
+    cancel = threading.Event()
+    executor = ThreadPoolExecutor(max_workers=2)
+    title_future = executor.submit(_lookup_title_page, title_url, headers, cancel, deadline)
+    technical_future = executor.submit(_lookup_technical_page, technical_url, headers, cancel, deadline)
+    futures = {"title": title_future, "technical": technical_future}
+    try:
+        for _ in as_completed(futures.values()):
+            for name in STRATEGY_ORDER["ratio"]:
+                future = futures[name]
+                if not future.done():
+                    break  # A page of higher precedence may still answer
+                result, error = future.result()
+                if not error and (result if name == "title" else isinstance(result, str)):
+                    if not all(other.done() for other in futures.values()):
+                        xbmc.log(f"service.remove.black.bars.gbm: [IMDb] Ratio from the {name} page, other page cancelled", level=xbmc.LOGDEBUG)
+                    return result
+    finally:
+        cancel.set()
+        executor.shutdown(wait=False)
+
+    # Both pages read, no early answer
+    _, error = title_future.result()
+    if error:
+        xbmc.log(f"service.remove.black.bars.gbm: [IMDb] Error fetching IMDb title page: {error}", level=xbmc.LOGWARNING)
+        _raise_if_unavailable(error, "title page")
+        return None
+    result, error = technical_future.result()
+    if error:
+        xbmc.log(f"service.remove.black.bars.gbm: [IMDb] Error fetching technical specs page: {error}", level=xbmc.LOGWARNING)
+        _raise_if_unavailable(error, "technical specs page")
+        return None
+    return result
+
+
+def _search_title(base_url, title, headers, year=None, media_type=None, original_title=None, deadline=None):
+    """
+    Search title with the search strategies (suggestion endpoint, /find/ page), in the
+    order given by the strategy stats. Returns (title page URL, imdb number), or
+    (None, None) if nothing was found. A strategy that could not reach IMDb is not
+    recorded; IMDbUnavailableError is raised if none of them could.
+    """
+    stats = get_strategy_stats()
+    unavailable = None
+    for name in stats.order("search"):
+        start = time.monotonic()
+        try:
+            if name == "suggestion":
+                imdb_number = _resolve_title(title, headers, year=year, media_type=media_type,
+                                             original_title=original_title, deadline=deadline)
+                url = "{}/title/{}/".format(base_url, imdb_number) if imdb_number else None
+            else:
+                url, imdb_number = _find_page_search(base_url, title, headers, deadline)
+        except IMDbUnavailableError as e:
+            unavailable = unavailable or e
+            continue
+        stats.record("search", name, bool(url), time.monotonic() - start)
+        if url:
+            return url, imdb_number
+    if unavailable:
+        raise unavailable
+    return None, None
+
+
+def _sequential_lookup(title_url, technical_url, headers, deadline=None):
+    """
+    Read the aspect ratio from the title page and the technical specs page one after the
+    other, in the order given by the strategy stats: a ratio on the title page or a
+    theatrical ratio on the technical page ends the lookup. Without either, the result is
+    the technical page's ratios (list), or None. Raises IMDbUnavailableError.
+    """
+    stats = get_strategy_stats()
+    fallback = None
+    for name in stats.order("ratio"):
+        start = time.monotonic()
+        if name == "title":
+            result, error = _lookup_title_page(title_url, headers, deadline=deadline)
+            what = "title page"
+        else:
+            result, error = _lookup_technical_page(technical_url, headers, deadline=deadline)
+            what = "technical specs page"
+        if error:
+            xbmc.log(f"service.remove.black.bars.gbm: [IMDb] Error fetching {what}: {error}", level=xbmc.LOGWARNING)
+            _raise_if_unavailable(error, what)
+            return None
+        success = bool(result) if name == "title" else isinstance(result, str)
+        stats.record("ratio", name, success, time.monotonic() - start)
+        if success:
+            return result
+        fallback = fallback or result
+    return fallback
+
+
+def getOriginalAspectRatio(title, imdb_number=None, year=None, media_type=None, original_title=None, speculative=False,
+                           deadline=None):
     """
     Récupère le ratio d'aspect original depuis IMDb.
+    Sans imdb_number, le titre est recherché, en parallèle avec original_title et le titre
+    suivi de l'année (year et media_type départagent les résultats).
+    Avec speculative, la page titre et la page technique sont demandées en même temps
+    (un aller-retour au lieu de deux quand la page titre n'a pas le ratio).
+    Avec deadline (valeur de time.monotonic()), chaque requête est limitée au temps restant ;
+    IMDbDeadlineError est levée si l'échéance passe avant la réponse d'IMDb.
     Retourne None en cas d'erreur pour éviter les fuites mémoire.
-    Toutes les exceptions sont gérées et les objets sont nettoyés.
+    Toutes les exceptions sont gérées et les objets sont nettoyés, sauf
+    IMDbUnavailableError, levée quand IMDb est injoignable (pour ne pas confondre
+    une panne réseau avec un titre sans ratio).
     """
-    search_page = None
-    title_page = None
-    tech_specs_page = None
-    soup = None
-    
     try:
         xbmc.log(f"service.remove.black.bars.gbm: [IMDb] Starting getOriginalAspectRatio with title='{title}', imdb_number='{imdb_number}'", level=xbmc.LOGDEBUG)
         
@@ -104,264 +1364,75 @@ def getOriginalAspectRatio(title, imdb_number=None):
             'User-Agent': 'Mozilla/5.0 (iPad; CPU OS 12_2 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Mobile/15E148'}
 
         if imdb_number:
-            # Normalize for URL: add "tt" prefix if needed
-            imdb_str = str(imdb_number)
-            if imdb_str.isdigit():
-                imdb_id = "tt" + imdb_str
-            elif not imdb_str.startswith("tt"):
-                imdb_id = "tt" + imdb_str
-            else:
-                imdb_id = imdb_str
-            URL = "{}/title/{}/".format(BASE_URL, imdb_id)
+            URL = "{}/title/{}/".format(BASE_URL, _imdb_id(imdb_number))
             xbmc.log(f"service.remove.black.bars.gbm: [IMDb] Using IMDb number directly, URL: {URL}", level=xbmc.LOGDEBUG)
         else:
             if not title:
                 xbmc.log("service.remove.black.bars.gbm: [IMDb] No title provided for IMDb search", level=xbmc.LOGWARNING)
                 return None
                 
-            URL = BASE_URL + "/find/?q={}".format(title)
-            xbmc.log(f"service.remove.black.bars.gbm: [IMDb] Searching IMDb with URL: {URL}", level=xbmc.LOGDEBUG)
-            search_page, error = _fetch_with_retry(URL, HEADERS)
-            if error:
-                xbmc.log(f"service.remove.black.bars.gbm: [IMDb] Error fetching IMDb search page: {error}", level=xbmc.LOGWARNING)
-                return None
-
-            xbmc.log(f"service.remove.black.bars.gbm: [IMDb] Search page fetched successfully, length: {len(search_page.text)}", level=xbmc.LOGDEBUG)
-            
-            # lxml parser would have been better but not currently supported in Kodi
-            soup = BeautifulSoup(search_page.text, 'html.parser')
-
-            # Try multiple strategies to find the title link
-            title_url = None
-            
-            # Strategy 1: Find the title element and look for link in the same list item
-            title_url_tag = soup.select_one('.ipc-metadata-list-summary-item__t')
-            if title_url_tag:
-                xbmc.log("service.remove.black.bars.gbm: [IMDb] Found title element with selector '.ipc-metadata-list-summary-item__t'", level=xbmc.LOGDEBUG)
-                # Find the parent <li> element
-                list_item = title_url_tag
-                for _ in range(5):  # Go up to 5 levels to find the <li>
-                    if list_item and list_item.name == 'li':
-                        break
-                    list_item = list_item.parent if list_item else None
-                
-                if list_item:
-                    # Look for the link with class 'ipc-title-link-wrapper' in the same <li>
-                    link_tag = list_item.find('a', class_='ipc-title-link-wrapper', href=True)
-                    if link_tag:
-                        title_url = link_tag.get('href')
-                        xbmc.log(f"service.remove.black.bars.gbm: [IMDb] Found href in ipc-title-link-wrapper: {title_url}", level=xbmc.LOGDEBUG)
-                    else:
-                        # Fallback: look for any /title/ link in the same <li>
-                        link_tag = list_item.find('a', href=lambda x: x and '/title/tt' in x)
-                        if link_tag:
-                            title_url = link_tag.get('href')
-                            xbmc.log(f"service.remove.black.bars.gbm: [IMDb] Found /title/ link in list item: {title_url}", level=xbmc.LOGDEBUG)
-            
-            # Strategy 2: Try to find link with title pattern directly in search results
-            if not title_url:
-                xbmc.log("service.remove.black.bars.gbm: [IMDb] Trying alternative strategy: searching for /title/ links", level=xbmc.LOGDEBUG)
-                # Find all links that contain /title/tt
-                all_links = soup.find_all('a', href=lambda x: x and '/title/tt' in x)
-                for link in all_links:
-                    href = link.get('href', '')
-                    # Check if it's in a result item (not navigation)
-                    parent = link.parent
-                    for _ in range(5):  # Check up to 5 levels up
-                        if parent:
-                            if hasattr(parent, 'get'):
-                                classes = parent.get('class', [])
-                                if classes:
-                                    # Check if it's in a search result item
-                                    if any('ipc-metadata-list-summary-item' in str(c) for c in classes) or \
-                                       any('find-result' in str(c) for c in classes):
-                                        title_url = href
-                                        xbmc.log(f"service.remove.black.bars.gbm: [IMDb] Found /title/ link in search results: {title_url}", level=xbmc.LOGDEBUG)
-                                        break
-                            if title_url:
-                                break
-                            parent = parent.parent
-                        else:
-                            break
-                    if title_url:
-                        break
-            
-            if title_url:
-                # Extract IMDb number from URL (handles both /title/ and /fr/title/ formats)
-                # URL format: /fr/title/tt9737326/?ref_=fn_t_1 or /title/tt9737326/
-                imdb_number = None
-                if '/title/' in title_url:
-                    imdb_number = title_url.rsplit('/title/', 1)[-1].split("/")[0].split("?")[0]
-                elif '/title/' in title_url.replace('/fr/', '/').replace('/en/', '/'):
-                    # Handle language prefix
-                    imdb_number = title_url.rsplit('/title/', 1)[-1].split("/")[0].split("?")[0]
-                
-                if imdb_number:
-                    xbmc.log(f"service.remove.black.bars.gbm: [IMDb] Extracted IMDb number from URL: {imdb_number}", level=xbmc.LOGDEBUG)
-                    # Normalize URL: remove language prefix and query params, ensure it starts with /
-                    # Convert /fr/title/tt9737326/?ref_=fn_t_1 to /title/tt9737326/
-                    normalized_url = title_url
-                    # Remove language prefix if present
-                    if '/fr/title/' in normalized_url or '/en/title/' in normalized_url:
-                        normalized_url = normalized_url.replace('/fr/title/', '/title/').replace('/en/title/', '/title/')
-                    # Remove query params
-                    if '?' in normalized_url:
-                        normalized_url = normalized_url.split('?')[0]
-                    # Ensure it starts with /
-                    if not normalized_url.startswith('/'):
-                        normalized_url = '/' + normalized_url
-                    # Ensure it ends with /
-                    if not normalized_url.endswith('/'):
-                        normalized_url = normalized_url + '/'
-                    URL = BASE_URL + normalized_url
-                else:
-                    xbmc.log(f"service.remove.black.bars.gbm: [IMDb] Failed to extract IMDb number from URL: {title_url}", level=xbmc.LOGWARNING)
-                    soup = None
-                    return None
-            else:
-                xbmc.log("service.remove.black.bars.gbm: [IMDb] No link found in IMDb search results", level=xbmc.LOGWARNING)
-                # Log page preview for debugging (only first 500 chars to avoid memory issues)
-                page_preview = search_page.text[:500] if len(search_page.text) > 500 else search_page.text
-                xbmc.log(f"service.remove.black.bars.gbm: [IMDb] Page preview: {page_preview}", level=xbmc.LOGDEBUG)
-                # Clean up before returning
-                soup = None
+            URL, imdb_number = _search_title(BASE_URL, title, HEADERS, year, media_type, original_title, deadline)
+            if not URL:
                 return None
-            
-            # Clean up search page soup after use
-            soup = None
-
-        xbmc.log(f"service.remove.black.bars.gbm: [IMDb] Fetching title page: {URL}", level=xbmc.LOGDEBUG)
-        title_page, error = _fetch_with_retry(URL, HEADERS)
-        if error:
-            xbmc.log(f"service.remove.black.bars.gbm: [IMDb] Error fetching IMDb title page: {error}", level=xbmc.LOGWARNING)
-            return None
-        
-        xbmc.log(f"service.remove.black.bars.gbm: [IMDb] Title page fetched successfully, length: {len(title_page.text)}", level=xbmc.LOGDEBUG)
-        soup = BeautifulSoup(title_page.text, 'html.parser')
 
-        # this below could have worked instead but for some reason SoupSieve not working inside Kodi
-        aspect_ratio_tags = soup.find(attrs={"data-testid": "title-techspec_aspectratio"})
-        
-        aspect_ratio = None
-        
-        if aspect_ratio_tags:
-            xbmc.log("service.remove.black.bars.gbm: [IMDb] Found aspect ratio tags with data-testid", level=xbmc.LOGDEBUG)
-            aspect_ratio_item = aspect_ratio_tags.select_one(".ipc-metadata-list-item__list-content-item")
-            
-            if aspect_ratio_item:
-                aspect_ratio_full = aspect_ratio_item.decode_contents()
-                xbmc.log(f"service.remove.black.bars.gbm: [IMDb] Aspect ratio full text: {aspect_ratio_full}", level=xbmc.LOGDEBUG)
+        technical_url = "{}/title/{}/technical/".format(BASE_URL, _imdb_id(imdb_number)) if imdb_number else None
 
-                if aspect_ratio_full:
-                    aspect_ratio_int = _parse_aspect_ratio(aspect_ratio_full)
-                    if aspect_ratio_int:
-                        aspect_ratio = str(aspect_ratio_int)
-                        xbmc.log(f"service.remove.black.bars.gbm: [IMDb] Extracted aspect ratio from '{aspect_ratio_full}': {aspect_ratio}", level=xbmc.LOGINFO)
-                    else:
-                        xbmc.log(f"service.remove.black.bars.gbm: [IMDb] Failed to parse aspect ratio from '{aspect_ratio_full}'", level=xbmc.LOGWARNING)
-                        aspect_ratio = None
+        if speculative and technical_url:
+            aspect_ratio = _speculative_lookup(URL, technical_url, HEADERS, deadline)
+        elif technical_url:
+            aspect_ratio = _sequential_lookup(URL, technical_url, HEADERS, deadline)
         else:
-            xbmc.log("service.remove.black.bars.gbm: [IMDb] No aspect ratio tags found with data-testid, trying technical specs page", level=xbmc.LOGDEBUG)
-        
-        if not aspect_ratio and imdb_number:
-            # check if video has multiple aspect ratios
-            try:
-                # Normalize for URL: add "tt" prefix if needed
-                imdb_str = str(imdb_number)
-                if imdb_str.isdigit():
-                    imdb_id = "tt" + imdb_str
-                elif not imdb_str.startswith("tt"):
-                    imdb_id = "tt" + imdb_str
-                else:
-                    imdb_id = imdb_str
-                URL = "{}/title/{}/technical/".format(BASE_URL, imdb_id)
-                xbmc.log(f"service.remove.black.bars.gbm: [IMDb] Fetching technical specs page: {URL}", level=xbmc.LOGDEBUG)
-                tech_specs_page, error = _fetch_with_retry(URL, HEADERS)
-                if error:
-                    xbmc.log(f"service.remove.black.bars.gbm: [IMDb] Error fetching technical specs page: {error}", level=xbmc.LOGWARNING)
-                    # Clean up before returning
-                    soup = None
-                    return None
-                
-                xbmc.log(f"service.remove.black.bars.gbm: [IMDb] Technical specs page fetched successfully", level=xbmc.LOGDEBUG)
-                # Clean up previous soup before creating new one
-                soup = None
-                soup = BeautifulSoup(tech_specs_page.text, 'html.parser')
-                aspect_ratio_container = soup.select_one("#aspectratio")
-                
-                if aspect_ratio_container:
-                    xbmc.log("service.remove.black.bars.gbm: [IMDb] Found aspect ratio container", level=xbmc.LOGDEBUG)
-                    aspect_ratio_li = aspect_ratio_container.find_all("li")
-                    xbmc.log(f"service.remove.black.bars.gbm: [IMDb] Found {len(aspect_ratio_li)} aspect ratio entries", level=xbmc.LOGDEBUG)
-                    
-                    if len(aspect_ratio_li) > 1:
-                        aspect_ratios = []
-
-                        for li in aspect_ratio_li:
-                            aspect_ratio_item = li.select_one(".ipc-metadata-list-item__list-content-item")
-                            
-                            if not aspect_ratio_item:
-                                continue
-                                
-                            aspect_ratio_full = aspect_ratio_item.decode_contents()
-                            
-                            if not aspect_ratio_full:
-                                continue
-                            
-                            aspect_ratio_int = _parse_aspect_ratio(aspect_ratio_full)
-                            if not aspect_ratio_int:
-                                continue
-                            
-                            aspect_ratio = str(aspect_ratio_int)
-                            
-                            sub_text_item = li.select_one(".ipc-metadata-list-item__list-content-item--subText")
-                            if sub_text_item:
-                                sub_text = sub_text_item.decode_contents()
-                                xbmc.log(f"service.remove.black.bars.gbm: [IMDb] Found aspect ratio {aspect_ratio} with subtext: {sub_text}", level=xbmc.LOGDEBUG)
-                                
-                                if sub_text == "(theatrical ratio)":
-                                    xbmc.log(f"service.remove.black.bars.gbm: [IMDb] Using theatrical ratio: {aspect_ratio}", level=xbmc.LOGINFO)
-                                    # Clean up before returning
-                                    soup = None
-                                    return aspect_ratio
-                            
-                            aspect_ratios.append(aspect_ratio)
-
-                        xbmc.log(f"service.remove.black.bars.gbm: [IMDb] Multiple aspect ratios found: {aspect_ratios}", level=xbmc.LOGDEBUG)
-                        # Clean up before returning
-                        soup = None
-                        return aspect_ratios
-                    else:
-                        xbmc.log("service.remove.black.bars.gbm: [IMDb] Only one aspect ratio entry found, skipping multiple ratio logic", level=xbmc.LOGDEBUG)
-                else:
-                    xbmc.log("service.remove.black.bars.gbm: [IMDb] No aspect ratio container found in technical specs", level=xbmc.LOGDEBUG)
-            except requests.RequestException as e:
-                xbmc.log(f"service.remove.black.bars.gbm: [IMDb] Error fetching technical specs page: {e}", level=xbmc.LOGWARNING)
-                soup = None
-            except Exception as e:
-                xbmc.log(f"service.remove.black.bars.gbm: [IMDb] Error parsing technical specs: {e}", level=xbmc.LOGWARNING)
-                soup = None
-
-        # Clean up soup before returning
-        soup = None
-        
+            aspect_ratio, error = _lookup_title_page(URL, HEADERS, deadline=deadline)
+            if error:
+                xbmc.log(f"service.remove.black.bars.gbm: [IMDb] Error fetching IMDb title page: {error}", level=xbmc.LOGWARNING)
+                _raise_if_unavailable(error, "title page")
+                return None
+
         if aspect_ratio:
             xbmc.log(f"service.remove.black.bars.gbm: [IMDb] Returning aspect ratio: {aspect_ratio}", level=xbmc.LOGINFO)
         else:
             xbmc.log("service.remove.black.bars.gbm: [IMDb] No aspect ratio found", level=xbmc.LOGWARNING)
         return aspect_ratio
+    except IMDbUnavailableError as e:
+        xbmc.log(f"service.remove.black.bars.gbm: [IMDb] IMDb unavailable: {e}", level=xbmc.LOGWARNING)
+        raise
     except Exception as e:
         # Catch-all pour éviter les fuites mémoire dues aux exceptions non gérées
         xbmc.log(f"service.remove.black.bars.gbm: [IMDb] Unexpected error in getOriginalAspectRatio: {e}", level=xbmc.LOGERROR)
         import traceback
         xbmc.log(f"service.remove.black.bars.gbm: [IMDb] Traceback: {traceback.format_exc()}", level=xbmc.LOGERROR)
-        # Clean up all objects in case of exception
-        soup = None
         return None
     finally:
-        # Explicit cleanup to help garbage collection
-        # Note: requests automatically closes connections, but we clear references
-        search_page = None
-        title_page = None
-        tech_specs_page = None
-        soup = None
\ No newline at end of file
+        get_strategy_stats().save()
+
+
+_STORED_RATIO_PAGE_RE = re.compile(r"/title/(tt\d+)/(technical/)?$")
+
+
+def reparse_page_store(store=None):
+    """
+    Run the parsers again over every title and technical page of the page store (default:
+    the configured one), without any request. Returns {imdb id: ratio string, or list of
+    ratios}, each id resolved as a lookup would: the title page ratio, else the technical
+    page result.
+    """
+    store = store or _page_store
+    if store is None:
+        return {}
+    title_ratios = {}
+    technical_results = {}
+    for page in store.pages():
+        match = _STORED_RATIO_PAGE_RE.search(page.url)
+        if not match:
+            continue
+        if match.group(2):
+            technical_results[match.group(1)] = _parse_technical_page(page.text)
+        else:
+            title_ratios[match.group(1)] = _parse_title_page(page.text)
+    results = {}
+    for imdb_id in set(title_ratios) | set(technical_results):
+        result = title_ratios.get(imdb_id) or technical_results.get(imdb_id)
+        if result:
+            results[imdb_id] = result
+    xbmc.log(f"service.remove.black.bars.gbm: [IMDb] Re-parsed stored pages: {len(results)} titles with a ratio", level=xbmc.LOGINFO)
+    return results
@@ -0,0 +1,741 @@
+import functools
+import os
+import struct
+
+# Video geometry read straight from the container header of local files, without the player:
+# coded size, cropping and pixel aspect, hence the ratio of the frame as displayed and, when
+# the file is cropped, the ratio of the picture inside the encoded bars.
+#
+#   Matroska / WebM   EBML header, then Segment > Tracks > TrackEntry > Video; only the
+#                     Tracks element is read (found by scanning, or through the SeekHead)
+#   MP4 / MOV         ISO-BMFF boxes: the top level is walked with seeks (past mdat, wherever
+#                     moov sits), then moov > trak (handler "vide") > tkhd and
+#                     mdia > minf > stbl > stsd, whose sample entry carries pasp and clap
+#   H.264 / HEVC      the first SPS of the codec private data (avcC / hvcC record), for the
+#                     conformance window (decoder output size) and the VUI sample aspect ratio
+
+PROBE_MEMORY_ENTRIES = 256  # Probed files kept in memory, keyed by path, size and mtime
+MAX_HEADER_BYTES = 1024 * 1024  # Largest header element or box (Tracks, stsd) read into memory
+MAX_TOP_LEVEL_ELEMENTS = 64  # Segment children scanned before giving up on finding Tracks
+
+MKV_EXTENSIONS = (".mkv", ".mk3d", ".webm")
+MP4_EXTENSIONS = (".mp4", ".m4v", ".mov")
+
+
+class MediaProbeError(ValueError):
+    """The file is not a container this module can read, or its header is malformed."""
+
+
+class VideoGeometry:
+    """
+    Geometry of a video track: coded size, crop (pixels cut from each edge of the coded
+    frame) and pixel aspect ratio (par_num / par_den, 1/1 for square pixels).
+    """
+
+    def __init__(self, width, height, crop_top=0, crop_bottom=0, crop_left=0, crop_right=0, par_num=1, par_den=1,
+                 codec=None, codec_private=None):
+        if width <= 0 or height <= 0:
+            raise MediaProbeError(f"invalid coded size {width}x{height}")
+        self.width = width
+        self.height = height
+        self.crop_top = crop_top
+        self.crop_bottom = crop_bottom
+        self.crop_left = crop_left
+        self.crop_right = crop_right
+        self.par_num = par_num or 1
+        self.par_den = par_den or 1
+        self.codec = codec
+        self.codec_private = codec_private
+        self.sps = None  # SequenceParameters, when the codec private data has an SPS
+
+    def __repr__(self):
+        return (f"VideoGeometry({self.width}x{self.height}, crop t{self.crop_top} b{self.crop_bottom} "
+                f"l{self.crop_left} r{self.crop_right}, par {self.par_num}:{self.par_den}, codec {self.codec})")
+
+    @property
+    def cropped_width(self):
+        return self.width - self.crop_left - self.crop_right
+
+    @property
+    def cropped_height(self):
+        return self.height - self.crop_top - self.crop_bottom
+
+    @property
+    def has_crop(self):
+        return bool(self.crop_top or self.crop_bottom or self.crop_left or self.crop_right)
+
+    def _ratio(self, width, height):
+        if width <= 0 or height <= 0:
+            return None
+        # Truncated, like the ratio Kodi computes from streamdetails: a 16:9 frame is 177
+        return width * self.par_num * 100 // (height * self.par_den)
+
+    def frame_ratio(self):
+        """Display ratio x100 of the whole coded frame (encoded bars included)."""
+        return self._ratio(self.width, self.height)
+
+    def cropped_ratio(self):
+        """Display ratio x100 of the picture left after cropping, or None if the file is not cropped."""
+        if not self.has_crop:
+            return None
+        return self._ratio(self.cropped_width, self.cropped_height)
+
+
+# Matroska element ids (with their length marker bits, as written in the file)
+EBML_HEADER = 0x1A45DFA3
+EBML_DOCTYPE = 0x4282
+SEGMENT = 0x18538067
+SEEK_HEAD = 0x114D9B74
+SEEK = 0x4DBB
+SEEK_ID = 0x53AB
+SEEK_POSITION = 0x53AC
+TRACKS = 0x1654AE6B
+CLUSTER = 0x1F43B675
+TRACK_ENTRY = 0xAE
+TRACK_TYPE = 0x83
+CODEC_ID = 0x86
+CODEC_PRIVATE = 0x63A2
+VIDEO = 0xE0
+PIXEL_WIDTH = 0xB0
+PIXEL_HEIGHT = 0xBA
+PIXEL_CROP_BOTTOM = 0x54AA
+PIXEL_CROP_TOP = 0x54BB
+PIXEL_CROP_LEFT = 0x54CC
+PIXEL_CROP_RIGHT = 0x54DD
+DISPLAY_WIDTH = 0x54B0
+DISPLAY_HEIGHT = 0x54BA
+DISPLAY_UNIT = 0x54B2
+
+TRACK_TYPE_VIDEO = 1
+DISPLAY_UNIT_UNKNOWN = 4
+UNKNOWN_SIZE = None
+
+
+def _read_vint(data, pos, keep_marker=False):
+    """
+    Read an EBML variable-length integer from data at pos. Returns (value, next pos);
+    value is UNKNOWN_SIZE for a size with all value bits set (element of unknown size).
+    """
+    if pos >= len(data):
+        raise MediaProbeError("truncated EBML header")
+    first = data[pos]
+    length = 1
+    mask = 0x80
+    while length <= 8 and not first & mask:
+        length += 1
+        mask >>= 1
+    if length > 8 or pos + length > len(data):
+        raise MediaProbeError(f"invalid EBML variable-length integer at {pos}")
+    value = first if keep_marker else first & (mask - 1)
+    for byte in data[pos + 1:pos + length]:
+        value = (value << 8) | byte
+    if not keep_marker and value == (1 << (7 * length)) - 1:
+        return UNKNOWN_SIZE, pos + length
+    return value, pos + length
+
+
+def _elements(data, start=0, end=None):
+    """Yield (element id, data start, data end) of the elements of data[start:end]."""
+    end = len(data) if end is None else end
+    pos = start
+    while pos < end:
+        element_id, pos = _read_vint(data, pos, keep_marker=True)
+        size, pos = _read_vint(data, pos)
+        data_end = end if size is UNKNOWN_SIZE else pos + size
+        if data_end > end:
+            raise MediaProbeError(f"element 0x{element_id:X} overruns its parent")
+        yield element_id, pos, data_end
+        pos = data_end
+
+
+def _uint(data, start, end):
+    return int.from_bytes(data[start:end], "big") if end > start else 0
+
+
+def _read_element_header(f):
+    """Read an element id and size at the current position of f. Returns (id, size, header length), or None at EOF."""
+    head = f.read(12)
+    if not head:
+        return None
+    element_id, pos = _read_vint(head, 0, keep_marker=True)
+    size, pos = _read_vint(head, pos)
+    f.seek(pos - len(head), os.SEEK_CUR)
+    return element_id, size, pos
+
+
+def _read_body(f, size, what):
+    if size is UNKNOWN_SIZE or size > MAX_HEADER_BYTES:
+        raise MediaProbeError(f"{what} element too large to probe")
+    data = f.read(size)
+    if len(data) < size:
+        raise MediaProbeError(f"truncated {what} element")
+    return data
+
+
+def _mkv_tracks_position(f, segment_start, segment_end):
+    """
+    Find the Tracks element among the Segment children: scanned in file order, and if a
+    Cluster (media data) comes first, located through the SeekHead. Returns (size, data
+    offset) of Tracks.
+    """
+    seek_tracks = None
+    pos = segment_start
+    for _ in range(MAX_TOP_LEVEL_ELEMENTS):
+        if segment_end is not None and pos >= segment_end:
+            break
+        f.seek(pos)
+        header = _read_element_header(f)
+        if header is None:
+            break
+        element_id, size, header_length = header
+        if element_id == TRACKS:
+            return size, pos + header_length
+        if element_id == SEEK_HEAD:
+            seek_head = _read_body(f, size, "SeekHead")
+            for seek_element, start, end in _elements(seek_head):
+                if seek_element != SEEK:
+                    continue
+                target = position = None
+                for child, child_start, child_end in _elements(seek_head, start, end):
+                    if child == SEEK_ID:
+                        target = _uint(seek_head, child_start, child_end)
+                    elif child == SEEK_POSITION:
+                        position = _uint(seek_head, child_start, child_end)
+                if target == TRACKS and position is not None:
+                    seek_tracks = segment_start + position
+        if element_id == CLUSTER or size is UNKNOWN_SIZE:
+            break
+        pos += header_length + size
+    if seek_tracks is None:
+        raise MediaProbeError("no Tracks element before the media data")
+    f.seek(seek_tracks)
+    header = _read_element_header(f)
+    if header is None or header[0] != TRACKS:
+        raise MediaProbeError("SeekHead does not point to a Tracks element")
+    return header[1], seek_tracks + header[2]
+
+
+def _mkv_video_geometry(tracks):
+    """VideoGeometry of the first video track of a Tracks element body."""
+    for element_id, start, end in _elements(tracks):
+        if element_id != TRACK_ENTRY:
+            continue
+        fields = {}
+        video = None
+        for child, child_start, child_end in _elements(tracks, start, end):
+            if child == TRACK_TYPE:
+                fields["type"] = _uint(tracks, child_start, child_end)
+            elif child == CODEC_ID:
+                fields["codec"] = bytes(tracks[child_start:child_end]).rstrip(b"\0").decode("ascii", "replace")
+            elif child == CODEC_PRIVATE:
+                fields["codec_private"] = bytes(tracks[child_start:child_end])
+            elif child == VIDEO:
+                video = {field: _uint(tracks, field_start, field_end)
+                         for field, field_start, field_end in _elements(tracks, child_start, child_end)}
+        if fields.get("type") != TRACK_TYPE_VIDEO or video is None:
+            continue
+        crop = [video.get(PIXEL_CROP_TOP, 0), video.get(PIXEL_CROP_BOTTOM, 0),
+                video.get(PIXEL_CROP_LEFT, 0), video.get(PIXEL_CROP_RIGHT, 0)]
+        width = video.get(PIXEL_WIDTH, 0)
+        height = video.get(PIXEL_HEIGHT, 0)
+        cropped_width = width - crop[2] - crop[3]
+        cropped_height = height - crop[0] - crop[1]
+        # DisplayWidth/DisplayHeight apply to the cropped frame; they default to its size
+        par_num, par_den = 1, 1
+        if video.get(DISPLAY_UNIT, 0) != DISPLAY_UNIT_UNKNOWN and cropped_width > 0 and cropped_height > 0:
+            display_width = video.get(DISPLAY_WIDTH) or cropped_width
+            display_height = video.get(DISPLAY_HEIGHT) or cropped_height
+            par_num, par_den = display_width * cropped_height, display_height * cropped_width
+        return VideoGeometry(width, height, *crop, par_num=par_num, par_den=par_den,
+                             codec=fields.get("codec"), codec_private=fields.get("codec_private"))
+    raise MediaProbeError("no video track")
+
+
+def probe_mkv(f):
+    """Read the VideoGeometry of the first video track of a Matroska / WebM file object."""
+    f.seek(0)
+    header = _read_element_header(f)
+    if header is None or header[0] != EBML_HEADER:
+        raise MediaProbeError("not an EBML file")
+    ebml = _read_body(f, header[1], "EBML header")
+    doc_type = b"".join(bytes(ebml[start:end]) for element_id, start, end in _elements(ebml) if element_id == EBML_DOCTYPE)
+    if doc_type not in (b"matroska", b"webm"):
+        raise MediaProbeError(f"unsupported EBML document type {doc_type!r}")
+    segment = _read_element_header(f)
+    if segment is None or segment[0] != SEGMENT:
+        raise MediaProbeError("no Segment element")
+    segment_start = f.tell()
+    segment_end = None if segment[1] is UNKNOWN_SIZE else segment_start + segment[1]
+    size, offset = _mkv_tracks_position(f, segment_start, segment_end)
+    f.seek(offset)
+    return _mkv_video_geometry(memoryview(_read_body(f, size, "Tracks")))
+
+
+BOX_HEADER = struct.Struct(">I4s")
+BOX_LARGE_SIZE = struct.Struct(">Q")
+VISUAL_SAMPLE_ENTRY_SIZE = 78  # Sample entry fields before the child boxes (from the start of the box data)
+MAX_BOXES = 256  # Boxes walked per level before giving up
+
+
+def _boxes(f, start, end):
+    """
+    Yield (type, data start, data end) of the boxes between file offsets start and end
+    (end None: end of file), seeking from one box header to the next.
+    """
+    pos = start
+    for _ in range(MAX_BOXES):
+        if end is not None and pos + BOX_HEADER.size > end:
+            return
+        f.seek(pos)
+        header = f.read(BOX_HEADER.size)
+        if len(header) < BOX_HEADER.size:
+            return
+        size, box_type = BOX_HEADER.unpack(header)
+        data_start = pos + BOX_HEADER.size
+        if size == 1:
+            large = f.read(BOX_LARGE_SIZE.size)
+            if len(large) < BOX_LARGE_SIZE.size:
+                return
+            size = BOX_LARGE_SIZE.unpack(large)[0]
+            data_start += BOX_LARGE_SIZE.size
+        if size == 0:
+            # Box extends to the end of its parent
+            data_end = end if end is not None else f.seek(0, os.SEEK_END)
+        else:
+            data_end = pos + size
+        if data_end < data_start or (end is not None and data_end > end):
+            raise MediaProbeError(f"box {box_type!r} at {pos} overruns its parent")
+        yield box_type, data_start, data_end
+        if size == 0:
+            return
+        pos = data_end
+
+
+def _find_box(f, box_type, start, end):
+    for found, data_start, data_end in _boxes(f, start, end):
+        if found == box_type:
+            return data_start, data_end
+    return None
+
+
+def _read_box(f, start, end, what):
+    f.seek(start)
+    return memoryview(_read_body(f, end - start, what))
+
+
+def _sub_boxes(data, start=0):
+    """Yield (type, data start, data end) of the boxes in an in-memory buffer."""
+    pos = start
+    while pos + BOX_HEADER.size <= len(data):
+        size, box_type = BOX_HEADER.unpack_from(data, pos)
+        header = BOX_HEADER.size
+        if size == 1:
+            if pos + 16 > len(data):
+                break
+            size = BOX_LARGE_SIZE.unpack_from(data, pos + 8)[0]
+            header += BOX_LARGE_SIZE.size
+        elif size == 0:
+            size = len(data) - pos
+        if size < header or pos + size > len(data):
+            break
+        yield box_type, pos + header, pos + size
+        pos += size
+
+
+def _tkhd_size(tkhd):
+    """Presentation width and height (16.16 fixed point) of a tkhd box body."""
+    offset = 88 if tkhd[0] == 1 else 76
+    if len(tkhd) < offset + 8:
+        raise MediaProbeError("truncated tkhd box")
+    width, height = struct.unpack_from(">II", tkhd, offset)
+    return width / 65536.0, height / 65536.0
+
+
+def _mp4_sample_entry(stsd):
+    """(codec, coded width, coded height, child boxes {type: body}) of the first stsd sample entry."""
+    if len(stsd) < 8 or struct.unpack_from(">I", stsd, 4)[0] < 1:
+        raise MediaProbeError("empty stsd box")
+    for codec, start, end in _sub_boxes(stsd, 8):
+        if end - start < VISUAL_SAMPLE_ENTRY_SIZE:
+            raise MediaProbeError(f"truncated {codec!r} sample entry")
+        width, height = struct.unpack_from(">HH", stsd, start + 24)
+        children = {}
+        for child, child_start, child_end in _sub_boxes(stsd[:end], start + VISUAL_SAMPLE_ENTRY_SIZE):
+            children.setdefault(child, stsd[child_start:child_end])
+        return codec.decode("ascii", "replace"), width, height, children
+    raise MediaProbeError("no sample entry")
+
+
+def _mp4_video_geometry(width, height, presentation, codec, children):
+    crop = [0, 0, 0, 0]
+    clap = children.get(b"clap")
+    if clap is not None and len(clap) >= 32:
+        # Clean aperture: centred window of the coded frame, shifted by the offsets
+        aperture_width_n, aperture_width_d, aperture_height_n, aperture_height_d, \
+            horiz_off_n, horiz_off_d, vert_off_n, vert_off_d = struct.unpack_from(">IIIIiIiI", clap)
+        if aperture_width_d and aperture_height_d and horiz_off_d and vert_off_d:
+            aperture_width = min(width, int(round(aperture_width_n / aperture_width_d)))
+            aperture_height = min(height, int(round(aperture_height_n / aperture_height_d)))
+            left = max(0, int(round((width - aperture_width) / 2.0 + horiz_off_n / horiz_off_d)))
+            top = max(0, int(round((height - aperture_height) / 2.0 + vert_off_n / vert_off_d)))
+            crop = [top, max(0, height - aperture_height - top), left, max(0, width - aperture_width - left)]
+    par_num, par_den = 1, 1
+    pasp = children.get(b"pasp")
+    if pasp is not None and len(pasp) >= 8:
+        par_num, par_den = struct.unpack_from(">II", pasp)
+    elif presentation[0] > 0 and presentation[1] > 0:
+        # No pasp: the track header's presentation size carries the pixel aspect
+        par_num, par_den = int(round(presentation[0] * height)), int(round(presentation[1] * width))
+    codec_private = children.get(b"avcC") or children.get(b"hvcC")
+    return VideoGeometry(width, height, *crop, par_num=par_num, par_den=par_den, codec=codec,
+                         codec_private=bytes(codec_private) if codec_private is not None else None)
+
+
+def probe_mp4(f):
+    """Read the VideoGeometry of the first video track of an MP4 / MOV file object."""
+    moov = _find_box(f, b"moov", 0, None)
+    if moov is None:
+        raise MediaProbeError("no moov box")
+    for box_type, trak_start, trak_end in list(_boxes(f, *moov)):
+        if box_type != b"trak":
+            continue
+        mdia = _find_box(f, b"mdia", trak_start, trak_end)
+        hdlr = mdia and _find_box(f, b"hdlr", *mdia)
+        if not hdlr or hdlr[1] - hdlr[0] < 12:
+            continue
+        f.seek(hdlr[0] + 8)
+        if f.read(4) != b"vide":
+            continue
+        tkhd = _find_box(f, b"tkhd", trak_start, trak_end)
+        presentation = _tkhd_size(_read_box(f, *tkhd, "tkhd")) if tkhd else (0, 0)
+        minf = _find_box(f, b"minf", *mdia)
+        stbl = minf and _find_box(f, b"stbl", *minf)
+        stsd = stbl and _find_box(f, b"stsd", *stbl)
+        if not stsd:
+            raise MediaProbeError("video track without stsd box")
+        codec, width, height, children = _mp4_sample_entry(_read_box(f, *stsd, "stsd"))
+        return _mp4_video_geometry(width, height, presentation, codec, children)
+    raise MediaProbeError("no video track")
+
+
+AVC_CODECS = ("V_MPEG4/ISO/AVC", "avc1", "avc3")
+HEVC_CODECS = ("V_MPEGH/ISO/HEVC", "hvc1", "hev1")
+HEVC_SPS_NAL_TYPE = 33
+EXTENDED_SAR = 255
+
+# Sample aspect ratios of aspect_ratio_idc 1 to 16 (same table in H.264 and HEVC)
+SAMPLE_ASPECT_RATIOS = ((1, 1), (12, 11), (10, 11), (16, 11), (40, 33), (24, 11), (20, 11), (32, 11),
+                        (80, 33), (18, 11), (15, 11), (64, 33), (160, 99), (4, 3), (3, 2), (2, 1))
+
+# H.264 profiles whose SPS carries chroma format, bit depths and scaling matrices
+AVC_HIGH_PROFILES = (100, 110, 122, 244, 44, 83, 86, 118, 128, 138, 139, 134, 135)
+
+
+class BitReader:
+    """Reads bits, Exp-Golomb codes included, from an RBSP (emulation prevention bytes removed)."""
+
+    def __init__(self, data):
+        self.data = data
+        self.pos = 0
+
+    def u(self, bits):
+        value = 0
+        for _ in range(bits):
+            byte = self.pos >> 3
+            if byte >= len(self.data):
+                raise MediaProbeError("SPS ends too early")
+            value = (value << 1) | ((self.data[byte] >> (7 - (self.pos & 7))) & 1)
+            self.pos += 1
+        return value
+
+    def skip(self, bits):
+        self.pos += bits
+
+    def ue(self):
+        zeros = 0
+        while not self.u(1):
+            zeros += 1
+            if zeros > 31:
+                raise MediaProbeError("invalid Exp-Golomb code in SPS")
+        return (1 << zeros) - 1 + self.u(zeros)
+
+    def se(self):
+        value = self.ue()
+        return (value + 1) // 2 if value & 1 else -(value // 2)
+
+
+class SequenceParameters:
+    """
+    What the SPS says about the picture: coded size, conformance window (crop the decoder
+    always applies, e.g. 1088 -> 1080 lines) and sample aspect ratio (None if not signalled).
+    """
+
+    def __init__(self, width, height, crop_top=0, crop_bottom=0, crop_left=0, crop_right=0, sar=None):
+        self.width = width
+        self.height = height
+        self.crop_top = crop_top
+        self.crop_bottom = crop_bottom
+        self.crop_left = crop_left
+        self.crop_right = crop_right
+        self.sar = sar
+
+    @property
+    def output_width(self):
+        return self.width - self.crop_left - self.crop_right
+
+    @property
+    def output_height(self):
+        return self.height - self.crop_top - self.crop_bottom
+
+
+def _rbsp(nal):
+    """NAL unit payload with the emulation prevention bytes (00 00 03) removed."""
+    return bytes(nal).replace(b"\x00\x00\x03", b"\x00\x00")
+
+
+def _vui_sar(reader):
+    """Sample aspect ratio from the start of the VUI (aspect_ratio_info), or None."""
+    if not reader.u(1):  # aspect_ratio_info_present_flag
+        return None
+    idc = reader.u(8)
+    if idc == EXTENDED_SAR:
+        sar = (reader.u(16), reader.u(16))
+        return sar if sar[0] and sar[1] else None
+    if 1 <= idc <= len(SAMPLE_ASPECT_RATIOS):
+        return SAMPLE_ASPECT_RATIOS[idc - 1]
+    return None
+
+
+def _chroma_subsampling(chroma_format_idc, separate_colour_plane):
+    """(SubWidthC, SubHeightC); (1, 1) for monochrome or separate colour planes."""
+    if separate_colour_plane or chroma_format_idc == 0:
+        return 1, 1
+    return {1: (2, 2), 2: (2, 1)}.get(chroma_format_idc, (1, 1))
+
+
+def _skip_avc_scaling_list(reader, size):
+    last = next_scale = 8
+    for _ in range(size):
+        if next_scale:
+            next_scale = (last + reader.se() + 256) % 256
+        last = next_scale or last
+
+
+def parse_avc_sps(nal):
+    """Decode an H.264 SPS NAL unit (with its 1-byte header) into SequenceParameters."""
+    reader = BitReader(_rbsp(nal[1:]))
+    profile_idc = reader.u(8)
+    reader.skip(16)  # constraint flags, level_idc
+    reader.ue()  # seq_parameter_set_id
+    chroma_format_idc, separate_colour_plane = 1, 0
+    if profile_idc in AVC_HIGH_PROFILES:
+        chroma_format_idc = reader.ue()
+        if chroma_format_idc == 3:
+            separate_colour_plane = reader.u(1)
+        reader.ue()  # bit_depth_luma_minus8
+        reader.ue()  # bit_depth_chroma_minus8
+        reader.skip(1)  # qpprime_y_zero_transform_bypass_flag
+        if reader.u(1):  # seq_scaling_matrix_present_flag
+            for index in range(8 if chroma_format_idc != 3 else 12):
+                if reader.u(1):
+                    _skip_avc_scaling_list(reader, 16 if index < 6 else 64)
+    reader.ue()  # log2_max_frame_num_minus4
+    pic_order_cnt_type = reader.ue()
+    if pic_order_cnt_type == 0:
+        reader.ue()  # log2_max_pic_order_cnt_lsb_minus4
+    elif pic_order_cnt_type == 1:
+        reader.skip(1)  # delta_pic_order_always_zero_flag
+        reader.se()  # offset_for_non_ref_pic
+        reader.se()  # offset_for_top_to_bottom_field
+        for _ in range(reader.ue()):
+            reader.se()  # offset_for_ref_frame
+    reader.ue()  # max_num_ref_frames
+    reader.skip(1)  # gaps_in_frame_num_value_allowed_flag
+    width_in_mbs = reader.ue() + 1
+    height_in_map_units = reader.ue() + 1
+    frame_mbs_only = reader.u(1)
+    if not frame_mbs_only:
+        reader.skip(1)  # mb_adaptive_frame_field_flag
+    reader.skip(1)  # direct_8x8_inference_flag
+    width = width_in_mbs * 16
+    height = (2 - frame_mbs_only) * height_in_map_units * 16
+    crop = [0, 0, 0, 0]
+    if reader.u(1):  # frame_cropping_flag
+        sub_width, sub_height = _chroma_subsampling(chroma_format_idc, separate_colour_plane)
+        unit_x, unit_y = sub_width, sub_height * (2 - frame_mbs_only)
+        left, right, top, bottom = reader.ue(), reader.ue(), reader.ue(), reader.ue()
+        crop = [top * unit_y, bottom * unit_y, left * unit_x, right * unit_x]
+    sar = _vui_sar(reader) if reader.u(1) else None  # vui_parameters_present_flag
+    return SequenceParameters(width, height, *crop, sar=sar)
+
+
+def _skip_hevc_profile_tier_level(reader, max_sub_layers_minus1):
+    reader.skip(96)  # general profile space, tier, profile, compatibility and constraint flags, level
+    sub_layers = [(reader.u(1), reader.u(1)) for _ in range(max_sub_layers_minus1)]
+    if max_sub_layers_minus1 > 0:
+        reader.skip(2 * (8 - max_sub_layers_minus1))
+    for profile_present, level_present in sub_layers:
+        reader.skip((88 if profile_present else 0) + (8 if level_present else 0))
+
+
+def _skip_hevc_scaling_list_data(reader):
+    for size_id in range(4):
+        for _ in range(0, 6, 3 if size_id == 3 else 1):
+            if not reader.u(1):  # scaling_list_pred_mode_flag
+                reader.ue()  # scaling_list_pred_matrix_id_delta
+                continue
+            if size_id > 1:
+                reader.se()  # scaling_list_dc_coef_minus8
+            for _ in range(min(64, 1 << (4 + (size_id << 1)))):
+                reader.se()  # scaling_list_delta_coef
+
+
+def _skip_hevc_short_term_ref_pic_sets(reader, count):
+    delta_pocs = []
+    for index in range(count):
+        if index and reader.u(1):  # inter_ref_pic_set_prediction_flag
+            reader.skip(1)  # delta_rps_sign
+            reader.ue()  # abs_delta_rps_minus1
+            used = 0
+            for _ in range(delta_pocs[index - 1] + 1):
+                if reader.u(1) or reader.u(1):  # used_by_curr_pic_flag, else use_delta_flag
+                    used += 1
+            delta_pocs.append(used)
+        else:
+            negative, positive = reader.ue(), reader.ue()
+            for _ in range(negative + positive):
+                reader.ue()  # delta_poc_minus1
+                reader.skip(1)  # used_by_curr_pic_flag
+            delta_pocs.append(negative + positive)
+
+
+def parse_hevc_sps(nal):
+    """Decode an HEVC SPS NAL unit (with its 2-byte header) into SequenceParameters."""
+    reader = BitReader(_rbsp(nal[2:]))
+    reader.skip(4)  # sps_video_parameter_set_id
+    max_sub_layers_minus1 = reader.u(3)
+    reader.skip(1)  # sps_temporal_id_nesting_flag
+    _skip_hevc_profile_tier_level(reader, max_sub_layers_minus1)
+    reader.ue()  # sps_seq_parameter_set_id
+    chroma_format_idc = reader.ue()
+    separate_colour_plane = reader.u(1) if chroma_format_idc == 3 else 0
+    width = reader.ue()
+    height = reader.ue()
+    crop = [0, 0, 0, 0]
+    if reader.u(1):  # conformance_window_flag
+        sub_width, sub_height = _chroma_subsampling(chroma_format_idc, separate_colour_plane)
+        left, right, top, bottom = reader.ue(), reader.ue(), reader.ue(), reader.ue()
+        crop = [top * sub_height, bottom * sub_height, left * sub_width, right * sub_width]
+    reader.ue()  # bit_depth_luma_minus8
+    reader.ue()  # bit_depth_chroma_minus8
+    log2_max_poc_lsb = reader.ue() + 4
+    ordering_info_present = reader.u(1)
+    for _ in range(0 if ordering_info_present else max_sub_layers_minus1, max_sub_layers_minus1 + 1):
+        reader.ue()  # sps_max_dec_pic_buffering_minus1
+        reader.ue()  # sps_max_num_reorder_pics
+        reader.ue()  # sps_max_latency_increase_plus1
+    for _ in range(6):
+        reader.ue()  # coding block / transform block sizes and hierarchy depths
+    if reader.u(1) and reader.u(1):  # scaling_list_enabled_flag, sps_scaling_list_data_present_flag
+        _skip_hevc_scaling_list_data(reader)
+    reader.skip(2)  # amp_enabled_flag, sample_adaptive_offset_enabled_flag
+    if reader.u(1):  # pcm_enabled_flag
+        reader.skip(8)  # pcm sample bit depths
+        reader.ue()
+        reader.ue()
+        reader.skip(1)  # pcm_loop_filter_disabled_flag
+    _skip_hevc_short_term_ref_pic_sets(reader, reader.ue())
+    if reader.u(1):  # long_term_ref_pics_present_flag
+        for _ in range(reader.ue()):
+            reader.skip(log2_max_poc_lsb + 1)  # lt_ref_pic_poc_lsb_sps, used_by_curr_pic_lt_sps_flag
+    reader.skip(2)  # sps_temporal_mvp_enabled_flag, strong_intra_smoothing_enabled_flag
+    sar = _vui_sar(reader) if reader.u(1) else None  # vui_parameters_present_flag
+    return SequenceParameters(width, height, *crop, sar=sar)
+
+
+def _avcc_sps(record):
+    """First SPS NAL unit of an avcC (AVCDecoderConfigurationRecord), or None."""
+    if len(record) < 6 or record[0] != 1 or not record[5] & 0x1F:
+        return None
+    length = struct.unpack_from(">H", record, 6)[0] if len(record) >= 8 else 0
+    return record[8:8 + length] if length and 8 + length <= len(record) else None
+
+
+def _hvcc_sps(record):
+    """First SPS NAL unit of an hvcC (HEVCDecoderConfigurationRecord), or None."""
+    if len(record) < 23:
+        return None
+    pos = 23
+    for _ in range(record[22]):
+        if pos + 3 > len(record):
+            return None
+        nal_type = record[pos] & 0x3F
+        count = struct.unpack_from(">H", record, pos + 1)[0]
+        pos += 3
+        for _ in range(count):
+            if pos + 2 > len(record):
+                return None
+            length = struct.unpack_from(">H", record, pos)[0]
+            if nal_type == HEVC_SPS_NAL_TYPE and pos + 2 + length <= len(record):
+                return record[pos + 2:pos + 2 + length]
+            pos += 2 + length
+    return None
+
+
+def parse_codec_private(codec, codec_private):
+    """SequenceParameters of the first SPS of an avcC / hvcC record, or None (other codecs, no SPS)."""
+    if not codec_private:
+        return None
+    if codec in AVC_CODECS:
+        sps = _avcc_sps(codec_private)
+        return parse_avc_sps(sps) if sps else None
+    if codec in HEVC_CODECS:
+        sps = _hvcc_sps(codec_private)
+        return parse_hevc_sps(sps) if sps else None
+    return None
+
+
+def _apply_sequence_parameters(geometry):
+    """
+    Correct a container's geometry with the SPS: the decoder output size (conformance
+    window applied) when the container gives the coded size, and the sample aspect ratio
+    when the container signals square pixels only by default.
+    """
+    try:
+        sps = parse_codec_private(geometry.codec, geometry.codec_private)
+    except MediaProbeError:
+        return geometry
+    if sps is None:
+        return geometry
+    geometry.sps = sps
+    if (geometry.width, geometry.height) == (sps.width, sps.height) and \
+            (sps.output_width, sps.output_height) != (sps.width, sps.height) and not geometry.has_crop:
+        geometry.width, geometry.height = sps.output_width, sps.output_height
+    if sps.sar and sps.sar[0] != sps.sar[1] and geometry.par_num == geometry.par_den:
+        geometry.par_num, geometry.par_den = sps.sar
+    return geometry
+
+
+@functools.lru_cache(maxsize=PROBE_MEMORY_ENTRIES)
+def _probe_cached(path, size, mtime_ns):
+    extension = os.path.splitext(path)[1].lower()
+    with open(path, "rb") as f:
+        if extension in MKV_EXTENSIONS:
+            return _apply_sequence_parameters(probe_mkv(f))
+        if extension in MP4_EXTENSIONS:
+            return _apply_sequence_parameters(probe_mp4(f))
+    raise MediaProbeError(f"unsupported container {extension or '(no extension)'}")
+
+
+def is_supported(path):
+    """True if path is a local file of a container this module can read."""
+    return bool(path) and "://" not in path and os.path.splitext(path)[1].lower() in MKV_EXTENSIONS + MP4_EXTENSIONS
+
+
+def probe_file(path):
+    """
+    Return the VideoGeometry of the first video track of a local file, memoized by path,
+    size and mtime. Raises MediaProbeError (unsupported or malformed file) or OSError.
+    """
+    stat = os.stat(path)
+    return _probe_cached(path, stat.st_size, stat.st_mtime_ns)
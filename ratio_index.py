@@ -0,0 +1,195 @@
+import json
+import mmap
+import os
+import re
+import struct
+
+# Compact binary format for the ratio cache, read through mmap with binary search:
+#
+#   header   32 bytes   magic, version, record counts and section offsets
+#   ids      12 bytes   per record: numeric imdb id (u32), ratio (u16), flags (u16), timestamp (u32)
+#   titles   16 bytes   per record: string offset (u32), string length (u16), ratio (u16),
+#                       flags (u16), padding (u16), timestamp (u32)
+#   strings             UTF-8 keys referenced by the title records
+#
+# Both record arrays are sorted (by id, and by UTF-8 key bytes), so a lookup is a binary
+# search over the mapped file: no parsing at startup and no dict of every entry in memory.
+# Keys "imdb:ttNNNNNNN" go to the id array; any other key (title + year) to the title array.
+
+MAGIC = b"RBBX"
+VERSION = 1
+
+HEADER = struct.Struct("<4sHHIIIII4x")
+ID_RECORD = struct.Struct("<IHHI")
+TITLE_RECORD = struct.Struct("<IHHHxxI")
+
+# Record flags
+FLAG_MISS = 0x1  # Negative entry: IMDb has no ratio (timestamp = time of the miss)
+
+_IMDB_KEY_RE = re.compile(r"^imdb:tt(\d{7,10})$")
+
+
+def _imdb_number(key):
+    """Return the numeric imdb id of an "imdb:ttNNNNNNN" key, or None if the key does not round-trip."""
+    match = _IMDB_KEY_RE.match(key)
+    if not match:
+        return None
+    number = int(match.group(1))
+    if number > 0xFFFFFFFF or _imdb_key(number) != key:
+        return None
+    return number
+
+
+def _imdb_key(number):
+    return "imdb:tt%07d" % number
+
+
+def _encode_value(value):
+    """Cache value (ratio int or {"miss": timestamp}) to (ratio, flags, timestamp)."""
+    if isinstance(value, dict):
+        return 0, FLAG_MISS, int(value.get("miss", 0))
+    return int(value), 0, 0
+
+
+def _decode_value(ratio, flags, timestamp):
+    if flags & FLAG_MISS:
+        return {"miss": timestamp}
+    return ratio
+
+
+def write_ratio_index(path, entries):
+    """
+    Write entries ((key, value) pairs, value being a ratio or {"miss": timestamp}) to path
+    in the binary index format. Returns the number of entries written.
+    """
+    ids = {}
+    titles = {}
+    for key, value in entries:
+        try:
+            record = _encode_value(value)
+        except (TypeError, ValueError):
+            continue
+        if not 0 <= record[0] <= 0xFFFF:
+            continue
+        number = _imdb_number(key)
+        if number is not None:
+            ids[number] = record
+        else:
+            encoded = key.encode("utf-8")
+            if len(encoded) <= 0xFFFF:
+                titles[encoded] = record
+
+    title_keys = sorted(titles)
+    ids_offset = HEADER.size
+    titles_offset = ids_offset + len(ids) * ID_RECORD.size
+    strings_offset = titles_offset + len(titles) * TITLE_RECORD.size
+    strings_size = sum(len(key) for key in title_keys)
+
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, 0, len(ids), len(titles), titles_offset, strings_offset, strings_size))
+        for number in sorted(ids):
+            f.write(ID_RECORD.pack(number, *ids[number]))
+        string_offset = 0
+        for key in title_keys:
+            ratio, flags, timestamp = titles[key]
+            f.write(TITLE_RECORD.pack(string_offset, len(key), ratio, flags, timestamp))
+            string_offset += len(key)
+        for key in title_keys:
+            f.write(key)
+        f.flush()
+        os.fsync(f.fileno())
+    return len(ids) + len(titles)
+
+
+def convert_json_cache(json_path, index_path):
+    """
+    Convert a cache.json snapshot (single-line, or one entry per line) to the binary
+    index format. Returns the number of entries written.
+    """
+    with open(json_path, "r", encoding="utf-8") as f:
+        cache = json.load(f)
+    if not isinstance(cache, dict):
+        raise ValueError(f"{json_path} is not a JSON object")
+    return write_ratio_index(index_path, cache.items())
+
+
+class RatioIndex:
+    """Read-only view of a binary ratio index, memory-mapped and searched in place."""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            self._file.close()
+            raise
+        try:
+            if len(self._map) < HEADER.size:
+                raise ValueError(f"{path} is too short for a ratio index")
+            magic, version, _, self._id_count, self._title_count, self._titles_offset, self._strings_offset, strings_size = \
+                HEADER.unpack_from(self._map, 0)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"{path} is not a ratio index (magic {magic!r}, version {version})")
+            if self._strings_offset + strings_size > len(self._map) or \
+                    self._titles_offset + self._title_count * TITLE_RECORD.size > self._strings_offset or \
+                    HEADER.size + self._id_count * ID_RECORD.size > self._titles_offset:
+                raise ValueError(f"{path} is truncated")
+        except Exception:
+            self.close()
+            raise
+
+    def __len__(self):
+        return self._id_count + self._title_count
+
+    def close(self):
+        try:
+            self._map.close()
+        except Exception:
+            pass
+        self._file.close()
+
+    def _title_record(self, index):
+        return TITLE_RECORD.unpack_from(self._map, self._titles_offset + index * TITLE_RECORD.size)
+
+    def _title_bytes(self, string_offset, length):
+        start = self._strings_offset + string_offset
+        return self._map[start:start + length]
+
+    def get(self, key):
+        """Return the value stored for key (ratio or {"miss": timestamp}), or None."""
+        number = _imdb_number(key)
+        if number is not None:
+            lo, hi = 0, self._id_count
+            while lo < hi:
+                mid = (lo + hi) // 2
+                mid_number, ratio, flags, timestamp = ID_RECORD.unpack_from(self._map, HEADER.size + mid * ID_RECORD.size)
+                if mid_number == number:
+                    return _decode_value(ratio, flags, timestamp)
+                if mid_number < number:
+                    lo = mid + 1
+                else:
+                    hi = mid
+            return None
+        encoded = key.encode("utf-8")
+        lo, hi = 0, self._title_count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            string_offset, length, ratio, flags, timestamp = self._title_record(mid)
+            mid_key = self._title_bytes(string_offset, length)
+            if mid_key == encoded:
+                return _decode_value(ratio, flags, timestamp)
+            if mid_key < encoded:
+                lo = mid + 1
+            else:
+                hi = mid
+        return None
+
+    def items(self):
+        """Yield every (key, value) pair in the index."""
+        for index in range(self._id_count):
+            number, ratio, flags, timestamp = ID_RECORD.unpack_from(self._map, HEADER.size + index * ID_RECORD.size)
+            yield _imdb_key(number), _decode_value(ratio, flags, timestamp)
+        for index in range(self._title_count):
+            string_offset, length, ratio, flags, timestamp = self._title_record(index)
+            yield self._title_bytes(string_offset, length).decode("utf-8"), _decode_value(ratio, flags, timestamp)
@@ -20,6 +20,7 @@ sys.modules['xbmcaddon'].Addon = lambda: mock_kodi.MockAddon()
 sys.modules['xbmcgui'] = mock_kodi.MockXbmcgui()
 
 from addon import JsonCacheProvider, translate_profile_path
+from ratio_index import RatioIndex, convert_json_cache, write_ratio_index
 from tests.mock_kodi import MockAddon
 
 
@@ -122,3 +123,385 @@ def test_overwrite_existing(temp_cache):
     temp_cache.store("Test Movie", 2020, 235)  # Overwrite
     ratio = temp_cache.get("Test Movie", 2020)
     assert ratio == 235
+
+
+def reload_cache(path):
+    """Crée un nouveau provider qui recharge snapshot + journal depuis path"""
+    new_cache = JsonCacheProvider()
+    new_cache.path = path
+    new_cache._cache = new_cache._load()
+    return new_cache
+
+
+def test_store_appends_to_journal(temp_cache):
+    """Test que store() ajoute au journal sans réécrire le snapshot"""
+    temp_cache.store("Movie 1", 2020, 185)
+    temp_cache.store("Movie 2", 2021, 235)
+    
+    assert not os.path.exists(temp_cache.path)
+    with open(temp_cache.journal_path, "r", encoding="utf-8") as f:
+        records = [json.loads(line) for line in f]
+    assert records == [{"k": "movie 1 (2020)", "v": 185}, {"k": "movie 2 (2021)", "v": 235}]
+
+
+def test_journal_replayed_on_load(temp_cache):
+    """Test que le journal est rejoué par-dessus le snapshot au chargement"""
+    temp_cache.store("Movie 1", 2020, 185)
+    temp_cache._save()
+    temp_cache.store("Movie 1", 2020, 200)  # Overwrite après snapshot
+    temp_cache.store("Movie 2", 2021, 235)
+    
+    new_cache = reload_cache(temp_cache.path)
+    assert new_cache.get("Movie 1", 2020) == 200
+    assert new_cache.get("Movie 2", 2021) == 235
+
+
+def test_torn_journal_record_ignored(temp_cache):
+    """Test qu'un enregistrement tronqué (coupure de courant) n'empêche pas le chargement"""
+    temp_cache.store("Movie 1", 2020, 185)
+    with open(temp_cache.journal_path, "a", encoding="utf-8") as f:
+        f.write('{"k":"movie 2 (20')
+    
+    new_cache = reload_cache(temp_cache.path)
+    assert new_cache.get("Movie 1", 2020) == 185
+    assert new_cache.get("Movie 2", 2021) is None
+
+
+def test_corrupt_snapshot_keeps_journal_entries(temp_cache):
+    """Test qu'un snapshot corrompu ne fait pas perdre les entrées du journal"""
+    with open(temp_cache.path, "w", encoding="utf-8") as f:
+        f.write('{"movie 0 (2019)": 1')
+    temp_cache.store("Movie 1", 2020, 185)
+    
+    new_cache = reload_cache(temp_cache.path)
+    assert new_cache.get("Movie 1", 2020) == 185
+
+
+def test_compact_writes_snapshot_and_drops_journal(temp_cache):
+    """Test que compact() écrit le snapshot de façon atomique et supprime le journal"""
+    temp_cache.store("Movie 1", 2020, 185)
+    temp_cache.compact()
+    
+    assert not os.path.exists(temp_cache.journal_path)
+    assert not os.path.exists(temp_cache.index_path + ".tmp")
+    assert dict(RatioIndex(temp_cache.index_path).items()) == {"movie 1 (2020)": 185}
+
+
+def test_journal_compacted_when_too_long(temp_cache, monkeypatch):
+    """Test que le journal est compacté automatiquement quand il devient trop long"""
+    import addon as addon_module
+    monkeypatch.setattr(addon_module, "CACHE_JOURNAL_MAX_RECORDS", 3)
+    temp_cache._journal_records = 0
+    temp_cache.store("Movie 1", 2020, 185)
+    temp_cache.store("Movie 2", 2021, 200)
+    assert not os.path.exists(temp_cache.index_path)
+    temp_cache.store("Movie 3", 2022, 235)
+    
+    assert os.path.exists(temp_cache.index_path)
+    assert not os.path.exists(temp_cache.journal_path)
+    new_cache = reload_cache(temp_cache.path)
+    assert new_cache.get("Movie 3", 2022) == 235
+
+
+def test_clear_removes_snapshot_and_journal(temp_cache):
+    """Test que clear() supprime le snapshot et le journal"""
+    temp_cache.store("Movie 1", 2020, 185)
+    temp_cache._save()
+    temp_cache.store("Movie 2", 2021, 235)
+    
+    assert temp_cache.clear()
+    assert not os.path.exists(temp_cache.index_path)
+    assert not os.path.exists(temp_cache.journal_path)
+    assert temp_cache.get("Movie 2", 2021) is None
+
+
+def test_store_miss_and_fresh_miss(temp_cache):
+    """Test entrée négative : un échec IMDb récent est mémorisé, get() reste None"""
+    assert not temp_cache.has_fresh_miss("Unknown Movie", 2020)
+    temp_cache.store_miss("Unknown Movie", 2020)
+    assert temp_cache.has_fresh_miss("Unknown Movie", 2020)
+    assert temp_cache.get("Unknown Movie", 2020) is None
+
+
+def test_miss_not_counted(temp_cache):
+    """Test que les entrées négatives ne comptent pas dans la taille du cache, journal et snapshot"""
+    temp_cache.store("Known Movie", 2020, 185)
+    assert temp_cache.count() == 1
+    temp_cache.store_miss("Unknown Movie", 2020)
+    assert temp_cache.count() == 1
+    temp_cache._save()
+    assert temp_cache.count() == 1
+
+
+def test_miss_expires_after_ttl(temp_cache):
+    """Test que l'entrée négative expire après le TTL"""
+    temp_cache.negative_ttl_s = 3600
+    temp_cache.store_miss("Unknown Movie", 2020)
+    temp_cache._cache["unknown movie (2020)"]["miss"] -= 3601
+    assert not temp_cache.has_fresh_miss("Unknown Movie", 2020)
+
+
+def test_miss_does_not_replace_ratio(temp_cache):
+    """Test qu'une entrée négative n'écrase pas un ratio connu"""
+    temp_cache.store("Test Movie", 2020, 235)
+    temp_cache.store_miss("Test Movie", 2020)
+    assert temp_cache.get("Test Movie", 2020) == 235
+    assert not temp_cache.has_fresh_miss("Test Movie", 2020)
+
+
+def test_ratio_replaces_miss(temp_cache):
+    """Test qu'un ratio trouvé plus tard remplace l'entrée négative"""
+    temp_cache.store_miss("Test Movie", 2020)
+    temp_cache.store("Test Movie", 2020, 235)
+    assert temp_cache.get("Test Movie", 2020) == 235
+    assert not temp_cache.has_fresh_miss("Test Movie", 2020)
+
+
+def test_miss_persisted(temp_cache):
+    """Test que l'entrée négative survit au rechargement (journal)"""
+    temp_cache.store_miss(None, None, imdb_id="tt7654321")
+    new_cache = reload_cache(temp_cache.path)
+    assert new_cache.has_fresh_miss(None, None, imdb_id="tt7654321")
+
+
+def test_negative_caching_disabled_with_zero_ttl(temp_cache):
+    """Test que TTL 0 désactive le cache négatif"""
+    temp_cache.negative_ttl_s = 0
+    temp_cache.store_miss("Unknown Movie", 2020)
+    assert not temp_cache.has_fresh_miss("Unknown Movie", 2020)
+
+
+def test_lru_dict_evicts_least_recently_used():
+    """Test que LruDict garde au plus max_entries éléments, en évinçant le moins récemment utilisé"""
+    from addon import LruDict
+    lru = LruDict(2)
+    lru["a"] = 1
+    lru["b"] = 2
+    assert lru.get("a") == 1  # "a" devient le plus récent
+    lru["c"] = 3
+    assert list(lru.keys()) == ["a", "c"]
+    assert lru.get("b") is None
+
+
+def test_memory_tier_is_bounded(temp_cache):
+    """Test que le cache mémoire reste borné quelle que soit la taille du fichier"""
+    from addon import LruDict
+    temp_cache.memory_entries = 3
+    temp_cache._cache = LruDict(3)
+    for i in range(10):
+        temp_cache.store(f"Movie {i}", 2000 + i, 185 + i)
+    assert len(temp_cache._cache) == 3
+
+
+def test_evicted_entry_read_back_from_disk(temp_cache):
+    """Test qu'une entrée évincée de la mémoire reste lisible depuis le disque (journal et snapshot)"""
+    from addon import LruDict
+    temp_cache._cache = LruDict(2)
+    temp_cache.store("Movie 0", 2000, 185)
+    temp_cache.store("Movie 1", 2001, 200)
+    temp_cache.store("Movie 2", 2002, 235)
+    assert "movie 0 (2000)" not in temp_cache._cache
+    assert temp_cache.get("Movie 0", 2000) == 185  # Depuis le journal
+    
+    temp_cache._save()
+    temp_cache._cache = LruDict(2)
+    assert temp_cache.get("Movie 1", 2001) == 200  # Depuis le snapshot
+    assert temp_cache.get("Unknown", 2001) is None
+
+
+def test_misses_do_not_reparse_journal(temp_cache, monkeypatch):
+    """Test que les absences du tier mémoire ne relisent pas le journal tant qu'il ne change pas"""
+    from addon import LruDict
+    temp_cache._cache = LruDict(1)
+    temp_cache.store("Movie 0", 2000, 185)
+    temp_cache.store("Movie 1", 2001, 200)
+    replays = []
+    original_replay = JsonCacheProvider._replay_journal
+    monkeypatch.setattr(JsonCacheProvider, "_replay_journal",
+                        lambda self, cache: replays.append(1) or original_replay(self, cache))
+
+    for i in range(5):
+        assert temp_cache.get(f"Unknown {i}", 2000) is None
+    assert temp_cache.get("Movie 0", 2000) == 185
+    temp_cache.store("Movie 2", 2002, 235)
+    temp_cache._cache = LruDict(1)
+    assert temp_cache.get("Movie 2", 2002) == 235
+    assert len(replays) <= 1
+
+    with open(temp_cache.journal_path, "a", encoding="utf-8") as f:
+        f.write(json.dumps({"k": "movie 3 (2003)", "v": 240}) + "\n")
+    temp_cache._signature = temp_cache._disk_signature()  # Ecriture externe sans rechargement complet
+    assert temp_cache._read_disk_entry("movie 3 (2003)") == 240
+
+
+def test_compaction_keeps_evicted_entries(temp_cache):
+    """Test que la compaction ne perd pas les entrées évincées de la mémoire"""
+    from addon import LruDict
+    temp_cache._cache = LruDict(1)
+    temp_cache.store("Movie 0", 2000, 185)
+    temp_cache._save()
+    temp_cache.store("Movie 1", 2001, 200)
+    temp_cache.store("Movie 2", 2002, 235)
+    temp_cache._save()
+    
+    assert dict(RatioIndex(temp_cache.index_path).items()) == {"movie 0 (2000)": 185, "movie 1 (2001)": 200, "movie 2 (2002)": 235}
+    assert temp_cache.count() == 3
+
+
+def test_legacy_json_snapshot_converted(temp_cache):
+    """Test conversion au chargement d'un cache.json écrit par les anciennes versions"""
+    with open(temp_cache.path, "w", encoding="utf-8") as f:
+        json.dump({"imdb:tt0230011": 239, "basil": 185}, f)
+    
+    new_cache = reload_cache(temp_cache.path)
+    assert new_cache.get("Atlantide", 2001, imdb_id="tt0230011") == 239
+    new_cache._cache.clear()
+    assert new_cache.get("Basil") == 185
+    assert os.path.exists(temp_cache.index_path)
+    assert not os.path.exists(temp_cache.path)
+
+
+def test_ratio_index_binary_search(tmp_path):
+    """Test écriture et recherche dichotomique dans l'index binaire"""
+    path = str(tmp_path / "cache.bin")
+    entries = {f"imdb:tt{i:07d}": 100 + i for i in range(0, 400, 3)}
+    entries.update({f"movie {i} (2000)": 200 + i for i in range(50)})
+    entries["été meurtrier (1983)"] = 185
+    entries["imdb:tt12345678"] = 239
+    entries["imdb:123"] = 133  # Identifiant non normalisé : rangé avec les titres
+    entries["imdb:tt0000001"] = {"miss": 1700000000}
+    assert write_ratio_index(path, entries.items()) == len(entries)
+
+    index = RatioIndex(path)
+    for key, value in entries.items():
+        assert index.get(key) == value
+    assert index.get("imdb:tt0000002") is None
+    assert index.get("imdb:tt99999999") is None
+    assert index.get("movie 999 (2000)") is None
+    assert index.get("") is None
+    assert dict(index.items()) == entries
+    index.close()
+
+
+def test_ratio_index_rejects_other_files(tmp_path):
+    """Test qu'un fichier qui n'est pas un index binaire est refusé"""
+    path = tmp_path / "cache.bin"
+    path.write_bytes(b'{"basil": 185}')
+    with pytest.raises(ValueError):
+        RatioIndex(str(path))
+
+
+def test_convert_json_cache(tmp_path):
+    """Test du convertisseur cache.json vers cache.bin"""
+    json_path = tmp_path / "cache.json"
+    json_path.write_text('{\n"imdb:tt0230011": 239,\n"basil": 185,\n"unknown (2020)": {"miss": 1700000000}\n}\n', encoding="utf-8")
+    assert convert_json_cache(str(json_path), str(tmp_path / "cache.bin")) == 3
+    index = RatioIndex(str(tmp_path / "cache.bin"))
+    assert index.get("imdb:tt0230011") == 239
+    assert index.get("basil") == 185
+    assert index.get("unknown (2020)") == {"miss": 1700000000}
+    index.close()
+
+
+def test_seed_consulted_after_user_cache(temp_cache):
+    """Test que la base seed livrée avec l'addon est consultée après le cache utilisateur"""
+    temp_cache.use_seed = True
+    assert temp_cache.get("The Artist", 2011, imdb_id="tt1655442") == 137
+    assert temp_cache.get("The Artist", 2011) is None  # Seed indexée par imdb id uniquement
+    temp_cache.store("The Artist", 2011, 133, imdb_id="tt1655442")
+    assert temp_cache.get("The Artist", 2011, imdb_id="tt1655442") == 133
+    assert temp_cache.count() == 1  # La seed n'est pas copiée dans le cache utilisateur
+
+
+def test_seed_ignored_when_cache_disabled(temp_cache):
+    """Test que la seed n'est pas utilisée quand le cache est désactivé"""
+    temp_cache.use_seed = True
+    temp_cache.enabled = False
+    assert temp_cache.get("The Artist", 2011, imdb_id="tt1655442") is None
+
+
+def test_seed_off_by_default(temp_cache):
+    """Test que la seed n'est pas consultée sans le réglage use_seed_database"""
+    assert temp_cache.get("The Artist", 2011, imdb_id="tt1655442") is None
+
+
+@pytest.fixture
+def shared_window(monkeypatch):
+    """Fixture : propriétés de Window(10000) partagées entre instances, comme dans Kodi"""
+    import addon as addon_module
+    properties = {}
+
+    class SharedWindow:
+        def __init__(self, window_id):
+            pass
+
+        def getProperty(self, key):
+            return properties.get(key, "")
+
+        def setProperty(self, key, value):
+            properties[key] = value
+    monkeypatch.setattr(addon_module.xbmcgui, "Window", SharedWindow)
+    return properties
+
+
+def test_external_clear_detected(temp_cache, shared_window):
+    """Test que le service voit un clear_cache lancé depuis un autre processus"""
+    temp_cache.store("Movie 1", 2020, 185)
+    temp_cache._save()
+    assert temp_cache.get("Movie 1", 2020) == 185
+
+    other = reload_cache(temp_cache.path)
+    assert other.clear()
+    assert shared_window["removeblackbars_cache_generation"] == "1"
+
+    assert temp_cache.get("Movie 1", 2020) is None
+    temp_cache.store("Movie 2", 2021, 235)
+    assert temp_cache.count() == 1  # Les anciennes entrées ne sont pas réécrites
+    temp_cache.compact()
+    assert dict(RatioIndex(temp_cache.index_path).items()) == {"movie 2 (2021)": 235}
+
+
+def test_external_write_detected(temp_cache, shared_window):
+    """Test qu'une entrée écrite par un autre processus est vue sans recharger tout le fichier"""
+    assert temp_cache.get("Movie 1", 2020) is None  # Absence mémorisée dans le tier mémoire
+    other = reload_cache(temp_cache.path)
+    other.store("Movie 1", 2020, 185)
+    other.compact()
+    assert temp_cache.get("Movie 1", 2020) == 185
+
+
+def test_reparse_pages_refreshes_title_keys(tmp_path, monkeypatch):
+    """Test re-parse des pages stockées : entrées par imdb id et entrées par titre qui y mènent"""
+    import addon as addon_module
+    import imdb
+    monkeypatch.setattr(addon_module.xbmcaddon, "Addon",
+                        lambda: MockAddon(settings={"enable_cache": "true"}, profile_path=str(tmp_path)))
+    dialogs = []
+
+    class Dialog:
+        def ok(self, heading, message):
+            dialogs.append(message)
+
+        def notification(self, *args, **kwargs):
+            pass
+    monkeypatch.setattr(addon_module.xbmcgui, "Dialog", Dialog)
+    cache = JsonCacheProvider()
+    cache.store("Atlantide", 2001, 185)  # Ancien résultat du parseur, sans imdb id
+    cache.store("Other Movie", 2001, 200)
+    cache.compact()
+    store = imdb.configure_page_store(os.path.join(str(tmp_path), addon_module.PAGE_STORE_DIRNAME))
+    try:
+        store.put(imdb.FetchedPage(imdb._suggestion_url("atlantide 2001"), json.dumps({"d": [
+            {"id": "tt0230011", "l": "Atlantide", "y": 2001, "qid": "movie"}]}).encode(), "utf-8"))
+        store.put(imdb.FetchedPage("https://www.imdb.com/title/tt0230011/",
+                                   b'<li data-testid="title-techspec_aspectratio"><ul><li><span class="ipc-metadata-list-item__list-content-item">'
+                                   b'2.39 : 1</span></li></ul></li>', "utf-8"))
+        addon_module.reparse_pages()
+    finally:
+        imdb.configure_page_store(None)
+
+    assert dialogs == ["IMDb pages re-parsed.\n2 ratios stored in the cache."]
+    cache = JsonCacheProvider()
+    assert cache.get(None, None, imdb_id="tt0230011") == 239
+    assert cache.get("Atlantide", 2001) == 239
+    assert cache.get("Other Movie", 2001) == 200
@@ -0,0 +1,218 @@
+"""
+Tests pour DetectionWorker et l'annulation de la détection par génération.
+"""
+import sys
+import os
+import json
+import threading
+import pytest
+
+# Ajouter le répertoire parent au path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Mocker les modules Kodi avant d'importer addon
+import tests.mock_kodi as mock_kodi
+mock_xbmc = mock_kodi.MockXbmc()
+sys.modules['xbmc'] = mock_xbmc
+sys.modules['xbmcaddon'] = type(sys)('xbmcaddon')
+sys.modules['xbmcaddon'].Addon = lambda: mock_kodi.MockAddon()
+sys.modules['xbmcgui'] = mock_kodi.MockXbmcgui()
+
+from addon import DetectionWorker, KodiMetadataProvider, Service
+from tests.mock_kodi import MockVideoInfoTag
+import addon as addon_module
+
+
+@pytest.fixture(autouse=True)
+def setup_test():
+    """Fixture automatique : settings IMDb activé, cache désactivé, streamdetails 1920x1080"""
+    original_executeJSONRPC = addon_module.xbmc.executeJSONRPC
+    mock_addon = mock_kodi.MockAddon(settings={
+        "enable_imdb": "true",
+        "enable_cache": "false",
+        "zoom_narrow_ratios": "false"
+    })
+    addon_module.xbmcaddon.Addon = lambda: mock_addon
+
+    def mock_executeJSONRPC(command):
+        cmd = json.loads(command)
+        if cmd.get("method") == "Player.GetItem" and "streamdetails" in cmd["params"]["properties"]:
+            return json.dumps({"result": {"item": {"streamdetails": {"video": [{"width": 1920, "height": 1080}]}}}})
+        return json.dumps({"result": {"item": {"type": "movie", "uniqueid": {"imdb": "tt1234567"}}}})
+    addon_module.xbmc.executeJSONRPC = mock_executeJSONRPC
+
+    yield
+
+    addon_module.xbmc.executeJSONRPC = original_executeJSONRPC
+
+
+def make_service(imdb_lookup):
+    """Crée un Service qui joue une vidéo, avec un IMDb mocké et un apply_zoom enregistré"""
+    service = Service()
+    video_tag = MockVideoInfoTag(title="Test Movie", year=2020)
+    service.cache.get = lambda *args, **kwargs: None
+    service.imdb.get_aspect_ratio = imdb_lookup
+    service.isPlayingVideo = lambda: True
+    service.getVideoInfoTag = lambda: video_tag
+    service.applied = []
+    service.zoom.apply_zoom = lambda *args, **kwargs: service.applied.append(args)
+    return service
+
+
+def test_new_session_cancels_previous():
+    """Test qu'une nouvelle session annule le token de la précédente"""
+    worker = DetectionWorker()
+    first = worker.new_session()
+    assert not first.is_cancelled()
+    second = worker.new_session()
+    assert first.is_cancelled()
+    assert not second.is_cancelled()
+    worker.cancel()
+    assert second.is_cancelled()
+
+
+def test_worker_skips_stale_jobs():
+    """Test que le worker ignore les jobs dont la génération est périmée"""
+    worker = DetectionWorker()
+    ran = []
+    done = threading.Event()
+    stale = worker.new_session()
+    current = worker.new_session()
+    worker.submit(lambda token: ran.append(token.generation), stale)
+    worker.submit(lambda token: (ran.append(token.generation), done.set()), current)
+    assert done.wait(2)
+    worker.stop()
+    assert ran == [current.generation]
+
+
+def test_stale_result_not_applied():
+    """Test qu'un résultat d'une génération annulée n'atteint pas apply_zoom"""
+    def imdb_lookup(title, imdb_number=None, **kwargs):
+        # La lecture s'arrête pendant la requête IMDb
+        service.detection.cancel()
+        return 235
+    service = make_service(imdb_lookup)
+
+    service.on_av_started(service.detection.new_session())
+
+    assert service.applied == []
+
+
+def test_current_result_applied():
+    """Test qu'un résultat de la génération courante est appliqué"""
+    service = make_service(lambda title, imdb_number=None, **kwargs: 235)
+
+    service.on_av_started(service.detection.new_session())
+
+    assert len(service.applied) == 1
+    assert service.applied[0][0] == 235
+
+
+def test_on_av_started_callback_runs_on_worker():
+    """Test que onAVStarted rend la main immédiatement et que la détection tourne en arrière-plan"""
+    release = threading.Event()
+    detection_threads = []
+
+    def imdb_lookup(title, imdb_number=None, **kwargs):
+        release.wait(2)
+        return 235
+    service = make_service(imdb_lookup)
+    original_detect = service._detect_aspect_ratio
+
+    def tracking_detect(token=None):
+        detection_threads.append(threading.current_thread())
+        return original_detect(token)
+    service._detect_aspect_ratio = tracking_detect
+
+    applied = threading.Event()
+    service.zoom.apply_zoom = lambda *args, **kwargs: (service.applied.append(args), applied.set())
+
+    service.onAVStarted()
+    assert service.applied == [], "onAVStarted should not block on detection"
+    release.set()
+    assert applied.wait(5)
+    service.detection.stop()
+
+    assert detection_threads and detection_threads[0] is not threading.current_thread()
+    assert len(service.applied) == 1
+
+
+def test_playback_stopped_cancels_in_flight_detection():
+    """Test que onPlayBackStopped annule une détection en cours"""
+    started = threading.Event()
+    release = threading.Event()
+
+    def imdb_lookup(title, imdb_number=None, **kwargs):
+        started.set()
+        release.wait(2)
+        return 235
+    service = make_service(imdb_lookup)
+
+    service.onAVStarted()
+    assert started.wait(2)
+    service.onPlayBackStopped()
+    release.set()
+    service.detection.stop(timeout_s=5)
+
+    assert service.applied == []
+
+
+def test_kodi_polling_stops_when_cancelled():
+    """Test que le polling streamdetails s'arrête dès l'annulation"""
+    calls = []
+
+    def empty_streamdetails(command):
+        calls.append(command)
+        return json.dumps({"result": {"item": {"streamdetails": {"video": []}}}})
+    addon_module.xbmc.executeJSONRPC = empty_streamdetails
+    provider = KodiMetadataProvider()
+
+    assert provider.get_aspect_ratio(MockVideoInfoTag(), cancelled=lambda: len(calls) >= 2) is None
+    assert len(calls) == 2
+
+
+def test_budget_applies_best_answer_so_far():
+    """Test budget de temps : IMDb bloqué, le ratio Kodi est appliqué à l'échéance"""
+    release = threading.Event()
+
+    def imdb_lookup(title, imdb_number=None, **kwargs):
+        release.wait(5)
+        return 235
+    service = make_service(imdb_lookup)
+    token = service.detection.new_session(budget_s=0.5)
+    try:
+        service.on_av_started(token)
+        assert token.elapsed_ms() < 2000
+    finally:
+        release.set()
+
+    assert len(service.applied) == 1
+    assert service.applied[0][0] == 177
+
+
+def test_token_wait_budget_exceeded():
+    """Test que l'attente d'une étape s'arrête quand le budget est épuisé"""
+    from concurrent.futures import Future
+    worker = DetectionWorker()
+    token = worker.new_session(budget_s=0.2)
+    with pytest.raises(addon_module.DetectionBudgetExceeded):
+        token.wait(Future())
+    done = Future()
+    done.set_result(185)
+    assert token.wait(done) == 185
+    assert worker.new_session().remaining() is None
+
+
+def test_kodi_polling_stops_at_deadline():
+    """Test que le polling streamdetails ne lance pas de nouvel essai après l'échéance"""
+    import time
+    calls = []
+
+    def empty_streamdetails(command):
+        calls.append(command)
+        return json.dumps({"result": {"item": {"streamdetails": {"video": []}}}})
+    addon_module.xbmc.executeJSONRPC = empty_streamdetails
+    provider = KodiMetadataProvider()
+
+    assert provider.get_aspect_ratio(MockVideoInfoTag(), deadline=time.monotonic() + 0.5) is None
+    assert 1 <= len(calls) < 8
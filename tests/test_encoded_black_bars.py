@@ -123,7 +123,7 @@ def test_detect_encoded_black_bars():
     service.cache.get = lambda *args, **kwargs: None
     
     # Mocker IMDb
-    service.imdb.get_aspect_ratio = lambda title, imdb_number=None: 235
+    service.imdb.get_aspect_ratio = lambda title, imdb_number=None, **kwargs: 235
     
     # Mocker isPlayingVideo
     service.isPlayingVideo = lambda: True
@@ -143,6 +143,28 @@ def test_detect_encoded_black_bars():
     assert len(log_messages) > 0, "Should log file ratio difference or encoded bars detection"
 
 
+
+def test_search_hints_passed_to_imdb():
+    """Test que l'année, le type et le titre original de la vidéo sont transmis à la recherche IMDb"""
+    mock_executeJSONRPC(file_ratio=178)
+
+    service = Service()
+    video_tag = MockVideoInfoTag(title="Atlantide, l'empire perdu", original_title="Atlantis: The Lost Empire", year=2001)
+    service.cache.get = lambda *args, **kwargs: None
+    calls = []
+
+    def imdb_lookup(title, imdb_number=None, **kwargs):
+        calls.append((title, kwargs))
+        return 239
+    service.imdb.get_aspect_ratio = imdb_lookup
+    service.isPlayingVideo = lambda: True
+    service.getVideoInfoTag = lambda: video_tag
+
+    assert service._detect_aspect_ratio()[0] == 239
+    assert calls == [("Atlantide, l'empire perdu",
+                      {"year": 2001, "media_type": "movie", "original_title": "Atlantis: The Lost Empire",
+                       "deadline": None})]
+
 def test_no_encoded_black_bars_similar_ratios():
     """Test pas de barres encodées : ratios similaires (IMDb 235, fichier 237)
     - Différence: 2 < threshold (11) MAIS ni file ni content proches de 16:9
@@ -156,7 +178,7 @@ def test_no_encoded_black_bars_similar_ratios():
     
     service.cache._cache = {}
     service.cache.get = lambda *args, **kwargs: None
-    service.imdb.get_aspect_ratio = lambda title, imdb_number=None: 235
+    service.imdb.get_aspect_ratio = lambda title, imdb_number=None, **kwargs: 235
     service.isPlayingVideo = lambda: True
     service.getVideoInfoTag = lambda: video_tag
     
@@ -181,7 +203,7 @@ def test_no_encoded_black_bars_identical_ratios():
     service.cache._cache = {}
     service.cache.get = lambda *args, **kwargs: None
     # Mocker service.imdb directement
-    service.imdb.get_aspect_ratio = lambda title, imdb_number=None: 235
+    service.imdb.get_aspect_ratio = lambda title, imdb_number=None, **kwargs: 235
     service.isPlayingVideo = lambda: True
     service.getVideoInfoTag = lambda: video_tag
     
@@ -211,7 +233,7 @@ def test_fallback_to_file_ratio_when_no_imdb():
     service.getVideoInfoTag = lambda: video_tag
     
     # Mocker IMDbProvider pour retourner None
-    service.imdb.get_aspect_ratio = lambda title, imdb_number=None: None
+    service.imdb.get_aspect_ratio = lambda title, imdb_number=None, **kwargs: None
     
     # Désactiver IMDb pour forcer le fallback
     mock_addon = mock_kodi.MockAddon(settings={
@@ -254,7 +276,7 @@ def test_vertical_encoded_bars_narrower_file():
     service.cache.get = lambda *args, **kwargs: None
     
     # Mocker IMDb
-    service.imdb.get_aspect_ratio = lambda title, imdb_number=None: 185
+    service.imdb.get_aspect_ratio = lambda title, imdb_number=None, **kwargs: 185
     
     # Mocker isPlayingVideo
     service.isPlayingVideo = lambda: True
@@ -303,7 +325,7 @@ def test_no_encoded_bars_if_file_not_16_9():
     service.cache.get = lambda *args, **kwargs: None
     
     # Mocker IMDb
-    service.imdb.get_aspect_ratio = lambda title, imdb_number=None: 185
+    service.imdb.get_aspect_ratio = lambda title, imdb_number=None, **kwargs: 185
     
     # Mocker isPlayingVideo
     service.isPlayingVideo = lambda: True
@@ -326,3 +348,114 @@ def test_no_encoded_bars_if_file_not_16_9():
     # file_ratio (166) < 177: direct_zoom = 177 / 166 = 1.066
     expected = 177.0 / 166
     assert abs(zoom_value - expected) < 0.01, f"Zoom should be {expected:.3f}, got {zoom_value:.3f}"
+
+
+def test_imdb_and_streamdetails_run_concurrently():
+    """Test que la recherche IMDb et le polling streamdetails tournent en parallèle
+    - Le mock IMDb attend que le polling streamdetails ait démarré
+    - En séquentiel (IMDb puis streamdetails), l'attente expirerait et IMDb renverrait None
+    """
+    import threading
+    streamdetails_polled = threading.Event()
+    mock_executeJSONRPC(imdb_number="tt1234567", file_ratio=178)
+    jsonrpc = addon_module.xbmc.executeJSONRPC
+    
+    def tracking_executeJSONRPC(command):
+        if "streamdetails" in command:
+            streamdetails_polled.set()
+        return jsonrpc(command)
+    addon_module.xbmc.executeJSONRPC = tracking_executeJSONRPC
+    
+    service = Service()
+    video_tag = MockVideoInfoTag(title="Test Movie", year=2020)
+    service.cache.get = lambda *args, **kwargs: None
+    service.imdb.get_aspect_ratio = lambda title, imdb_number=None, **kwargs: 235 if streamdetails_polled.wait(2) else None
+    service.isPlayingVideo = lambda: True
+    service.getVideoInfoTag = lambda: video_tag
+    
+    result = service._detect_aspect_ratio()
+    
+    assert result is not None
+    detected_ratio, file_ratio, title_display = result
+    assert detected_ratio == 235, "IMDb lookup should not wait for streamdetails polling to finish"
+    assert file_ratio == 178
+
+
+def test_fallback_reuses_concurrent_file_ratio():
+    """Test que le fallback Kodi réutilise le file_ratio déjà obtenu en parallèle (pas de second polling)"""
+    mock_executeJSONRPC(imdb_number="tt1234567", file_ratio=240)
+    jsonrpc = addon_module.xbmc.executeJSONRPC
+    calls = []
+    
+    def counting_executeJSONRPC(command):
+        if "streamdetails" in command:
+            calls.append(command)
+        return jsonrpc(command)
+    addon_module.xbmc.executeJSONRPC = counting_executeJSONRPC
+    
+    service = Service()
+    video_tag = MockVideoInfoTag(title="Test Movie", year=2020)
+    service.cache.get = lambda *args, **kwargs: None
+    service.imdb.get_aspect_ratio = lambda title, imdb_number=None, **kwargs: None
+    service.isPlayingVideo = lambda: True
+    service.getVideoInfoTag = lambda: video_tag
+    
+    result = service._detect_aspect_ratio()
+    
+    assert result is not None
+    detected_ratio, file_ratio, title_display = result
+    assert detected_ratio == 240
+    assert file_ratio == 240
+    assert len(calls) == 1, "streamdetails should be polled only once"
+
+
+def make_negative_cache_service(tmp_path, imdb_lookup):
+    """Helper : Service avec un vrai cache JSON dans tmp_path et un IMDb mocké"""
+    mock_executeJSONRPC(imdb_number="tt1234567", file_ratio=178)
+    service = Service()
+    service.cache = addon_module.JsonCacheProvider(enabled=False)
+    service.cache.enabled = True
+    service.cache.path = str(tmp_path / "cache.json")
+    video_tag = MockVideoInfoTag(title="Test Movie", year=2020)
+    service.imdb.get_aspect_ratio = imdb_lookup
+    service.isPlayingVideo = lambda: True
+    service.getVideoInfoTag = lambda: video_tag
+    return service
+
+
+def test_negative_cache_skips_imdb(tmp_path):
+    """Test qu'un échec IMDb récent évite la requête réseau au rejeu suivant"""
+    calls = []
+    
+    def imdb_lookup(title, imdb_number=None, **kwargs):
+        calls.append(title)
+        return None
+    service = make_negative_cache_service(tmp_path, imdb_lookup)
+    
+    for _ in range(2):
+        result = service._detect_aspect_ratio()
+        assert result is not None
+        detected_ratio, file_ratio, title_display = result
+        assert detected_ratio == 178  # Kodi metadata fallback
+    
+    assert len(calls) == 1, "Second play should skip IMDb thanks to the negative entry"
+
+
+def test_unavailable_imdb_not_negative_cached(tmp_path):
+    """Test qu'une panne réseau IMDb n'est pas mémorisée comme un échec"""
+    from imdb import IMDbUnavailableError
+    calls = []
+    
+    def failing_getOriginalAspectRatio(title, imdb_number=None, **kwargs):
+        calls.append(title)
+        raise IMDbUnavailableError("offline")
+    service = make_negative_cache_service(tmp_path, None)
+    service.imdb = addon_module.IMDbProvider()
+    service.imdb.breaker.close()  # Pas de sonde IMDb réelle en arrière-plan si le circuit s'ouvre
+    addon_module.getOriginalAspectRatio = failing_getOriginalAspectRatio
+    
+    service._detect_aspect_ratio()
+    service._detect_aspect_ratio()
+    
+    assert len(calls) == 2
+    assert not service.cache.has_fresh_miss("Test Movie", 2020, imdb_id="tt1234567")
@@ -0,0 +1,699 @@
+"""
+Tests pour le module imdb (session HTTP, récupération des pages).
+Les requêtes vont vers un serveur HTTP local, jamais vers IMDb.
+"""
+import sys
+import os
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+
+# Ajouter le répertoire parent au path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Mocker les modules Kodi
+import tests.mock_kodi as mock_kodi
+mock_xbmc = mock_kodi.MockXbmc()
+sys.modules['xbmc'] = mock_xbmc
+sys.modules['xbmcaddon'] = type(sys)('xbmcaddon')
+sys.modules['xbmcaddon'].Addon = lambda: mock_kodi.MockAddon()
+sys.modules['xbmcgui'] = mock_kodi.MockXbmcgui()
+
+import imdb
+
+
+class PageHandler(BaseHTTPRequestHandler):
+    """Sert des pages fixes en HTTP/1.1 keep-alive"""
+    protocol_version = "HTTP/1.1"
+    pages = {}
+    seen_headers = []
+
+    def do_GET(self):
+        PageHandler.seen_headers.append(dict(self.headers))
+        body = PageHandler.pages.get(self.path)
+        if body is None:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(autouse=True)
+def strategy_stats():
+    """Fixture : statistiques de stratégies neuves, en mémoire, pour chaque test"""
+    imdb.configure_page_store(None)
+    yield imdb.load_strategy_stats(None)
+    imdb.load_strategy_stats(None)
+    imdb.configure_page_store(None)
+
+
+@pytest.fixture
+def server():
+    """Fixture : serveur HTTP local et session IMDb neuve"""
+    PageHandler.pages = {}
+    PageHandler.seen_headers = []
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), PageHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    imdb.close_session()
+    yield "http://127.0.0.1:{}".format(httpd.server_address[1])
+    imdb.close_session()
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_session_reused_across_fetches(server):
+    """Test que plusieurs pages passent par une seule connexion keep-alive"""
+    PageHandler.pages = {"/title/tt1/": b"<html>title</html>", "/title/tt1/technical/": b"<html>tech</html>"}
+    session = imdb.get_session()
+
+    first, error = imdb._fetch_with_retry(server + "/title/tt1/", {})
+    assert error is None and first.text == "<html>title</html>"
+    second, error = imdb._fetch_with_retry(server + "/title/tt1/technical/", {})
+    assert error is None and second.text == "<html>tech</html>"
+
+    assert imdb.get_session() is session
+    assert imdb._connection_count(session, server + "/") == 1
+
+
+def test_accept_encoding_sent(server):
+    """Test que la compression est demandée au serveur"""
+    PageHandler.pages = {"/": b"ok"}
+    imdb._fetch_with_retry(server + "/", {"User-Agent": "test"})
+    assert "gzip" in PageHandler.seen_headers[0]["Accept-Encoding"]
+    assert PageHandler.seen_headers[0]["User-Agent"] == "test"
+
+
+def test_close_session(server):
+    """Test que close_session ferme la session et qu'une nouvelle est créée ensuite"""
+    session = imdb.get_session()
+    imdb.close_session()
+    assert imdb.get_session() is not session
+
+
+def test_http_error_returned(server):
+    """Test qu'une 404 est renvoyée comme erreur (titre inexistant, pas une panne)"""
+    response, error = imdb._fetch_with_retry(server + "/missing", {}, max_retries=0)
+    assert response is None
+    assert not imdb._is_unavailable_error(error)
+
+
+TITLE_PAGE = (b"<html><body>" + b"<p>intro</p>" * 100 +
+              b'<li data-testid="title-techspec_aspectratio"><div><ul class="ipc-inline-list">'
+              b'<li><span class="ipc-metadata-list-item__list-content-item">2.39 : 1</span></li></ul></div></li>' +
+              b"<script>" + b"x" * 200000 + b"</script></body></html>")
+
+
+def test_stream_stops_after_aspect_ratio(server, monkeypatch):
+    """Test que la lecture s'arrête dès que le bloc aspect ratio a été reçu"""
+    monkeypatch.setattr(imdb, "STREAM_CHUNK_BYTES", 7)  # Marqueur coupé entre deux chunks
+    PageHandler.pages = {"/title/tt1/": TITLE_PAGE}
+
+    page, error = imdb._fetch_with_retry(server + "/title/tt1/", {}, stop_markers=imdb.TITLE_PAGE_STOP_MARKERS)
+
+    assert error is None
+    assert page.stopped == "marker"
+    assert page.text.endswith("2.39 : 1</span></li></ul>")
+    assert len(page.content) < 2000
+
+
+def test_stream_reads_whole_page_without_marker(server):
+    """Test qu'une page sans marqueur est lue entièrement"""
+    PageHandler.pages = {"/title/tt1/": b"<html>" + b"y" * 50000 + b"</html>"}
+    page, error = imdb._fetch_with_retry(server + "/title/tt1/", {}, stop_markers=imdb.TITLE_PAGE_STOP_MARKERS)
+    assert error is None
+    assert page.stopped is None
+    assert len(page.content) == 50013
+
+
+def test_stream_byte_cap(server):
+    """Test que la taille lue est bornée"""
+    PageHandler.pages = {"/title/tt1/": TITLE_PAGE}
+    page, error = imdb._fetch_with_retry(server + "/title/tt1/", {}, max_bytes=1000)
+    assert error is None
+    assert page.stopped == "cap"
+    assert len(page.content) == 1000
+
+
+SEARCH_PAGE = '''<html><body><nav><a href="/title/tt0000001/">Nav</a></nav>
+<ul class="ipc-metadata-list">
+<li class="ipc-metadata-list-summary-item find-result-item"><div><div>
+<a class="ipc-metadata-list-summary-item__t" href="/fr/title/tt9737326/?ref_=fn_t_1">Foundation</a>
+<ul><li><span>2021</span></li></ul></div></div>
+<a class="ipc-title-link-wrapper" href="/title/tt9737326/?ref_=fn_t_1"><img src="poster.jpg"></a>
+</li>
+<li class="ipc-metadata-list-summary-item"><a class="ipc-title-link-wrapper" href="/title/tt0000002/">Other</a></li>
+</ul></body></html>'''
+
+TECHNICAL_PAGE = '''<html><body><ul><li id="aspectratio" class="ipc-metadata-list__item"><span>Aspect Ratio</span><div><ul>
+<li><span class="ipc-metadata-list-item__list-content-item">1.78 : 1</span><span class="ipc-metadata-list-item__list-content-item--subText">(Blu-ray)</span></li>
+<li><span class="ipc-metadata-list-item__list-content-item">2.39 : 1</span><span class="ipc-metadata-list-item__list-content-item--subText">(theatrical ratio)</span></li>
+</ul></div></li><li id="camera"><ul><li>Panavision</li></ul></li></ul></body></html>'''
+
+
+def test_search_results_title_link():
+    """Test stratégie 1 : lien ipc-title-link-wrapper du premier résultat"""
+    results = imdb._run_parser(imdb.SearchResultsParser(), SEARCH_PAGE)
+    assert results.title_url == "/title/tt9737326/?ref_=fn_t_1"
+
+
+def test_search_results_fallback_to_result_container():
+    """Test stratégie 2 : premier lien /title/ dans un conteneur de résultat, pas dans la navigation"""
+    html = '''<a href="/title/tt0000003/">top</a>
+<div class="find-result"><span><b><a href="/title/tt0230011/">Atlantide</a></b></span></div>'''
+    results = imdb._run_parser(imdb.SearchResultsParser(), html)
+    assert results.strategy_1_url is None
+    assert results.title_url == "/title/tt0230011/"
+
+
+def test_search_results_no_link():
+    """Test page de recherche sans résultat"""
+    assert imdb._run_parser(imdb.SearchResultsParser(), "<html><p>No results</p></html>").title_url is None
+
+
+def test_title_techspec():
+    """Test lecture du bloc title-techspec_aspectratio, y compris sur une page tronquée"""
+    parser = imdb._run_parser(imdb.TitleTechSpecParser(), TITLE_PAGE[:TITLE_PAGE.index(b"</ul>") + 5].decode())
+    assert parser.found
+    assert parser.aspect_ratio_text == "2.39 : 1"
+    parser = imdb._run_parser(imdb.TitleTechSpecParser(), "<html><p>no specs</p></html>")
+    assert not parser.found
+
+
+def test_technical_aspect_ratios():
+    """Test lecture des entrées de #aspectratio avec leur sous-texte"""
+    parser = imdb._run_parser(imdb.TechnicalAspectRatiosParser(), TECHNICAL_PAGE)
+    assert parser.found
+    assert parser.entries == [("1.78 : 1", "(Blu-ray)"), ("2.39 : 1", "(theatrical ratio)")]
+
+
+@pytest.fixture
+def pages(monkeypatch):
+    """Fixture : pages IMDb servies par un _fetch_with_retry mocké, indexées par chemin"""
+    served = {}
+    fetched = []
+
+    def fake_fetch(url, headers, max_retries=2, timeout=10, stop_markers=(), max_bytes=imdb.MAX_PAGE_BYTES, cancel=None,
+                   deadline=None):
+        path = url.replace("https://www.imdb.com", "")
+        fetched.append(path)
+        content = served.get(path)
+        if content is None:
+            return None, Exception("404")
+        return imdb.FetchedPage(url, content.encode() if isinstance(content, str) else content, "utf-8"), None
+    monkeypatch.setattr(imdb, "_fetch_with_retry", fake_fetch)
+    monkeypatch.setattr(imdb, "_raise_if_unavailable", lambda error, what: None)
+    served["fetched"] = fetched
+    return served
+
+
+def test_get_original_aspect_ratio_from_title_page(pages):
+    """Test ratio lu sur la page titre via l'identifiant IMDb"""
+    pages["/title/tt0230011/"] = TITLE_PAGE
+    assert imdb.getOriginalAspectRatio("Atlantide", imdb_number="tt0230011") == "239"
+
+
+def test_get_original_aspect_ratio_search_then_technical(pages):
+    """Test recherche par titre, puis page technique avec ratio théâtral"""
+    pages["/find/?q=Foundation"] = SEARCH_PAGE
+    pages["/title/tt9737326/"] = "<html><p>no specs</p></html>"
+    pages["/title/tt9737326/technical/"] = TECHNICAL_PAGE
+    assert imdb.getOriginalAspectRatio("Foundation") == "239"
+    assert pages["fetched"] == ["https://v3.sg.media-imdb.com/suggestion/f/foundation.json",
+                                "/find/?q=Foundation", "/title/tt9737326/", "/title/tt9737326/technical/"]
+
+
+def next_data_page(data, before="", after=""):
+    """Page HTML avec un bloc __NEXT_DATA__"""
+    return ('<html><body>' + before + '<script id="__NEXT_DATA__" type="application/json">' +
+            json.dumps(data) + '</script>' + after + '</body></html>')
+
+
+TECHNICAL_NEXT_DATA = {"props": {"pageProps": {"contentData": {"section": {"aspectRatios": {"items": [
+    {"aspectRatio": "1.78 : 1", "attributes": [{"text": "Blu-ray"}]},
+    {"aspectRatio": "2.39 : 1", "attributes": [{"text": "theatrical ratio"}]},
+]}}}}}}
+
+
+def test_next_data_aspect_ratios():
+    """Test lecture des ratios dans le JSON __NEXT_DATA__"""
+    html = next_data_page(TECHNICAL_NEXT_DATA)
+    assert imdb._next_data_aspect_ratios(html) == [("1.78 : 1", "(Blu-ray)"), ("2.39 : 1", "(theatrical ratio)")]
+    assert imdb._next_data_aspect_ratios(next_data_page({"props": {}})) is None
+    assert imdb._next_data_aspect_ratios('<script id="__NEXT_DATA__">{not json</script>') is None
+    assert imdb._next_data_aspect_ratios(TECHNICAL_PAGE) is None
+
+
+def test_get_original_aspect_ratio_from_next_data(pages):
+    """Test que le JSON est prioritaire sur le DOM de la page titre"""
+    title_data = {"props": {"pageProps": {"mainColumnData": {"technicalSpecifications": {"aspectRatios": {"items": [
+        {"aspectRatio": "1.85 : 1", "attributes": []}]}}}}}}
+    pages["/title/tt0067658/"] = next_data_page(title_data, before=TITLE_PAGE.decode())
+    assert imdb.getOriginalAspectRatio(None, imdb_number="tt0067658") == "185"
+
+
+def test_get_original_aspect_ratio_technical_next_data(pages):
+    """Test page technique lue depuis le JSON, ratio théâtral retenu"""
+    pages["/title/tt9737326/"] = next_data_page({"props": {}})
+    pages["/title/tt9737326/technical/"] = next_data_page(TECHNICAL_NEXT_DATA)
+    assert imdb.getOriginalAspectRatio(None, imdb_number="tt9737326") == "239"
+
+
+def test_get_original_aspect_ratio_dom_fallback(pages):
+    """Test repli sur le DOM quand le JSON ne contient pas de ratios"""
+    pages["/title/tt9737326/"] = next_data_page({"props": {}})
+    pages["/title/tt9737326/technical/"] = next_data_page({"props": {}}, after=TECHNICAL_PAGE)
+    assert imdb.getOriginalAspectRatio(None, imdb_number="tt9737326") == "239"
+
+
+def test_stream_stops_after_next_data(server):
+    """Test que la lecture s'arrête après un bloc __NEXT_DATA__ contenant les ratios, pas après un bloc sans ratios"""
+    padding = "<p>" + "z" * 100000 + "</p>"
+    PageHandler.pages = {
+        "/with/": next_data_page(TECHNICAL_NEXT_DATA, after=padding).encode(),
+        "/without/": next_data_page({"props": {}}, after=padding).encode(),
+    }
+    page, _ = imdb._fetch_with_retry(server + "/with/", {}, stop_markers=imdb.TECHNICAL_PAGE_STOP_MARKERS)
+    assert page.stopped == "marker"
+    assert page.text.endswith("</script>")
+    page, _ = imdb._fetch_with_retry(server + "/without/", {}, stop_markers=imdb.TECHNICAL_PAGE_STOP_MARKERS)
+    assert page.stopped is None
+
+
+SUGGESTIONS = {"d": [
+    {"id": "nm0000001", "l": "Atlantide Person"},
+    {"id": "tt0012345", "l": "L'Atlantide", "y": 1921, "qid": "movie"},
+    {"id": "tt9999999", "l": "Atlantide, l'empire perdu", "y": 2001, "qid": "videoGame"},
+    {"id": "tt0230011", "l": "Atlantide, l'empire perdu", "y": 2001, "qid": "movie"},
+], "q": "atlantide"}
+
+
+def test_best_candidate_by_title_year_type():
+    """Test choix du meilleur résultat de suggestion selon titre, année et type"""
+    best = imdb._best_candidate(SUGGESTIONS["d"], "Atlantide, l’empire perdu", 2001, "movie")
+    assert best["id"] == "tt0230011"
+    series = [{"id": "tt1", "l": "Foundation", "y": 2021, "qid": "tvSeries"},
+              {"id": "tt2", "l": "Foundation", "y": 2021, "qid": "short"}]
+    assert imdb._best_candidate(series, "Foundation", None, "episode")["id"] == "tt1"
+    assert imdb._best_candidate([{"id": "nm1", "l": "Foundation"}], "Foundation") is None
+
+
+def test_get_original_aspect_ratio_via_suggestions(pages):
+    """Test recherche par titre via l'endpoint JSON de suggestion, sans la page /find/"""
+    url = "https://v3.sg.media-imdb.com/suggestion/a/atlantide%2C%20l%27empire%20perdu.json"
+    pages[url] = json.dumps(SUGGESTIONS)
+    pages["/title/tt0230011/"] = TITLE_PAGE
+    assert imdb.getOriginalAspectRatio("Atlantide, l'empire perdu", year=2001, media_type="movie") == "239"
+    assert pages["fetched"][0] != "/title/tt0230011/" and url in pages["fetched"]
+    assert pages["fetched"][-1] == "/title/tt0230011/"
+    assert not any(path.startswith("/find/") for path in pages["fetched"])
+
+
+def test_search_queries():
+    """Test requêtes lancées : titre, titre original, titre + année, sans doublon"""
+    assert imdb._search_queries("Atlantide", 2001, "Atlantis: The Lost Empire") == \
+        ["Atlantide", "Atlantis: The Lost Empire", "Atlantide 2001"]
+    assert imdb._search_queries("Alien", None, "alien") == ["Alien"]
+    assert imdb._search_queries(None, 2001) == []
+
+
+def test_resolve_title_by_original_title(pages):
+    """Test titre localisé introuvable : le titre original, cherché en parallèle, donne l'identifiant"""
+    pages["https://v3.sg.media-imdb.com/suggestion/a/atlantide.json"] = json.dumps({"d": [
+        {"id": "tt0012345", "l": "L'Atlantide", "y": 1921, "qid": "movie"}]})
+    pages["https://v3.sg.media-imdb.com/suggestion/a/atlantis%3A%20the%20lost%20empire.json"] = json.dumps({"d": [
+        {"id": "tt0230011", "l": "Atlantis: The Lost Empire", "y": 2001, "qid": "movie"}]})
+    assert imdb._resolve_title("Atlantide", {}, year=2001, media_type="movie",
+                               original_title="Atlantis: The Lost Empire") == "tt0230011"
+    assert len(pages["fetched"]) == 3
+
+
+def test_resolve_title_exact_match_skips_slower_queries(monkeypatch):
+    """Test qu'une correspondance exacte est retenue sans attendre les requêtes plus lentes"""
+    release = threading.Event()
+
+    def fake_candidates(query, headers, deadline=None):
+        if query == "Foundation":
+            return [{"id": "tt0804484", "l": "Foundation", "y": 2021, "qid": "tvSeries"}], None
+        release.wait(5)
+        return [{"id": "tt1", "l": "Foundation", "y": 2021, "qid": "tvSeries"}], None
+    monkeypatch.setattr(imdb, "_suggestion_candidates", fake_candidates)
+    try:
+        assert imdb._resolve_title("Foundation", {}, year=2021, media_type="episode",
+                                   original_title="Fondation") == "tt0804484"
+        assert not release.is_set()
+    finally:
+        release.set()
+
+
+def test_resolve_title_all_queries_failed(pages):
+    """Test aucune suggestion : None, pour se replier sur la page /find/"""
+    assert imdb._resolve_title("Foundation", {}, year=2021, original_title="Fondation") is None
+    assert len(pages["fetched"]) == 3
+
+
+def test_resolve_title_punctuation_only(pages):
+    """Test titre sans lettre ni chiffre : aucune requête de suggestion, repli sur la page /find/"""
+    assert imdb._search_queries("?!", None) == []
+    assert imdb._resolve_title("?!", {}) is None
+    assert pages["fetched"] == []
+    assert imdb._search_title("https://www.imdb.com", "?!", {}) == (None, None)
+    assert [path for path in pages["fetched"] if path.startswith("/find/")]
+
+
+def test_speculative_fetches_both_pages(pages):
+    """Test mode spéculatif : page titre et page technique demandées ensemble, ratio théâtral retenu"""
+    pages["/title/tt9737326/"] = next_data_page({"props": {}})
+    pages["/title/tt9737326/technical/"] = next_data_page(TECHNICAL_NEXT_DATA)
+    assert imdb.getOriginalAspectRatio(None, imdb_number="tt9737326", speculative=True) == "239"
+    assert sorted(pages["fetched"]) == ["/title/tt9737326/", "/title/tt9737326/technical/"]
+
+
+def test_speculative_same_result_as_sequential(pages):
+    """Test mode spéculatif sans ratio théâtral : même résultat que la recherche séquentielle"""
+    pages["/title/tt0230011/"] = TITLE_PAGE
+    pages["/title/tt0230011/technical/"] = next_data_page({"props": {}})
+    assert imdb.getOriginalAspectRatio(None, imdb_number="tt0230011", speculative=True) == "239"
+    pages["/title/tt1/"] = next_data_page({"props": {}})
+    pages["/title/tt1/technical/"] = next_data_page({"props": {"aspectRatios": {"items": [
+        {"aspectRatio": "1.85 : 1", "attributes": [{"text": "Blu-ray"}]},
+        {"aspectRatio": "2.39 : 1", "attributes": []}]}}})
+    assert imdb.getOriginalAspectRatio(None, imdb_number="tt1", speculative=True) == ["185", "239"]
+
+
+def test_speculative_title_page_precedence(monkeypatch):
+    """Test mode spéculatif : quand les deux pages donnent un ratio, la page titre l'emporte quel que soit l'ordre d'arrivée"""
+    for title_delay, technical_delay in ((0.2, 0), (0, 0.2)):
+        def title_page(url, headers, cancel=None, deadline=None, delay=title_delay):
+            cancel.wait(delay)
+            return "185", None
+
+        def technical_page(url, headers, cancel=None, deadline=None, delay=technical_delay):
+            cancel.wait(delay)
+            return "239", None
+        monkeypatch.setattr(imdb, "_lookup_title_page", title_page)
+        monkeypatch.setattr(imdb, "_lookup_technical_page", technical_page)
+        assert imdb._speculative_lookup("https://www.imdb.com/title/tt1/",
+                                        "https://www.imdb.com/title/tt1/technical/", {}) == "185"
+
+
+def test_speculative_technical_page_when_title_has_none(monkeypatch):
+    """Test mode spéculatif : ratio de la page technique quand la page titre n'en a pas"""
+    def title_page(url, headers, cancel=None, deadline=None):
+        cancel.wait(0.1)
+        return None, None
+    monkeypatch.setattr(imdb, "_lookup_title_page", title_page)
+    monkeypatch.setattr(imdb, "_lookup_technical_page", lambda url, headers, cancel=None, deadline=None: ("239", None))
+    assert imdb._speculative_lookup("https://www.imdb.com/title/tt1/",
+                                    "https://www.imdb.com/title/tt1/technical/", {}) == "239"
+
+
+def test_speculative_cancels_slower_page(pages, monkeypatch):
+    """Test que la page la plus lente est annulée dès que l'autre donne un ratio"""
+    pages["/title/tt0230011/"] = TITLE_PAGE
+    cancelled = []
+
+    def slow_technical(url, headers, cancel=None, deadline=None):
+        cancelled.append(cancel.wait(5))
+        return None, None
+    monkeypatch.setattr(imdb, "_lookup_technical_page", slow_technical)
+    assert imdb._speculative_lookup("https://www.imdb.com/title/tt0230011/",
+                                    "https://www.imdb.com/title/tt0230011/technical/", {}) == "239"
+    for _ in range(50):
+        if cancelled:
+            break
+        threading.Event().wait(0.05)
+    assert cancelled == [True]
+
+
+def test_read_body_cancelled():
+    """Test arrêt de la lecture en streaming quand la requête est annulée"""
+    cancel = threading.Event()
+
+    class Response:
+        def iter_content(self, chunk_size):
+            yield b"a" * 10
+            cancel.set()
+            yield b"b" * 10
+            yield b"c" * 10
+
+    assert imdb._read_body(Response(), cancel=cancel) == (b"a" * 10, "cancelled")
+
+
+def test_fetch_cancelled_before_request(server):
+    """Test qu'une requête annulée avant l'envoi n'est pas faite"""
+    PageHandler.pages = {"/page/": b"<html></html>"}
+    cancel = threading.Event()
+    cancel.set()
+    assert imdb._fetch_with_retry(server + "/page/", {}, cancel=cancel) == (None, None)
+    assert PageHandler.seen_headers == []
+
+
+def test_strategy_order_adapts_to_failures():
+    """Test qu'une stratégie qui échoue passe après une stratégie fiable, et que le changement est journalisé"""
+    stats = imdb.StrategyStats()
+    assert stats.order("search") == ["suggestion", "find"]
+    for _ in range(imdb.STRATEGY_MIN_SAMPLES):
+        stats.record("search", "suggestion", False, 0.1)
+        stats.record("search", "find", True, 0.5)
+    imdb.xbmc.logs.clear()
+    assert stats.order("search") == ["find", "suggestion"]
+    assert any("search strategy order changed: suggestion > find -> find > suggestion" in msg for msg, _ in imdb.xbmc.logs)
+    imdb.xbmc.logs.clear()
+    assert stats.order("search") == ["find", "suggestion"]
+    assert not any("order changed" in msg for msg, _ in imdb.xbmc.logs)
+
+
+def test_strategy_order_prefers_cheaper_reliable():
+    """Test que la stratégie fiable la moins coûteuse est essayée en premier"""
+    stats = imdb.StrategyStats()
+    for _ in range(imdb.STRATEGY_MIN_SAMPLES):
+        stats.record("ratio", "title", True, 0.8)
+        stats.record("ratio", "technical", True, 0.2)
+    assert stats.order("ratio") == ["technical", "title"]
+
+
+def test_strategy_order_default_probe():
+    """Test que l'ordre par défaut est rejoué périodiquement, pour qu'une stratégie rétrogradée puisse revenir"""
+    stats = imdb.StrategyStats()
+    for _ in range(imdb.STRATEGY_MIN_SAMPLES):
+        stats.record("search", "suggestion", False, 0.1)
+        stats.record("search", "find", True, 0.5)
+    orders = [stats.order("search") for _ in range(imdb.STRATEGY_PROBE_INTERVAL)]
+    assert orders.count(["suggestion", "find"]) == 1
+    assert orders[-1] == ["suggestion", "find"]
+
+
+def test_strategy_stats_persisted(tmp_path):
+    """Test persistance des statistiques dans le profil, sans nouveau journal au rechargement"""
+    path = str(tmp_path / "strategy_stats.json")
+    stats = imdb.StrategyStats(path)
+    for _ in range(imdb.STRATEGY_MIN_SAMPLES):
+        stats.record("ratio", "title", False, 0.5)
+        stats.record("ratio", "technical", True, 0.5)
+    stats.save()
+    assert os.path.exists(path)
+    imdb.xbmc.logs.clear()
+    reloaded = imdb.StrategyStats(path)
+    assert reloaded.order("ratio") == ["technical", "title"]
+    assert not any("order changed" in msg for msg, _ in imdb.xbmc.logs)
+    with open(path, "w") as f:
+        f.write("{not json")
+    assert imdb.StrategyStats(path).order("ratio") == ["title", "technical"]
+
+
+def test_search_uses_learned_order(pages, strategy_stats):
+    """Test que la recherche commence par la page /find/ quand l'endpoint de suggestion échoue toujours"""
+    for _ in range(imdb.STRATEGY_MIN_SAMPLES):
+        strategy_stats.record("search", "suggestion", False, 0.1)
+        strategy_stats.record("search", "find", True, 0.5)
+    pages["/find/?q=Foundation"] = SEARCH_PAGE
+    pages["/title/tt9737326/"] = TITLE_PAGE
+    assert imdb.getOriginalAspectRatio("Foundation") == "239"
+    assert pages["fetched"] == ["/find/?q=Foundation", "/title/tt9737326/"]
+
+
+def test_sequential_lookup_records_strategies(pages, strategy_stats):
+    """Test enregistrement des succès et échecs des pages titre et technique"""
+    pages["/title/tt9737326/"] = next_data_page({"props": {}})
+    pages["/title/tt9737326/technical/"] = next_data_page(TECHNICAL_NEXT_DATA)
+    assert imdb.getOriginalAspectRatio(None, imdb_number="tt9737326") == "239"
+    assert strategy_stats._stats[("ratio", "title")]["success_rate"] == 0.0
+    assert strategy_stats._stats[("ratio", "technical")]["success_rate"] == 1.0
+
+
+def test_unreachable_strategy_not_recorded(monkeypatch, strategy_stats):
+    """Test qu'une stratégie qui n'a pas pu joindre IMDb n'est pas comptée comme un échec"""
+    monkeypatch.setattr(imdb, "_fetch_with_retry", lambda url, headers, **kwargs: (None, imdb.requests.ConnectionError("offline")))
+    with pytest.raises(imdb.IMDbUnavailableError):
+        imdb.getOriginalAspectRatio("Foundation")
+    assert strategy_stats._stats == {}
+
+
+def test_probe_imdb(server):
+    """Test sonde de disponibilité : toute réponse sauf 5xx/408/429 ou erreur réseau indique IMDb joignable"""
+    PageHandler.pages = {"/ok/": b"{}"}
+    assert imdb.probe_imdb(server + "/ok/")
+    assert imdb.probe_imdb(server + "/missing/")
+    assert not imdb.probe_imdb("http://127.0.0.1:1/", timeout=1)
+
+
+def test_fetch_deadline(server):
+    """Test échéance : pas de requête une fois l'échéance passée, erreur IMDbDeadlineError"""
+    import time
+    PageHandler.pages = {"/page/": b"<html></html>"}
+    page, error = imdb._fetch_with_retry(server + "/page/", {}, deadline=time.monotonic() - 1)
+    assert page is None and isinstance(error, imdb.DeadlineExceeded)
+    assert PageHandler.seen_headers == []
+    with pytest.raises(imdb.IMDbDeadlineError):
+        imdb._raise_if_unavailable(error, "title page")
+    page, error = imdb._fetch_with_retry(server + "/page/", {}, deadline=time.monotonic() + 5)
+    assert error is None and page.text == "<html></html>"
+
+
+def test_page_store_put_get(tmp_path):
+    """Test stockage compressé d'une page, relue à l'identique"""
+    store = imdb.PageStore(str(tmp_path))
+    store.put(imdb.FetchedPage("https://www.imdb.com/title/tt0230011/", b"<html>x</html>", "utf-8", "marker"))
+    page = store.get("https://www.imdb.com/title/tt0230011/")
+    assert page.content == b"<html>x</html>" and page.stopped == "marker"
+    assert store.get("https://www.imdb.com/title/tt0000001/") is None
+    assert all(name.endswith(".html.gz") for name in os.listdir(str(tmp_path)))
+
+
+def test_page_store_ttl(tmp_path):
+    """Test qu'une page plus ancienne que le TTL est ignorée et supprimée"""
+    store = imdb.PageStore(str(tmp_path), ttl_s=60)
+    store.put(imdb.FetchedPage("https://www.imdb.com/title/tt0230011/", b"old", "utf-8"))
+    path = store._path("https://www.imdb.com/title/tt0230011/")
+    os.utime(path, (0, 0))
+    assert store.get("https://www.imdb.com/title/tt0230011/") is None
+    assert not os.path.exists(path)
+
+
+def test_page_store_ttl_updates_size(tmp_path):
+    """Test que la suppression d'une page expirée est déduite de la taille du stockage"""
+    store = imdb.PageStore(str(tmp_path), max_bytes=2500, ttl_s=60)
+    old_url = "https://www.imdb.com/title/tt0000000/"
+    store.put(imdb.FetchedPage(old_url, os.urandom(1000), "latin-1"))
+    os.utime(store._path(old_url), (0, 0))
+    assert store.get(old_url) is None
+    assert store._size == 0
+    for number in (1, 2):
+        store.put(imdb.FetchedPage("https://www.imdb.com/title/tt%07d/" % number, os.urandom(1000), "latin-1"))
+    assert store.get("https://www.imdb.com/title/tt0000001/") is not None
+    assert store._size == sum(size for _, size, _ in store._files())
+
+
+def test_page_store_size_cap(tmp_path):
+    """Test plafond de taille : les pages les plus anciennes sont supprimées en premier"""
+    import time
+    store = imdb.PageStore(str(tmp_path), max_bytes=2500)
+    for number in range(4):
+        url = "https://www.imdb.com/title/tt%07d/" % number
+        store.put(imdb.FetchedPage(url, os.urandom(1000), "latin-1"))
+        os.utime(store._path(url), (time.time() - 100 + number, time.time() - 100 + number))
+    assert store.get("https://www.imdb.com/title/tt0000000/") is None
+    assert store.get("https://www.imdb.com/title/tt0000003/") is not None
+    assert sum(size for _, size, _ in store._files()) <= 2500
+
+
+def test_lookup_reads_page_store(pages, tmp_path):
+    """Test qu'une page déjà stockée est relue sans requête"""
+    imdb.configure_page_store(str(tmp_path))
+    pages["/title/tt0230011/"] = TITLE_PAGE
+    assert imdb.getOriginalAspectRatio("Atlantide", imdb_number="tt0230011") == "239"
+    del pages["/title/tt0230011/"]
+    pages["fetched"].clear()
+    assert imdb.getOriginalAspectRatio("Atlantide", imdb_number="tt0230011") == "239"
+    assert "/title/tt0230011/" not in pages["fetched"]
+
+
+def test_reparse_page_store(tmp_path):
+    """Test nouvelle analyse des pages stockées : ratio de la page titre, sinon de la page technique"""
+    store = imdb.configure_page_store(str(tmp_path))
+    store.put(imdb.FetchedPage("https://www.imdb.com/title/tt0230011/", TITLE_PAGE, "utf-8"))
+    store.put(imdb.FetchedPage("https://www.imdb.com/title/tt9737326/", b"<html><p>no specs</p></html>", "utf-8"))
+    store.put(imdb.FetchedPage("https://www.imdb.com/title/tt9737326/technical/", TECHNICAL_PAGE.encode(), "utf-8"))
+    store.put(imdb.FetchedPage("https://www.imdb.com/find/?q=Foundation", SEARCH_PAGE.encode(), "utf-8"))
+    assert imdb.reparse_page_store() == {"tt0230011": "239", "tt9737326": "239"}
+
+
+def test_resolve_stored_title(tmp_path):
+    """Test identifiant retrouvé depuis les pages de suggestion stockées, sans requête"""
+    store = imdb.PageStore(str(tmp_path))
+    store.put(imdb.FetchedPage(imdb._suggestion_url("atlantide"), json.dumps({"d": [
+        {"id": "tt0012345", "l": "L'Atlantide", "y": 1921, "qid": "movie"}]}).encode(), "utf-8"))
+    store.put(imdb.FetchedPage(imdb._suggestion_url("atlantide 2001"), json.dumps({"d": [
+        {"id": "tt0230011", "l": "Atlantide", "y": 2001, "qid": "movie"}]}).encode(), "utf-8"))
+    assert imdb.resolve_stored_title("atlantide", 2001, store) == "tt0230011"
+    assert imdb.resolve_stored_title("atlantide", None, store) == "tt0012345"
+    assert imdb.resolve_stored_title("foundation", 2021, store) is None
+
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "imdb")
+
+# Résultats des anciens extracteurs BeautifulSoup (select_one / find_all) sur les pages du
+# répertoire fixtures/imdb : mise en page DOM seule, et DOM accompagné de __NEXT_DATA__
+FIXTURE_RESULTS = {
+    "title_tt0230011.html": "239",
+    "title_tt9737326.html": "200",
+    "title_tt0120338.html": "239",
+    "title_tt0000417.html": None,
+    "technical_tt0230011.html": None,
+    "technical_tt0120338.html": "239",
+    "technical_tt9737326.html": "200",
+    "technical_tt0110912.html": ["239", "178"],
+    "technical_tt0468569.html": ["239", "178", "144"],
+}
+
+
+def _fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name), encoding="utf-8") as f:
+        return f.read()
+
+
+def _parse_fixture(name, html):
+    return imdb._parse_title_page(html) if name.startswith("title_") else imdb._parse_technical_page(html)
+
+
+@pytest.mark.parametrize("name", sorted(FIXTURE_RESULTS))
+def test_fixture_pages_same_ratio_as_beautifulsoup(name):
+    """Test pages enregistrées : mêmes ratios que les anciens extracteurs BeautifulSoup"""
+    assert _parse_fixture(name, _fixture(name)) == FIXTURE_RESULTS[name]
+
+
+@pytest.mark.parametrize("name", sorted(FIXTURE_RESULTS))
+def test_fixture_pages_dom_layout(name):
+    """Test pages enregistrées sans __NEXT_DATA__ : l'extraction DOM donne les mêmes ratios"""
+    html = _fixture(name)
+    start = html.find('<script id="__NEXT_DATA__"')
+    if start >= 0:
+        html = html[:start] + html[html.find("</script>", start) + len("</script>"):]
+    assert imdb._extract_next_data(html) is None
+    assert _parse_fixture(name, html) == FIXTURE_RESULTS[name]
+
+
+@pytest.mark.parametrize("name", sorted(FIXTURE_RESULTS))
+def test_fixture_pages_streamed(server, name):
+    """Test pages enregistrées lues en flux, coupées aux marqueurs d'arrêt : mêmes ratios"""
+    PageHandler.pages = {"/page/": _fixture(name).encode("utf-8")}
+    markers = imdb.TITLE_PAGE_STOP_MARKERS if name.startswith("title_") else imdb.TECHNICAL_PAGE_STOP_MARKERS
+    page, error = imdb._fetch_with_retry(server + "/page/", {}, stop_markers=markers)
+    assert error is None
+    assert _parse_fixture(name, page.text) == FIXTURE_RESULTS[name]
+
+
+def test_fixture_search_page_same_link_as_beautifulsoup():
+    """Test page de recherche enregistrée : même lien que l'ancien extracteur BeautifulSoup"""
+    results = imdb._run_parser(imdb.SearchResultsParser(), _fixture("find_foundation.html"))
+    assert results.title_url == "/fr/title/tt9737326/?ref_=fn_al_tt_1"
@@ -18,11 +18,11 @@ sys.modules['xbmcaddon'] = type(sys)('xbmcaddon')
 sys.modules['xbmcaddon'].Addon = lambda: mock_kodi.MockAddon()
 sys.modules['xbmcgui'] = mock_kodi.MockXbmcgui()
 
-from addon import IMDbProvider
+from addon import IMDbProvider, CircuitBreaker
 import addon as addon_module
 
 # Mocker imdb.getOriginalAspectRatio après import
-def mock_get_original_aspect_ratio(title, imdb_number=None):
+def mock_get_original_aspect_ratio(title, imdb_number=None, **kwargs):
     """Mock pour getOriginalAspectRatio"""
     # Simuler différents cas
     if imdb_number and str(imdb_number) == "tt1234567":
@@ -38,8 +38,10 @@ def mock_get_original_aspect_ratio(title, imdb_number=None):
 
 @pytest.fixture
 def provider():
-    """Fixture pour créer un provider"""
-    return IMDbProvider()
+    """Fixture pour créer un provider (circuit fermé à la fin : pas de sonde IMDb réelle après le test)"""
+    provider = IMDbProvider()
+    yield provider
+    provider.breaker.close()
 
 
 def test_get_aspect_ratio_with_imdb_number(provider):
@@ -98,7 +100,7 @@ def test_get_aspect_ratio_empty_title(provider):
 
 def test_error_handling(provider):
     """Test gestion d'erreur (si getOriginalAspectRatio lève une exception)"""
-    def failing_mock(title, imdb_number=None):
+    def failing_mock(title, imdb_number=None, **kwargs):
         raise Exception("Network error")
     
     # Patcher getOriginalAspectRatio dans le module addon
@@ -109,3 +111,167 @@ def test_error_handling(provider):
         assert ratio is None
     finally:
         addon_module.getOriginalAspectRatio = original_func
+
+
+def test_unavailable_flag(provider):
+    """Test que was_unavailable() distingue IMDb injoignable d'un titre sans ratio"""
+    from imdb import IMDbUnavailableError
+    
+    def unavailable_mock(title, imdb_number=None, **kwargs):
+        raise IMDbUnavailableError("connection refused")
+    
+    original_func = addon_module.getOriginalAspectRatio
+    addon_module.getOriginalAspectRatio = unavailable_mock
+    try:
+        assert provider.get_aspect_ratio("Test Movie") is None
+        assert provider.was_unavailable()
+        addon_module.getOriginalAspectRatio = mock_get_original_aspect_ratio
+        assert provider.get_aspect_ratio("Error Movie") is None
+        assert not provider.was_unavailable()
+    finally:
+        addon_module.getOriginalAspectRatio = original_func
+
+
+def test_search_hints_forwarded(provider):
+    """Test que l'année, le type et le titre original sont transmis à la recherche IMDb"""
+    calls = []
+
+    def recording_mock(title, imdb_number=None, **kwargs):
+        calls.append(kwargs)
+        return "239"
+
+    original_func = addon_module.getOriginalAspectRatio
+    addon_module.getOriginalAspectRatio = recording_mock
+    try:
+        assert provider.get_aspect_ratio("Atlantide", year=2001, media_type="movie",
+                                         original_title="Atlantis: The Lost Empire") == 239
+        assert calls == [{"year": 2001, "media_type": "movie", "original_title": "Atlantis: The Lost Empire",
+                          "speculative": True, "deadline": None}]
+    finally:
+        addon_module.getOriginalAspectRatio = original_func
+
+
+def test_circuit_opens_after_consecutive_failures(provider):
+    """Test que le circuit s'ouvre après des échecs consécutifs et qu'IMDb n'est alors plus interrogé"""
+    from imdb import IMDbUnavailableError
+    calls = []
+
+    def unavailable_mock(title, imdb_number=None, **kwargs):
+        calls.append(title)
+        raise IMDbUnavailableError("timeout")
+
+    provider.breaker.close()  # Pas de sonde en arrière-plan pendant le test
+    original_func = addon_module.getOriginalAspectRatio
+    addon_module.getOriginalAspectRatio = unavailable_mock
+    try:
+        for _ in range(addon_module.CIRCUIT_FAILURE_THRESHOLD):
+            assert provider.get_aspect_ratio("Test Movie") is None
+        assert provider.breaker.state == CircuitBreaker.OPEN
+        assert provider.get_aspect_ratio("Test Movie") is None
+        assert provider.was_unavailable()
+        assert len(calls) == addon_module.CIRCUIT_FAILURE_THRESHOLD
+    finally:
+        addon_module.getOriginalAspectRatio = original_func
+
+
+def test_circuit_success_resets_failures(provider):
+    """Test qu'une réponse d'IMDb (même sans ratio) remet le compteur d'échecs à zéro"""
+    provider.breaker.record_failure()
+    provider.breaker.record_success()
+    provider.breaker.record_failure()
+    assert provider.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_circuit_half_open_probe():
+    """Test sonde half-open : échec -> rouvert pour deux fois plus longtemps, succès -> fermé"""
+    probes = []
+    breaker = CircuitBreaker(lambda: probes.append(1) or len(probes) > 1, failure_threshold=1,
+                             open_seconds=3600, max_open_seconds=5000)
+    try:
+        breaker.record_failure()
+        assert breaker.state == CircuitBreaker.OPEN
+        assert not breaker.allow()
+        breaker._probe()
+        assert breaker.state == CircuitBreaker.OPEN
+        assert breaker._current_open_seconds == 5000
+        breaker._probe()
+        assert breaker.state == CircuitBreaker.CLOSED
+        assert breaker.allow()
+        assert breaker._current_open_seconds == 3600
+    finally:
+        breaker.close()
+
+
+def test_circuit_probe_runs_in_background():
+    """Test que la sonde est lancée par un timer, sans appel de lookup"""
+    import threading
+    probed = threading.Event()
+    breaker = CircuitBreaker(lambda: probed.set() or True, failure_threshold=1, open_seconds=0.01)
+    breaker.record_failure()
+    assert probed.wait(2)
+    for _ in range(50):
+        if breaker.allow():
+            break
+        probed.wait(0.02)
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.close()
+
+
+def test_deadline_not_counted_by_circuit(provider):
+    """Test qu'un budget de temps épuisé n'est ni un échec du circuit ni un titre sans ratio"""
+    from imdb import IMDbDeadlineError
+
+    def deadline_mock(title, imdb_number=None, **kwargs):
+        raise IMDbDeadlineError("deadline reached")
+
+    original_func = addon_module.getOriginalAspectRatio
+    addon_module.getOriginalAspectRatio = deadline_mock
+    try:
+        for _ in range(addon_module.CIRCUIT_FAILURE_THRESHOLD + 1):
+            assert provider.get_aspect_ratio("Test Movie") is None
+            assert provider.was_unavailable()
+        assert provider.breaker.state == CircuitBreaker.CLOSED
+    finally:
+        addon_module.getOriginalAspectRatio = original_func
+
+
+class BlackholeSession:
+    """Session de test : IMDb ne répond pas, chaque connexion expire après son timeout de connexion"""
+
+    def __init__(self):
+        self.timeouts = []
+
+    def get(self, url, headers=None, timeout=None, stream=False):
+        import time
+        import requests
+        self.timeouts.append(timeout)
+        time.sleep(timeout[0])
+        raise requests.ConnectTimeout(f"connect timeout for {url}")
+
+
+def test_connect_timeouts_open_circuit_with_budget(provider, monkeypatch):
+    """Test IMDb injoignable avec un budget de détection : les timeouts de connexion ouvrent le circuit"""
+    import time
+    import imdb
+    session = BlackholeSession()
+    monkeypatch.setattr(imdb, "_session", session)
+    monkeypatch.setattr(imdb, "_page_store", None)
+    monkeypatch.setattr(imdb, "CONNECT_TIMEOUT", 0.01)
+    provider.breaker.close()  # Pas de sonde en arrière-plan pendant le test
+    for _ in range(addon_module.CIRCUIT_FAILURE_THRESHOLD):
+        assert provider.get_aspect_ratio("Test Movie", imdb_number="tt1234567", deadline=time.monotonic() + 10) is None
+    assert provider.breaker.state == CircuitBreaker.OPEN
+    assert all(connect == 0.01 for connect, read in session.timeouts)
+
+
+def test_timeout_at_deadline_not_counted(provider, monkeypatch):
+    """Test timeout qui atteint l'échéance : budget épuisé, pas un échec du circuit"""
+    import time
+    import imdb
+    monkeypatch.setattr(imdb, "_session", BlackholeSession())
+    monkeypatch.setattr(imdb, "_page_store", None)
+    page, error = imdb._fetch_with_retry("https://www.imdb.com/title/tt1234567/", {}, deadline=time.monotonic() + 0.05)
+    assert page is None and isinstance(error, imdb.DeadlineExceeded)
+    assert provider.get_aspect_ratio("Test Movie", imdb_number="tt1234567", deadline=time.monotonic() + 0.05) is None
+    assert provider.was_unavailable()
+    assert provider.breaker.state == CircuitBreaker.CLOSED
@@ -0,0 +1,402 @@
+"""
+Tests pour media_probe (lecture de la géométrie vidéo dans l'en-tête des fichiers).
+Les fichiers sont construits en mémoire : seuls les en-têtes utiles sont écrits.
+"""
+import sys
+import os
+import json
+import struct
+import pytest
+
+# Ajouter le répertoire parent au path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Mocker les modules Kodi avant d'importer addon
+import tests.mock_kodi as mock_kodi
+mock_xbmc = mock_kodi.MockXbmc()
+sys.modules['xbmc'] = mock_xbmc
+sys.modules['xbmcaddon'] = type(sys)('xbmcaddon')
+sys.modules['xbmcaddon'].Addon = lambda: mock_kodi.MockAddon()
+sys.modules['xbmcgui'] = mock_kodi.MockXbmcgui()
+
+import media_probe
+from media_probe import MediaProbeError, probe_file
+
+
+def ebml_id(element_id):
+    return element_id.to_bytes((element_id.bit_length() + 7) // 8, "big")
+
+
+def ebml_size(size):
+    # Taille sur 8 octets : marqueur 0x01 puis 7 octets
+    return bytes([0x01]) + size.to_bytes(7, "big")
+
+
+def element(element_id, *children):
+    body = b"".join(children)
+    return ebml_id(element_id) + ebml_size(len(body)) + body
+
+
+def uint(element_id, value):
+    return element(element_id, value.to_bytes(max(1, (value.bit_length() + 7) // 8), "big"))
+
+
+def mkv(width, height, crop=None, display=None, tracks_after_cluster=False, codec_private=None):
+    """Fichier Matroska minimal avec une piste vidéo"""
+    video = [uint(media_probe.PIXEL_WIDTH, width), uint(media_probe.PIXEL_HEIGHT, height)]
+    for element_id, value in (crop or {}).items():
+        video.append(uint(element_id, value))
+    if display:
+        video += [uint(media_probe.DISPLAY_WIDTH, display[0]), uint(media_probe.DISPLAY_HEIGHT, display[1])]
+    tracks = element(media_probe.TRACKS,
+                     element(media_probe.TRACK_ENTRY, uint(media_probe.TRACK_TYPE, 2), element(media_probe.CODEC_ID, b"A_AAC")),
+                     element(media_probe.TRACK_ENTRY, uint(media_probe.TRACK_TYPE, 1), element(media_probe.CODEC_ID, b"V_MPEG4/ISO/AVC"),
+                             element(media_probe.CODEC_PRIVATE, codec_private or b""), element(media_probe.VIDEO, *video)))
+    cluster = element(media_probe.CLUSTER, b"\0" * 4096)
+    if tracks_after_cluster:
+        def seek_head(position):
+            return element(media_probe.SEEK_HEAD, element(media_probe.SEEK, uint(media_probe.SEEK_ID, media_probe.TRACKS),
+                                                          element(media_probe.SEEK_POSITION, position.to_bytes(4, "big"))))
+        segment = seek_head(len(seek_head(0)) + len(cluster)) + cluster + tracks
+    else:
+        segment = tracks + cluster
+    header = element(media_probe.EBML_HEADER, element(media_probe.EBML_DOCTYPE, b"matroska"))
+    return header + element(media_probe.SEGMENT, segment)
+
+
+def box(box_type, *children):
+    body = b"".join(children)
+    return struct.pack(">I4s", 8 + len(body), box_type) + body
+
+
+def mp4_trak(handler, width, height, presentation=None, pasp=None, clap=None, codec_private=b"\x01\x64"):
+    """Piste ISO-BMFF : tkhd (taille de présentation), hdlr, stsd avec une entrée avc1"""
+    presentation = presentation or (width, height)
+    tkhd = bytes(4) + bytes(72) + struct.pack(">II", presentation[0] << 16, presentation[1] << 16)
+    hdlr = bytes(8) + handler + bytes(12)
+    entry_children = b""
+    if pasp:
+        entry_children += box(b"pasp", struct.pack(">II", *pasp))
+    if clap:
+        entry_children += box(b"clap", struct.pack(">IIIIiIiI", *clap))
+    entry = box(b"avc1", bytes(24) + struct.pack(">HH", width, height) + bytes(50), box(b"avcC", codec_private), entry_children)
+    stsd = box(b"stsd", struct.pack(">II", 0, 1), entry)
+    return box(b"trak", box(b"tkhd", tkhd),
+               box(b"mdia", box(b"hdlr", hdlr), box(b"minf", box(b"stbl", stsd))))
+
+
+def mp4(video_trak, moov_at_end=True):
+    """Fichier MP4 minimal : piste audio puis piste vidéo, mdat avant ou après moov"""
+    moov = box(b"moov", box(b"mvhd", bytes(100)), mp4_trak(b"soun", 0, 0), video_trak)
+    mdat = box(b"mdat", b"\0" * 65536)
+    ftyp = box(b"ftyp", b"isom", bytes(4), b"isomavc1")
+    return ftyp + (mdat + moov if moov_at_end else moov + mdat)
+
+
+@pytest.fixture
+def write_file(tmp_path):
+    """Fixture : écrit un fichier vidéo dans un dossier temporaire et retourne son chemin"""
+    def write(name, data):
+        path = tmp_path / name
+        path.write_bytes(data)
+        return str(path)
+    return write
+
+
+def test_mkv_coded_size(write_file):
+    """Test taille codée sans crop ni taille d'affichage : ratio du cadre"""
+    geometry = probe_file(write_file("movie.mkv", mkv(1920, 1080)))
+    assert (geometry.width, geometry.height) == (1920, 1080)
+    assert geometry.codec == "V_MPEG4/ISO/AVC"
+    assert geometry.frame_ratio() == 177
+    assert geometry.cropped_ratio() is None
+
+
+def test_mkv_pixel_crop(write_file):
+    """Test PixelCrop : barres encodées en haut et en bas, ratio de l'image recadrée"""
+    crop = {media_probe.PIXEL_CROP_TOP: 140, media_probe.PIXEL_CROP_BOTTOM: 140}
+    geometry = probe_file(write_file("movie.mkv", mkv(1920, 1080, crop=crop)))
+    assert (geometry.cropped_width, geometry.cropped_height) == (1920, 800)
+    assert geometry.frame_ratio() == 177
+    assert geometry.cropped_ratio() == 240
+
+
+def test_mkv_anamorphic_display_size(write_file):
+    """Test DisplayWidth/DisplayHeight : pixels non carrés (DVD PAL 16:9)"""
+    geometry = probe_file(write_file("movie.mkv", mkv(720, 576, display=(1024, 576))))
+    assert geometry.frame_ratio() == 177
+
+
+def test_mkv_display_size_after_crop(write_file):
+    """Test taille d'affichage rapportée à l'image recadrée, comme le prévoit Matroska"""
+    crop = {media_probe.PIXEL_CROP_TOP: 72, media_probe.PIXEL_CROP_BOTTOM: 72}
+    geometry = probe_file(write_file("movie.mkv", mkv(720, 576, crop=crop, display=(1024, 432))))
+    assert geometry.cropped_ratio() == 237
+    assert geometry.frame_ratio() == 177
+
+
+def test_mkv_tracks_found_through_seek_head(write_file):
+    """Test Tracks après les données : retrouvé par le SeekHead"""
+    geometry = probe_file(write_file("movie.mkv", mkv(3840, 1600, tracks_after_cluster=True)))
+    assert geometry.frame_ratio() == 240
+
+
+def test_mp4_moov_after_mdat(write_file):
+    """Test moov à la fin : mdat sauté, taille codée et entrée avc1"""
+    geometry = probe_file(write_file("movie.mp4", mp4(mp4_trak(b"vide", 1920, 800))))
+    assert (geometry.width, geometry.height) == (1920, 800)
+    assert geometry.codec == "avc1"
+    assert geometry.codec_private == b"\x01\x64"
+    assert geometry.frame_ratio() == 240
+
+
+def test_mp4_pasp(write_file):
+    """Test pasp : pixels non carrés (DVD NTSC 16:9)"""
+    geometry = probe_file(write_file("movie.m4v", mp4(mp4_trak(b"vide", 720, 480, pasp=(32, 27)), moov_at_end=False)))
+    assert geometry.frame_ratio() == 177
+
+
+def test_mp4_tkhd_presentation_size(write_file):
+    """Test sans pasp : le rapport d'aspect des pixels vient de la taille de présentation du tkhd"""
+    geometry = probe_file(write_file("movie.mov", mp4(mp4_trak(b"vide", 1440, 1080, presentation=(1920, 1080)))))
+    assert geometry.frame_ratio() == 177
+
+
+def test_mp4_clap(write_file):
+    """Test clap : ouverture propre centrée, barres encodées recadrées"""
+    clap = (1920, 1, 800, 1, 0, 1, 0, 1)
+    geometry = probe_file(write_file("movie.mp4", mp4(mp4_trak(b"vide", 1920, 1080, clap=clap))))
+    assert (geometry.crop_top, geometry.crop_bottom) == (140, 140)
+    assert geometry.frame_ratio() == 177
+    assert geometry.cropped_ratio() == 240
+
+
+def test_mp4_without_video_track(write_file):
+    """Test MP4 sans piste vidéo : MediaProbeError"""
+    with pytest.raises(MediaProbeError):
+        probe_file(write_file("audio.mp4", mp4(mp4_trak(b"soun", 0, 0))))
+
+
+class BitWriter:
+    """Écrit des bits et des codes Exp-Golomb, pour construire des SPS de test"""
+
+    def __init__(self):
+        self.bits = []
+
+    def u(self, bits, value):
+        self.bits += [(value >> (bits - 1 - i)) & 1 for i in range(bits)]
+        return self
+
+    def ue(self, value):
+        code = value + 1
+        length = code.bit_length()
+        return self.u(length - 1, 0).u(length, code)
+
+    def se(self, value):
+        return self.ue(2 * value - 1 if value > 0 else -2 * value)
+
+    def nal(self, header):
+        bits = self.bits + [1] + [0] * ((8 - (len(self.bits) + 1) % 8) % 8)
+        payload = bytes(int("".join(map(str, bits[i:i + 8])), 2) for i in range(0, len(bits), 8))
+        escaped = bytearray()
+        for byte in payload:
+            if len(escaped) >= 2 and escaped[-1] == 0 and escaped[-2] == 0 and byte <= 3:
+                escaped.append(3)
+            escaped.append(byte)
+        return header + bytes(escaped)
+
+
+def avc_sps(width_mbs, height_mbs, crop_bottom=0, sar_idc=None, sar=None):
+    """SPS H.264 High (4:2:0, progressif)"""
+    w = BitWriter().u(8, 100).u(16, 0x0028).ue(0)
+    w.ue(1).ue(0).ue(0).u(1, 0).u(1, 0)  # chroma 4:2:0, 8 bits, pas de matrice
+    w.ue(0).ue(0).ue(2).ue(4).u(1, 0)  # frame_num, POC type 0, références
+    w.ue(width_mbs - 1).ue(height_mbs - 1).u(1, 1).u(1, 1)
+    if crop_bottom:
+        w.u(1, 1).ue(0).ue(0).ue(0).ue(crop_bottom // 2)
+    else:
+        w.u(1, 0)
+    if sar_idc is None:
+        w.u(1, 0)
+    else:
+        w.u(1, 1).u(1, 1).u(8, sar_idc)
+        if sar:
+            w.u(16, sar[0]).u(16, sar[1])
+    return w.nal(b"\x67")
+
+
+def avcc(sps):
+    return bytes([1, 100, 0, 40, 0xFF, 0xE1]) + struct.pack(">H", len(sps)) + sps + b"\x01\x00\x04\x68\xeb\xe3\xcb"
+
+
+def hevc_sps(width, height, crop_bottom=0, sar=None):
+    """SPS HEVC Main 4:2:0, avec deux ensembles d'images de référence (dont un prédit)"""
+    w = BitWriter().u(4, 0).u(3, 0).u(1, 1).u(96, 0).ue(0).ue(1).ue(width).ue(height)
+    if crop_bottom:
+        w.u(1, 1).ue(0).ue(0).ue(0).ue(crop_bottom // 2)
+    else:
+        w.u(1, 0)
+    w.ue(0).ue(0).ue(4).u(1, 1).ue(4).ue(2).ue(0)
+    for value in (0, 3, 0, 3, 1, 1):
+        w.ue(value)
+    w.u(1, 0).u(1, 0).u(1, 1).u(1, 0)  # scaling list, AMP, SAO, PCM
+    w.ue(2)
+    w.ue(1).ue(0).ue(0).u(1, 1)  # ensemble 0 : une image passée
+    w.u(1, 1).u(1, 0).ue(0).u(1, 1).u(1, 0).u(1, 1)  # ensemble 1 : prédit de l'ensemble 0
+    w.u(1, 0).u(1, 1).u(1, 1)  # pas de long terme, TMVP, lissage intra
+    if sar:
+        w.u(1, 1).u(1, 1).u(8, 255).u(16, sar[0]).u(16, sar[1])
+    else:
+        w.u(1, 0)
+    return w.nal(b"\x42\x01")
+
+
+def hvcc(sps):
+    vps = b"\x40\x01\x0c\x01"
+    record = bytes([1]) + bytes(21) + bytes([2])
+    record += bytes([0x20]) + struct.pack(">HH", 1, len(vps)) + vps
+    record += bytes([0x21]) + struct.pack(">HH", 1, len(sps)) + sps
+    return record
+
+
+def test_avc_sps_conformance_crop():
+    """Test SPS H.264 : 1920x1088 codé, recadrage de conformité de 8 lignes, SAR 1:1"""
+    sps = media_probe.parse_codec_private("avc1", avcc(avc_sps(120, 68, crop_bottom=8, sar_idc=1)))
+    assert (sps.width, sps.height) == (1920, 1088)
+    assert (sps.output_width, sps.output_height) == (1920, 1080)
+    assert sps.sar == (1, 1)
+
+
+def test_avc_sps_extended_sar():
+    """Test SPS H.264 : SAR étendu (aspect_ratio_idc 255)"""
+    sps = media_probe.parse_codec_private("V_MPEG4/ISO/AVC", avcc(avc_sps(45, 36, sar_idc=255, sar=(64, 45))))
+    assert (sps.width, sps.height) == (720, 576)
+    assert sps.sar == (64, 45)
+
+
+def test_hevc_sps():
+    """Test SPS HEVC : fenêtre de conformité et SAR étendu, après les ensembles d'images de référence"""
+    sps = media_probe.parse_codec_private("hvc1", hvcc(hevc_sps(1920, 1088, crop_bottom=8, sar=(4, 3))))
+    assert (sps.output_width, sps.output_height) == (1920, 1080)
+    assert sps.sar == (4, 3)
+
+
+def test_anamorphic_mkv_uses_sps_sar(write_file):
+    """Test MKV anamorphique sans taille d'affichage : le SAR du SPS donne le vrai ratio"""
+    private = avcc(avc_sps(90, 68, crop_bottom=8, sar_idc=14))  # 1440x1080, SAR 4:3
+    geometry = probe_file(write_file("movie.mkv", mkv(1440, 1080, codec_private=private)))
+    assert (geometry.par_num, geometry.par_den) == (4, 3)
+    assert geometry.frame_ratio() == 177
+
+
+def test_mp4_coded_size_corrected_by_sps(write_file):
+    """Test taille codée 1088 dans le conteneur : corrigée par la fenêtre de conformité du SPS"""
+    trak = mp4_trak(b"vide", 1920, 1088, codec_private=avcc(avc_sps(120, 68, crop_bottom=8)))
+    geometry = probe_file(write_file("movie.mp4", mp4(trak)))
+    assert (geometry.width, geometry.height) == (1920, 1080)
+
+
+def test_invalid_sps_ignored(write_file):
+    """Test SPS illisible : la géométrie du conteneur est gardée"""
+    geometry = probe_file(write_file("movie.mkv", mkv(1920, 800, codec_private=avcc(b"\x67\x64"))))
+    assert geometry.frame_ratio() == 240 and geometry.sps is None
+
+
+def test_not_a_matroska_file(write_file):
+    """Test fichier non Matroska : MediaProbeError"""
+    with pytest.raises(MediaProbeError):
+        probe_file(write_file("movie.mkv", b"RIFF" + b"\0" * 64))
+    with pytest.raises(MediaProbeError):
+        probe_file(write_file("movie.avi", mkv(1920, 1080)))
+
+
+def test_probe_memoized_by_mtime(write_file):
+    """Test mémorisation par chemin, taille et mtime"""
+    path = write_file("movie.mkv", mkv(1920, 1080))
+    assert probe_file(path) is probe_file(path)
+    with open(path, "wb") as f:
+        f.write(mkv(1920, 800))
+    os.utime(path, ns=(0, 1_000_000_000))
+    assert probe_file(path).frame_ratio() == 240
+
+
+def test_is_supported():
+    """Test extensions et chemins pris en charge"""
+    assert media_probe.is_supported("/films/Dune.MKV")
+    assert not media_probe.is_supported("smb://nas/films/Dune.mkv")
+    assert media_probe.is_supported("/films/Dune.mp4")
+    assert not media_probe.is_supported("/films/Dune.avi")
+    assert not media_probe.is_supported(None)
+
+
+def test_detection_uses_file_header(write_file):
+    """Test détection : le ratio de l'en-tête remplace l'attente des streamdetails Kodi"""
+    import addon as addon_module
+    from addon import Service
+    from tests.mock_kodi import MockAddon, MockVideoInfoTag
+    path = write_file("movie.mkv", mkv(1920, 1080, crop={media_probe.PIXEL_CROP_TOP: 140, media_probe.PIXEL_CROP_BOTTOM: 140}))
+    addon_module.xbmcaddon.Addon = lambda: MockAddon(settings={"enable_imdb": "true", "enable_cache": "false"})
+    addon_module.xbmc.executeJSONRPC = lambda command: json.dumps({"result": {}})
+    service = Service()
+    service.cache.get = lambda *args, **kwargs: None
+    imdb_calls = []
+    kodi_calls = []
+    service.imdb.get_aspect_ratio = lambda *args, **kwargs: imdb_calls.append(args) or 185
+    service.kodi.get_aspect_ratio = lambda *args, **kwargs: kodi_calls.append(args) or 177
+    video_tag = MockVideoInfoTag(title="Movie", year=2020, filename=path)
+    service.isPlayingVideo = lambda: True
+    service.getVideoInfoTag = lambda: video_tag
+
+    detected_ratio, file_ratio, _ = service._detect_aspect_ratio()
+
+    assert detected_ratio == 240
+    assert file_ratio == 177
+    assert imdb_calls == [] and kodi_calls == []
+
+
+def test_probed_16_9_file_zooms_like_streamdetails(write_file, monkeypatch):
+    """Test cas Superman (IMDb 185, fichier 1920x1080) : l'en-tête donne 177 comme Kodi, zoom 1.07"""
+    import addon as addon_module
+    from addon import Service
+    from tests.mock_kodi import MockAddon, MockVideoInfoTag
+    path = write_file("superman.mkv", mkv(1920, 1080))
+    addon_module.xbmcaddon.Addon = lambda: MockAddon(settings={"enable_imdb": "true", "enable_cache": "false"})
+    monkeypatch.setattr(addon_module.xbmcgui, "getCurrentWindowId", lambda: 12005, raising=False)
+    service = Service()
+    service.cache.get = lambda *args, **kwargs: None
+    service.imdb.get_aspect_ratio = lambda *args, **kwargs: 185
+    service.kodi.get_aspect_ratio = lambda *args, **kwargs: None
+    video_tag = MockVideoInfoTag(title="Superman", year=2025, filename=path)
+    service.isPlayingVideo = lambda: True
+    service.isPlaying = lambda: True
+    service.getVideoInfoTag = lambda: video_tag
+    zooms = []
+    service._set_zoom = lambda zoom_amount: zooms.append(zoom_amount) or True
+
+    service.on_av_started()
+
+    assert zooms == [1.07]
+
+
+def test_overscan_crop_is_not_content_ratio(write_file):
+    """Test crop de quelques pixels (overscan) : pas de ratio de contenu, IMDb reste interrogé"""
+    import addon as addon_module
+    from addon import Service
+    from tests.mock_kodi import MockAddon, MockVideoInfoTag
+    path = write_file("movie.mkv", mkv(1920, 1080, crop={media_probe.PIXEL_CROP_TOP: 8, media_probe.PIXEL_CROP_BOTTOM: 8}))
+    assert probe_file(path).cropped_ratio() == 180
+    addon_module.xbmcaddon.Addon = lambda: MockAddon(settings={"enable_imdb": "true", "enable_cache": "false"})
+    service = Service()
+    service.cache.get = lambda *args, **kwargs: None
+    imdb_calls = []
+    service.imdb.get_aspect_ratio = lambda *args, **kwargs: imdb_calls.append(args) or 239
+    service.kodi.get_aspect_ratio = lambda *args, **kwargs: None
+    video_tag = MockVideoInfoTag(title="Movie", year=2020, filename=path)
+    service.isPlayingVideo = lambda: True
+    service.getVideoInfoTag = lambda: video_tag
+
+    detected_ratio, file_ratio, _ = service._detect_aspect_ratio()
+
+    assert detected_ratio == 239
+    assert file_ratio == 177
+    assert len(imdb_calls) == 1
@@ -0,0 +1,163 @@
+"""
+Tests pour RatioResolver (registre des sources de ratio, course des sources coûteuses).
+"""
+import sys
+import os
+import threading
+import time
+import pytest
+
+# Ajouter le répertoire parent au path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Mocker les modules Kodi avant d'importer addon
+import tests.mock_kodi as mock_kodi
+mock_xbmc = mock_kodi.MockXbmc()
+sys.modules['xbmc'] = mock_xbmc
+sys.modules['xbmcaddon'] = type(sys)('xbmcaddon')
+sys.modules['xbmcaddon'].Addon = lambda: mock_kodi.MockAddon()
+sys.modules['xbmcgui'] = mock_kodi.MockXbmcgui()
+
+import addon as addon_module
+from addon import (RatioResolver, RatioSource, RatioQuery, DetectionWorker,
+                   COST_MEMORY, COST_LOCAL_DISK, COST_LOCAL_IPC, COST_NETWORK, CONFIDENCE_LOW, CONFIDENCE_HIGH)
+
+
+class FakeSource(RatioSource):
+    """Source de ratio de test : répond ratio après delay_s secondes"""
+
+    def __init__(self, name, cost, confidence, ratio, delay_s=0, release=None):
+        self.name = name
+        self.cost = cost
+        self.confidence = confidence
+        self.ratio = ratio
+        self.delay_s = delay_s
+        self.release = release
+        self.calls = []
+
+    def lookup(self, query, deadline=None):
+        self.calls.append(deadline)
+        if self.release is not None:
+            self.release.wait(5)
+        elif self.delay_s:
+            time.sleep(self.delay_s)
+        if isinstance(self.ratio, Exception):
+            raise self.ratio
+        return self.ratio
+
+
+def test_sources_sorted_by_cost():
+    """Test que les sources sont rangées par coût, ordre d'enregistrement conservé à coût égal"""
+    resolver = RatioResolver()
+    network = resolver.register(FakeSource("network", COST_NETWORK, CONFIDENCE_HIGH, None))
+    disk = resolver.register(FakeSource("disk", COST_LOCAL_DISK, CONFIDENCE_HIGH, None))
+    memory = resolver.register(FakeSource("memory", COST_MEMORY, CONFIDENCE_HIGH, None))
+    nfo = resolver.register(FakeSource("nfo", COST_LOCAL_DISK, CONFIDENCE_HIGH, None))
+    assert resolver.sources() == [memory, disk, nfo, network]
+
+
+def test_cheap_answer_skips_network():
+    """Test qu'une réponse de confiance haute d'une source peu coûteuse évite la requête réseau"""
+    resolver = RatioResolver()
+    cache = resolver.register(FakeSource("cache", COST_LOCAL_DISK, CONFIDENCE_HIGH, 239))
+    imdb = resolver.register(FakeSource("imdb", COST_NETWORK, CONFIDENCE_HIGH, 185))
+    kodi = resolver.register(FakeSource("kodi", COST_LOCAL_IPC, CONFIDENCE_LOW, 177))
+
+    answers = resolver.resolve(RatioQuery("Movie"), wait_for=("kodi",))
+
+    assert answers.winner() == (cache, 239)
+    assert answers.get("kodi") == 177
+    assert imdb.calls == [] and len(kodi.calls) == 1
+
+
+def test_first_high_confidence_racer_wins():
+    """Test course : la première réponse de confiance haute gagne, la source lente est abandonnée"""
+    release = threading.Event()
+    resolver = RatioResolver()
+    fast = resolver.register(FakeSource("fast", COST_NETWORK, CONFIDENCE_HIGH, 185, delay_s=0.05))
+    resolver.register(FakeSource("slow", COST_NETWORK, CONFIDENCE_HIGH, 239, release=release))
+    try:
+        start = time.monotonic()
+        answers = resolver.resolve(RatioQuery("Movie"))
+        assert time.monotonic() - start < 2
+    finally:
+        release.set()
+    assert answers.winner() == (fast, 185)
+
+
+def test_low_confidence_does_not_end_race():
+    """Test qu'une réponse de confiance basse n'arrête pas la course : elle reste en repli"""
+    resolver = RatioResolver()
+    kodi = resolver.register(FakeSource("kodi", COST_LOCAL_IPC, CONFIDENCE_LOW, 177))
+    imdb = resolver.register(FakeSource("imdb", COST_NETWORK, CONFIDENCE_HIGH, 239, delay_s=0.2))
+    answers = resolver.resolve(RatioQuery("Movie"))
+    assert answers.winner() == (imdb, 239)
+    assert answers.best() == (imdb, 239)
+
+    imdb.ratio = None
+    answers = resolver.resolve(RatioQuery("Movie"))
+    assert answers.winner() == (None, None)
+    assert answers.best() == (kodi, 177)
+
+
+def test_budget_keeps_answers_so_far():
+    """Test budget : à l'échéance, les réponses déjà reçues sont gardées"""
+    release = threading.Event()
+    resolver = RatioResolver()
+    resolver.register(FakeSource("kodi", COST_LOCAL_IPC, CONFIDENCE_LOW, 177))
+    imdb = resolver.register(FakeSource("imdb", COST_NETWORK, CONFIDENCE_HIGH, 239, release=release))
+    token = DetectionWorker().new_session(budget_s=0.3)
+    try:
+        answers = resolver.resolve(RatioQuery("Movie"), token, wait_for=("kodi",))
+        assert token.elapsed_ms() < 2000
+    finally:
+        release.set()
+    assert answers.winner() == (None, None)
+    assert answers.get("kodi") == 177
+    assert imdb.calls == [token.deadline]
+
+
+def test_cancelled_token_stops_resolution():
+    """Test qu'une session annulée interrompt l'attente des sources"""
+    release = threading.Event()
+    worker = DetectionWorker()
+    resolver = RatioResolver()
+    resolver.register(FakeSource("imdb", COST_NETWORK, CONFIDENCE_HIGH, 239, release=release))
+    token = worker.new_session()
+    threading.Timer(0.1, worker.cancel).start()
+    try:
+        with pytest.raises(addon_module.DetectionCancelled):
+            resolver.resolve(RatioQuery("Movie"), token)
+    finally:
+        release.set()
+
+
+def test_source_error_is_no_answer():
+    """Test qu'une source en erreur compte comme sans réponse"""
+    resolver = RatioResolver()
+    resolver.register(FakeSource("broken", COST_LOCAL_DISK, CONFIDENCE_HIGH, ValueError("bad file")))
+    kodi = resolver.register(FakeSource("kodi", COST_LOCAL_IPC, CONFIDENCE_LOW, 177))
+    answers = resolver.resolve(RatioQuery("Movie"))
+    assert answers.best() == (kodi, 177)
+
+
+def test_disabled_source_not_asked():
+    """Test qu'une source désactivée pour la requête n'est pas interrogée"""
+    resolver = RatioResolver()
+    imdb = resolver.register(FakeSource("imdb", COST_NETWORK, CONFIDENCE_HIGH, 239))
+    imdb.enabled = lambda query: query.imdb_enabled
+    answers = resolver.resolve(RatioQuery("Movie", imdb_enabled=False))
+    assert answers.winner() == (None, None) and imdb.calls == []
+
+
+def test_first_answer_by_name_order():
+    """Test first() : première source des noms demandés qui a répondu, avec la source"""
+    resolver = RatioResolver()
+    probe = resolver.register(FakeSource("probe", COST_LOCAL_DISK, CONFIDENCE_LOW, None))
+    nfo = resolver.register(FakeSource("nfo_aspect", COST_LOCAL_DISK, CONFIDENCE_LOW, 177))
+    answers = resolver.resolve(RatioQuery("Movie"), wait_for=("probe", "nfo_aspect"))
+    assert answers.first(("probe", "nfo_aspect")) == (nfo, 177)
+    assert answers.first(("cache",)) == (None, None)
+    probe.ratio = 240
+    answers = resolver.resolve(RatioQuery("Movie"), wait_for=("probe", "nfo_aspect"))
+    assert answers.first(("probe", "nfo_aspect")) == (probe, 240)
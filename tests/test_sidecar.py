@@ -0,0 +1,153 @@
+"""
+Tests pour SidecarReader (fichiers .nfo / JSON à côté de la vidéo) et sa source de ratio.
+"""
+import sys
+import os
+import json
+import pytest
+
+# Ajouter le répertoire parent au path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Mocker les modules Kodi avant d'importer addon
+import tests.mock_kodi as mock_kodi
+mock_xbmc = mock_kodi.MockXbmc()
+sys.modules['xbmc'] = mock_xbmc
+sys.modules['xbmcaddon'] = type(sys)('xbmcaddon')
+sys.modules['xbmcaddon'].Addon = lambda: mock_kodi.MockAddon()
+sys.modules['xbmcgui'] = mock_kodi.MockXbmcgui()
+
+import addon as addon_module
+from addon import SidecarReader, Service, parse_ratio_text
+from tests.mock_kodi import MockAddon, MockVideoInfoTag
+
+NFO = """<?xml version="1.0" encoding="UTF-8" standalone="yes" ?>
+<movie>
+    <title>Dune</title>
+    <originalaspectratio>2.39:1</originalaspectratio>
+    <fileinfo>
+        <streamdetails>
+            <video>
+                <codec>hevc</codec>
+                <aspect>1.777778</aspect>
+                <width>3840</width>
+                <height>2160</height>
+            </video>
+        </streamdetails>
+    </fileinfo>
+</movie>
+"""
+
+
+@pytest.fixture
+def video(tmp_path):
+    """Fixture : chemin d'une vidéo locale dans un dossier temporaire"""
+    path = tmp_path / "Dune (2021).mkv"
+    path.write_bytes(b"")
+    return str(path)
+
+
+def write(path, content):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(content)
+
+
+def test_parse_ratio_text():
+    """Test formats de ratio acceptés : W:H, décimal, entier x100"""
+    assert parse_ratio_text("2.39:1") == 239
+    assert parse_ratio_text("16:9", truncate=True) == 177
+    assert parse_ratio_text("2.400000") == 240
+    assert parse_ratio_text("185") == 185
+    assert parse_ratio_text("abc") is None
+    assert parse_ratio_text("9.5") is None
+
+
+def test_parse_ratio_text_truncate():
+    """Test ratio du fichier tronqué comme celui calculé par Kodi, ratio original arrondi"""
+    assert parse_ratio_text("1.777778", truncate=True) == 177
+    assert parse_ratio_text("2.01", truncate=True) == 201
+    assert parse_ratio_text("1.777778") == 178
+
+
+def test_nfo_original_and_aspect(video):
+    """Test lecture du ratio original et de l'aspect streamdetails d'un .nfo"""
+    write(os.path.splitext(video)[0] + ".nfo", NFO)
+    assert SidecarReader().read(video) == {"original": 239, "aspect": 177}
+
+
+def test_nfo_with_trailing_url(video):
+    """Test .nfo suivi d'une URL de scraper : le XML lu avant reste valable"""
+    write(os.path.splitext(video)[0] + ".nfo",
+          "<movie><fileinfo><streamdetails><video><aspect>2.40</aspect></video></streamdetails></fileinfo></movie>\n"
+          "https://www.imdb.com/title/tt1160419/\n")
+    assert SidecarReader().read(video) == {"original": None, "aspect": 240}
+
+
+def test_movie_nfo_and_json_sidecar(video):
+    """Test movie.nfo du dossier, puis JSON d'un autre outil pour le champ manquant"""
+    write(os.path.join(os.path.dirname(video), "movie.nfo"),
+          "<movie><fileinfo><streamdetails><video><aspect>1.78</aspect></video></streamdetails></fileinfo></movie>")
+    write(os.path.splitext(video)[0] + ".json", json.dumps({"original_aspect_ratio": "2.39"}))
+    assert SidecarReader().read(video) == {"original": 239, "aspect": 178}
+
+
+def test_memoized_by_mtime(video, monkeypatch):
+    """Test mémorisation par chemin et mtime : relu seulement si le fichier change"""
+    nfo_path = os.path.splitext(video)[0] + ".nfo"
+    write(nfo_path, NFO)
+    reader = SidecarReader()
+    parsed = []
+    original_parse = SidecarReader._parse_nfo
+    monkeypatch.setattr(SidecarReader, "_parse_nfo", staticmethod(lambda path: parsed.append(path) or original_parse(path)))
+
+    assert reader.read(video)["original"] == 239
+    assert reader.read(video)["original"] == 239
+    assert parsed == [nfo_path]
+
+    write(nfo_path, NFO.replace("2.39:1", "1.85:1"))
+    os.utime(nfo_path, ns=(0, 1_000_000_000))
+    assert reader.read(video)["original"] == 185
+    assert parsed == [nfo_path, nfo_path]
+
+
+def test_remote_path_not_read():
+    """Test qu'un chemin réseau (smb://) n'est pas lu"""
+    assert SidecarReader().read("smb://nas/films/Dune.mkv") == {"original": None, "aspect": None}
+
+
+def test_detection_uses_nfo_before_imdb(video):
+    """Test détection : le ratio original du .nfo évite la requête IMDb"""
+    write(os.path.splitext(video)[0] + ".nfo", NFO)
+    addon_module.xbmcaddon.Addon = lambda: MockAddon(settings={"enable_imdb": "true", "enable_cache": "false"})
+    addon_module.xbmc.executeJSONRPC = lambda command: json.dumps({"result": {"item": {"streamdetails": {"video": []}}}})
+    service = Service()
+    service.cache.get = lambda *args, **kwargs: None
+    imdb_calls = []
+    service.imdb.get_aspect_ratio = lambda *args, **kwargs: imdb_calls.append(args) or 185
+    service.kodi.get_aspect_ratio = lambda *args, **kwargs: None
+    video_tag = MockVideoInfoTag(title="Dune", year=2021, filename=video)
+    service.isPlayingVideo = lambda: True
+    service.getVideoInfoTag = lambda: video_tag
+
+    detected_ratio, file_ratio, _ = service._detect_aspect_ratio()
+
+    assert detected_ratio == 239
+    assert file_ratio == 177
+    assert imdb_calls == []
+
+
+def test_detection_logs_file_ratio_source(video):
+    """Test détection sans ratio original : le log nomme la source du ratio du fichier (nfo_aspect)"""
+    write(os.path.splitext(video)[0] + ".nfo", NFO.replace("<originalaspectratio>2.39:1</originalaspectratio>", ""))
+    addon_module.xbmcaddon.Addon = lambda: MockAddon(settings={"enable_imdb": "false", "enable_cache": "false"})
+    service = Service()
+    service.kodi.get_aspect_ratio = lambda *args, **kwargs: None
+    video_tag = MockVideoInfoTag(title="Dune", year=2021, filename=video)
+    service.isPlayingVideo = lambda: True
+    service.getVideoInfoTag = lambda: video_tag
+    addon_module.xbmc.logs = []
+
+    detected_ratio, file_ratio, _ = service._detect_aspect_ratio()
+
+    assert detected_ratio == file_ratio == 177
+    assert any("detected_ratio=177 from nfo_aspect" in msg for msg, level in addon_module.xbmc.logs)
@@ -0,0 +1,213 @@
+"""
+Tests pour SqliteCacheProvider.
+"""
+import sys
+import os
+import json
+import sqlite3
+import tempfile
+import shutil
+import pytest
+
+# Ajouter le répertoire parent au path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Mocker les modules Kodi
+import tests.mock_kodi as mock_kodi
+mock_xbmc = mock_kodi.MockXbmc()
+sys.modules['xbmc'] = mock_xbmc
+sys.modules['xbmcaddon'] = type(sys)('xbmcaddon')
+sys.modules['xbmcaddon'].Addon = lambda: mock_kodi.MockAddon()
+sys.modules['xbmcgui'] = mock_kodi.MockXbmcgui()
+
+from addon import SqliteCacheProvider, JsonCacheProvider, create_cache_provider
+from tests.mock_kodi import MockAddon
+import addon as addon_module
+
+
+@pytest.fixture
+def temp_profile():
+    """Fixture pour un répertoire de profil temporaire"""
+    temp_dir = tempfile.mkdtemp()
+    original_addon = addon_module.xbmcaddon.Addon
+    addon_module.xbmcaddon.Addon = lambda: MockAddon(profile_path=temp_dir)
+
+    yield temp_dir
+
+    addon_module.xbmcaddon.Addon = original_addon
+    shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+@pytest.fixture
+def cache(temp_profile):
+    """Fixture pour créer un cache SQLite temporaire"""
+    cache = SqliteCacheProvider()
+    yield cache
+    cache.compact()
+
+
+def test_store_and_get(cache):
+    """Test stockage et récupération basique"""
+    cache.store("Test Movie", 2020, 235)
+    assert cache.get("Test Movie", 2020) == 235
+    assert cache.get("test movie", 2020) == 235
+
+
+def test_get_nonexistent(cache):
+    """Test récupération d'une clé inexistante"""
+    assert cache.get("Nonexistent Movie", 2020) is None
+
+
+def test_imdb_id_priority(cache):
+    """Test que IMDb ID a priorité sur title+year"""
+    cache.store("Test Movie", 2020, 235, imdb_id="tt1234567")
+    assert cache.get("Different Title", 2021, imdb_id="tt1234567") == 235
+
+
+def test_overwrite_existing(cache):
+    """Test écrasement d'une valeur existante"""
+    cache.store("Test Movie", 2020, 185)
+    cache.store("Test Movie", 2020, 235)
+    assert cache.get("Test Movie", 2020) == 235
+    assert cache.count() == 1
+
+
+def test_miss_not_counted(cache):
+    """Test que les lignes de type miss ne comptent pas dans la taille du cache"""
+    cache.store("Known Movie", 2020, 185)
+    cache.store_miss("Unknown Movie", 2020)
+    assert cache.count() == 1
+
+
+def test_invalid_ratio_not_stored(cache):
+    """Test que les ratios invalides ne sont pas stockés"""
+    cache.store("Movie", 2020, 99)
+    cache.store("Movie2", 2020, 501)
+    cache.store("Movie3", 2020, None)
+    assert cache.count() == 0
+
+
+def test_metadata_recorded(cache):
+    """Test que source, date de récupération et nombre de hits sont enregistrés"""
+    cache.store("Test Movie", 2020, 235, imdb_id="tt1234567")
+    cache.get(None, imdb_id="tt1234567")
+    cache.get(None, imdb_id="tt1234567")
+
+    conn = sqlite3.connect(cache.path)
+    row = conn.execute("SELECT imdb_id, title_key, source, fetched_at, hits FROM ratios").fetchone()
+    conn.close()
+    imdb_id, title_key, source, fetched_at, hits = row
+    assert imdb_id == "tt1234567"
+    assert title_key == "test movie (2020)"
+    assert source == "imdb"
+    assert fetched_at > 0
+    assert hits == 2
+
+
+def test_indexes_exist(cache):
+    """Test que les index imdb id et title+year sont créés"""
+    cache.count()
+    conn = sqlite3.connect(cache.path)
+    indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    conn.close()
+    assert "idx_ratios_imdb_id" in indexes
+    assert "idx_ratios_title_key" in indexes
+
+
+def test_persistence(cache):
+    """Test persistance entre deux instances"""
+    cache.store("Test Movie", 2020, 235)
+    cache.compact()
+
+    new_cache = SqliteCacheProvider()
+    assert new_cache.get("Test Movie", 2020) == 235
+    new_cache.compact()
+
+
+def test_imports_existing_json_cache(temp_profile):
+    """Test import unique du cache JSON existant dans une nouvelle base"""
+    with open(os.path.join(temp_profile, "cache.json"), "w", encoding="utf-8") as f:
+        json.dump({"imdb:tt0230011": 239, "basil": 185}, f)
+
+    cache = SqliteCacheProvider()
+    assert cache.get("Atlantide", 2001, imdb_id="tt0230011") == 239
+    assert cache.get("Basil") == 185
+    cache.compact()
+
+
+def test_clear(cache):
+    """Test suppression du cache"""
+    cache.store("Test Movie", 2020, 235)
+    assert cache.clear()
+    assert not os.path.exists(cache.path)
+    assert cache.get("Test Movie", 2020) is None
+
+
+def test_disabled_cache(temp_profile):
+    """Test que le cache désactivé ne crée pas de base"""
+    cache = SqliteCacheProvider(enabled=False)
+    cache.store("Test Movie", 2020, 235)
+    assert cache.get("Test Movie", 2020) is None
+    assert not os.path.exists(os.path.join(temp_profile, "cache.db"))
+
+
+def test_create_cache_provider_backend(temp_profile):
+    """Test sélection du backend depuis le setting"""
+    assert isinstance(create_cache_provider(True, "SQLite"), SqliteCacheProvider)
+    assert isinstance(create_cache_provider(True, "JSON"), JsonCacheProvider)
+    assert isinstance(create_cache_provider(True, ""), JsonCacheProvider)
+
+
+def test_store_miss_and_fresh_miss(cache):
+    """Test entrée négative : un échec IMDb récent est mémorisé, get() reste None"""
+    cache.store_miss("Unknown Movie", 2020)
+    assert cache.has_fresh_miss("Unknown Movie", 2020)
+    assert cache.get("Unknown Movie", 2020) is None
+
+
+def test_miss_expires_after_ttl(cache):
+    """Test que l'entrée négative expire après le TTL"""
+    cache.store_miss(None, None, imdb_id="tt7654321")
+    cache._conn.execute("UPDATE ratios SET fetched_at = fetched_at - ?", (cache.negative_ttl_s + 1,))
+    assert not cache.has_fresh_miss(None, None, imdb_id="tt7654321")
+
+
+def test_miss_does_not_replace_ratio(cache):
+    """Test qu'une entrée négative n'écrase pas un ratio connu, et inversement"""
+    cache.store("Test Movie", 2020, 235)
+    cache.store_miss("Test Movie", 2020)
+    assert cache.get("Test Movie", 2020) == 235
+    cache.store_miss("Other Movie", 2020)
+    cache.store("Other Movie", 2020, 185)
+    assert cache.get("Other Movie", 2020) == 185
+    assert not cache.has_fresh_miss("Other Movie", 2020)
+
+
+def test_seed_consulted_after_user_cache(cache):
+    """Test que la base seed livrée avec l'addon est consultée après la base utilisateur"""
+    cache.use_seed = True
+    assert cache.get("Superman", 2025, imdb_id="tt5950044") == 185
+    cache.store("Superman", 2025, 240, imdb_id="tt5950044")
+    assert cache.get("Superman", 2025, imdb_id="tt5950044") == 240
+
+
+def test_external_clear_reopens_database(cache):
+    """Test qu'un clear depuis un autre processus ne laisse pas le service écrire dans un fichier supprimé"""
+    cache.store("Movie 1", 2020, 185)
+    other = SqliteCacheProvider()
+    assert other.clear()
+
+    assert cache.get("Movie 1", 2020) is None
+    cache.store("Movie 2", 2021, 235)
+    assert os.path.exists(cache.path)
+    assert SqliteCacheProvider().count() == 1
+
+
+def test_store_by_id_keeps_title_key(cache):
+    """Test mise à jour par imdb id seul (re-parse) : la ligne reste trouvable par titre"""
+    cache.store("Atlantide", 2001, 185, imdb_id="tt0230011")
+    cache.store(None, None, 239, imdb_id="tt0230011")
+    assert cache.get("Atlantide", 2001) == 239
+    assert cache.title_keys() == []
+    cache.store("Other Movie", 2001, 200)
+    assert cache.title_keys() == ["other movie (2001)"]
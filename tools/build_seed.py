@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Build the read-only seed database shipped with the addon (resources/data/seed.bin).
+
+Each imdb id listed in the ids file (one "ttNNNNNNN" per line, "#" starts a comment) is
+resolved with imdb.getOriginalAspectRatio, the same parse logic the service uses.
+Ratios already known can be taken from a CASES.jsonl-style file (imdb_id, imdb_ratio)
+with --cases; those ids are not fetched again.
+
+Usage: python3 tools/build_seed.py resources/data/seed_ids.txt [--cases CASES.jsonl] [-o resources/data/seed.bin]
+"""
+import argparse
+import json
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# imdb.py imports the Kodi modules: run it outside Kodi with the test doubles
+import tests.mock_kodi as mock_kodi
+sys.modules.setdefault('xbmc', mock_kodi.MockXbmc())
+if 'xbmcaddon' not in sys.modules:
+    sys.modules['xbmcaddon'] = type(sys)('xbmcaddon')
+    sys.modules['xbmcaddon'].Addon = lambda: mock_kodi.MockAddon()
+sys.modules.setdefault('xbmcgui', mock_kodi.MockXbmcgui())
+
+from imdb import getOriginalAspectRatio, IMDbUnavailableError
+from ratio_index import write_ratio_index
+
+MIN_VALID_RATIO = 100
+MAX_VALID_RATIO = 500
+
+
+def normalize_ratio(value):
+    """
+    Ratio returned by getOriginalAspectRatio (a str, or a list of str when IMDb lists
+    several) as an int, like IMDbProvider does: first entry, or None if not a number.
+    """
+    if isinstance(value, list):
+        value = value[0] if value else None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def read_ids(path):
+    ids = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            imdb_id = line.split("#", 1)[0].strip()
+            if imdb_id:
+                ids.append(imdb_id)
+    return ids
+
+
+def read_cases(path):
+    ratios = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            case = json.loads(line)
+            ratio = normalize_ratio(case.get("imdb_ratio"))
+            if case.get("imdb_id") and ratio:
+                ratios[case["imdb_id"]] = ratio
+    return ratios
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the seed ratio database")
+    parser.add_argument("ids", help="File with one imdb id per line")
+    parser.add_argument("--cases", help="CASES.jsonl-style file with known imdb_id/imdb_ratio pairs")
+    parser.add_argument("-o", "--output", default=os.path.join(ROOT, "resources", "data", "seed.bin"))
+    args = parser.parse_args()
+
+    ratios = read_cases(args.cases) if args.cases else {}
+    for imdb_id in read_ids(args.ids):
+        if imdb_id in ratios:
+            continue
+        try:
+            value = getOriginalAspectRatio(None, imdb_number=imdb_id)
+        except IMDbUnavailableError as e:
+            print(f"{imdb_id}: IMDb unavailable ({e}), skipped", file=sys.stderr)
+            continue
+        ratio = normalize_ratio(value)
+        if ratio is None:
+            print(f"{imdb_id}: no aspect ratio ({value!r}), skipped", file=sys.stderr)
+            continue
+        ratios[imdb_id] = ratio
+        print(f"{imdb_id}: {ratio}")
+
+    entries = [("imdb:" + imdb_id, ratio) for imdb_id, ratio in ratios.items()
+               if MIN_VALID_RATIO <= ratio <= MAX_VALID_RATIO]
+    tmp_path = args.output + ".tmp"
+    written = write_ratio_index(tmp_path, entries)
+    os.replace(tmp_path, args.output)
+    print(f"Wrote {written} entries to {args.output}")
+
+
+if __name__ == "__main__":
+    main()